@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
+from ..companies import feed, frames
+from ..companies.sender import CoalescingSender
+from ..external_tables.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def agent_group(agent_pk):
+    """Group of an agent's dashboard sockets, fed by poll_transaction_feed"""
+    return f"agent_{agent_pk}"
+
+
+class DailyAgentMetrics:
+    """
+    One agent's totals for a day, kept up to date one transaction at a
+    time. Each transaction's last known state is remembered, so a status
+    change moves it between totals instead of counting it twice.
+    """
+
+    def __init__(self, day, rows=()):
+        self.day = day
+        self.transactions = {}
+        self.customers = Counter()
+        self.total_transactions = 0
+        self.total_successful = 0
+        self.total_failed = 0
+        self.total_amount = Decimal(0)
+        for transaction_id, status, amount, customer_id in rows:
+            self.apply(transaction_id, status, amount, customer_id)
+
+    def _count(self, row, sign):
+        status, amount, customer_id = row
+        self.total_transactions += sign
+        if status == "successful":
+            self.total_successful += sign
+            self.total_amount += sign * amount
+        elif status == "failed":
+            self.total_failed += sign
+        if customer_id:
+            self.customers[customer_id] += sign
+            if self.customers[customer_id] <= 0:
+                del self.customers[customer_id]
+
+    def apply(self, transaction_id, status, amount, customer_id):
+        """Add a transaction, or replace its previous state"""
+        row = (status, Decimal(amount or 0), customer_id)
+        previous = self.transactions.get(transaction_id)
+        if previous == row:
+            return False
+        if previous:
+            self._count(previous, -1)
+        self._count(row, 1)
+        self.transactions[transaction_id] = row
+        return True
+
+    def snapshot(self):
+        return {
+            "date": self.day.isoformat(),
+            "total_transactions": self.total_transactions,
+            "total_successful": self.total_successful,
+            "total_failed": self.total_failed,
+            "total_amount": float(self.total_amount),
+            "total_customers": len(self.customers),
+        }
+
+
+class AgentDashboardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live version of the agent dashboard (AgentMetricsView) for today. The
+    day's totals are loaded once on connect and then updated from the
+    changed transactions poll_transaction_feed publishes to the agent's
+    group, so no aggregate query runs per update. Frames use the same delta and msgpack encoding
+    as the company dashboard.
+    """
+
+    async def connect(self):
+        tenant = self.scope.get("tenant")
+        if not self.scope["user"].is_authenticated or not tenant or not tenant.agent_pk:
+            await self.close(code=4003, reason="Only agents can connect")
+            return
+
+        self.binary = frames.MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        await self.accept(subprotocol=frames.MSGPACK_SUBPROTOCOL if self.binary else None)
+
+        params = parse_qs(self.scope["query_string"].decode())
+        self.agent_pk = tenant.agent_pk
+        self.company_id = tenant.company_id
+        self.frames = frames.FrameEncoder(delta=params.get("delta", ["1"])[0] != "0")
+        self.sender = CoalescingSender(
+            self._deliver, max_queue=settings.DASHBOARD_SEND_QUEUE_SIZE
+        )
+        self.sender.start()
+
+        # Join before loading, so nothing saved in between is missed;
+        # applying a transaction twice is harmless
+        await self.channel_layer.group_add(agent_group(self.agent_pk), self.channel_name)
+        self.metrics = await self._load_day()
+        self._push()
+        self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    @database_sync_to_async
+    def _load_day(self):
+        day = timezone.localdate()
+        rows = Transaction.objects.filter(
+            agent_id=self.agent_pk, created_at__date=day
+        ).values_list("id", "status", "amount", "customer_id")
+        return DailyAgentMetrics(day, rows)
+
+    async def _heartbeat(self):
+        """Keep the agent's company on the feed poller's list while this socket is open"""
+        touch = sync_to_async(feed.touch, thread_sensitive=False)
+        while True:
+            try:
+                await touch(self.company_id)
+            except Exception as e:
+                logger.warning("Agent dashboard heartbeat failed: %s", e)
+            await asyncio.sleep(settings.DASHBOARD_HEARTBEAT_INTERVAL)
+
+    def _push(self):
+        self.sender.offer(
+            {
+                "type": "periodic_update",
+                "data": self.metrics.snapshot(),
+                "timestamp": timezone.now().isoformat(),
+            },
+            coalesce_key="metrics",
+        )
+
+    async def _deliver(self, message):
+        if message["type"] == "periodic_update":
+            frame = self.frames.encode(message["data"])
+            if frame is None:
+                return
+            message = {"type": "periodic_update", **frame, "timestamp": message["timestamp"]}
+        if self.binary:
+            await self.send(bytes_data=frames.pack(message, binary=True))
+        else:
+            await self.send(text_data=frames.pack(message))
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        """Handle client requests; {"type": "resync"} asks for a full snapshot"""
+        try:
+            message = frames.unpack(text_data, bytes_data)
+        except (TypeError, ValueError):
+            return
+        if isinstance(message, dict) and message.get("type") == "resync":
+            self.frames.reset()
+            self._push()
+
+    async def transaction_updates(self, event):
+        """Fold a batch of changed transactions into today's totals"""
+        if timezone.localdate() != self.metrics.day:
+            self.metrics = await self._load_day()
+            self._push()
+            return
+
+        changed = False
+        for transaction in event["transactions"]:
+            created_at = parse_datetime(transaction["created_at"])
+            if timezone.localdate(created_at) != self.metrics.day:
+                continue
+            changed |= self.metrics.apply(
+                transaction["id"],
+                transaction["status"],
+                transaction["amount"],
+                transaction["customer_id"],
+            )
+        if changed:
+            self._push()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "heartbeat_task"):
+            self.heartbeat_task.cancel()
+        if hasattr(self, "sender"):
+            await self.sender.stop()
+            await self.channel_layer.group_discard(
+                agent_group(self.agent_pk), self.channel_name
+            )
+        await super().disconnect(close_code)
@@ -3,7 +3,7 @@ from django.core.validators import MinValueValidator
 from ..common.models import BaseModel
 from ..companies.models import Company
 from ..users.models import User
-import random
+from .utils import insert_with_agent_ids
 
 
 class Agent(BaseModel):
@@ -23,11 +23,12 @@ class Agent(BaseModel):
         return f"{self.agent_id}"
 
     def save(self, *args, **kwargs):
-        if not self.agent_id:
-            while True:
-                agent_id = random.randint(100000, 999999)
-                if not Agent.objects.filter(agent_id=agent_id).exists():
-                    self.agent_id = str(agent_id)
-                    break
-        super().save(*args, **kwargs)
+        if self.agent_id:
+            return super().save(*args, **kwargs)
+
+        def insert(agent_ids):
+            self.agent_id = agent_ids[0]
+            super(Agent, self).save(*args, **kwargs)
+
+        insert_with_agent_ids(1, insert)
 
@@ -1,9 +1,15 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.db import transaction
+from django.db.models import Q
+from ..common.response_cache import invalidate_on_commit
+from ..common.validators import phone_validator
 from ..companies.models import Company
 from ..users.models import User
 from ..users.serializers import RegistrationSerializer
 from .models import Agent
+from .utils import insert_with_agent_ids
 
 
 class AgentUserSerializer(serializers.ModelSerializer):
@@ -48,10 +54,10 @@ class AgentSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def create(self, validated_data):
-        owner = self.context["request"].user
-        if not owner.company:
+        company_id = self.context["request"].tenant.company_id
+        if not company_id:
             raise serializers.ValidationError("Company not found")
-        validated_data["company"] = owner.company
+        validated_data["company_id"] = company_id
         
         user_data = {
             "email": validated_data.pop("email"),
@@ -70,3 +76,100 @@ class AgentSerializer(serializers.ModelSerializer):
         agent = Agent.objects.create(user_id=user, **validated_data)
         agent.save()
         return agent
+
+
+class AgentBulkRowSerializer(serializers.Serializer):
+    """A single agent row of a bulk onboarding request"""
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=50)
+    last_name = serializers.CharField(max_length=50)
+    phone = serializers.CharField(max_length=15, validators=[phone_validator])
+    commission = serializers.DecimalField(
+        max_digits=10, decimal_places=3, required=False, allow_null=True
+    )
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+
+class AgentBulkOnboardSerializer(serializers.Serializer):
+    agents = AgentBulkRowSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.AGENT_BULK_ONBOARD_MAX,
+    )
+
+    def validate_agents(self, rows):
+        emails = [row["email"] for row in rows]
+        phones = [row["phone"] for row in rows]
+
+        # One query for every email and phone already registered
+        taken_emails, taken_phones = set(), set()
+        for email, phone in User.objects.filter(
+            Q(email__in=emails) | Q(phone__in=phones)
+        ).values_list("email", "phone"):
+            taken_emails.add(email)
+            taken_phones.add(phone)
+
+        errors, seen_emails, seen_phones = [], set(), set()
+        for row in rows:
+            row_errors = {}
+            if row["email"] in taken_emails:
+                row_errors["email"] = ["A user with this email already exists."]
+            elif row["email"] in seen_emails:
+                row_errors["email"] = ["Duplicate email in this request."]
+            if row["phone"] in taken_phones:
+                row_errors["phone"] = ["A user with this phone already exists."]
+            elif row["phone"] in seen_phones:
+                row_errors["phone"] = ["Duplicate phone in this request."]
+            seen_emails.add(row["email"])
+            seen_phones.add(row["phone"])
+            errors.append(row_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    @transaction.atomic
+    def create(self, validated_data):
+        company_id = self.context["request"].tenant.company_id
+        if not company_id:
+            raise serializers.ValidationError("Company not found")
+
+        rows = validated_data["agents"]
+        unusable_password = make_password(None)
+        # An email or phone registered since validation raises IntegrityError,
+        # which AgentBulkOnboardView answers with a 409
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=row["email"],
+                    first_name=row["first_name"],
+                    last_name=row["last_name"],
+                    phone=row["phone"],
+                    role="agent",
+                    password=unusable_password,
+                )
+                for row in rows
+            ],
+            batch_size=500,
+        )
+
+        # bulk_create sends no post_save, so drop the company's cached responses here
+        invalidate_on_commit(f"company:{company_id}")
+
+        return insert_with_agent_ids(
+            len(rows),
+            lambda agent_ids: Agent.objects.bulk_create(
+                [
+                    Agent(
+                        user_id=user,
+                        agent_id=agent_id,
+                        company_id=company_id,
+                        commission=row.get("commission"),
+                    )
+                    for user, agent_id, row in zip(users, agent_ids, rows)
+                ],
+                batch_size=500,
+            ),
+        )
@@ -1,3 +1,244 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.companies import feed
+from apps.companies.models import Company
+from apps.companies.tasks import poll_transaction_feed
+from apps.companies.tenancy import TenantContext
+from apps.external_tables.models import Transaction
+from apps.users.models import User
+from .consumers import AgentDashboardConsumer, DailyAgentMetrics
+from .models import Agent
+from .serializers import AgentBulkOnboardSerializer
 
-# Create your tests here.
\ No newline at end of file
+
+class AgentBulkOnboardTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="bulkowner@example.com",
+            password="StrongPassword123!",
+            first_name="Bulk",
+            last_name="Owner",
+            phone="3334445556",
+            nin="33344455566",
+            role="owner",
+        )
+        cls.company = Company.objects.create(
+            owner=cls.owner, name="Bulk Company", state="S", lga="L", area="A"
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+        self.url = reverse("api:agent-bulk-onboard", kwargs={"version": "v1"})
+
+    def agent_rows(self, count):
+        return [
+            {
+                "email": f"agent{index}@example.com",
+                "first_name": "Agent",
+                "last_name": f"Number{index}",
+                "phone": f"0801000{index:04d}",
+            }
+            for index in range(count)
+        ]
+
+    def agent_user(self, email, phone):
+        return User.objects.create(
+            email=email,
+            first_name="Agent",
+            last_name="User",
+            phone=phone,
+            role="agent",
+        )
+
+    def test_bulk_onboard_json(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.agent_rows(25), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        agents = Agent.objects.filter(company=self.company)
+        self.assertEqual(agents.count(), 25)
+        self.assertEqual(len(set(agents.values_list("agent_id", flat=True))), 25)
+        self.assertFalse(agents.first().user_id.has_usable_password())
+        self.assertEqual(len(mail.outbox), 25)
+
+    def test_bulk_onboard_refreshes_cached_agent_list(self):
+        list_url = reverse("api:agent-create", kwargs={"version": "v1"})
+        self.assertEqual(self.client.get(list_url).data["count"], 0)
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "hit")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.agent_rows(2), format="json")
+
+        response = self.client.get(list_url)
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertEqual(response.data["count"], 2)
+
+    def test_bulk_onboard_csv(self):
+        lines = ["email,first_name,last_name,phone,commission"] + [
+            f"{row['email']},{row['first_name']},{row['last_name']},{row['phone']},0.5"
+            for row in self.agent_rows(3)
+        ]
+        upload = SimpleUploadedFile(
+            "agents.csv", "\n".join(lines).encode(), content_type="text/csv"
+        )
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Agent.objects.filter(company=self.company).count(), 3)
+
+    def test_bulk_onboard_rejects_duplicates(self):
+        rows = self.agent_rows(3)
+        rows[2]["email"] = rows[0]["email"]
+        rows[1]["phone"] = self.owner.phone
+
+        response = self.client.post(self.url, {"agents": rows}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("phone", response.data["agents"][1])
+        self.assertIn("email", response.data["agents"][2])
+        self.assertFalse(Agent.objects.filter(company=self.company).exists())
+
+    def test_bulk_onboard_conflicts_with_concurrent_registration(self):
+        rows = self.agent_rows(2)
+        rows[1]["email"] = self.owner.email
+
+        # As if the owner registered between validation and the insert
+        with mock.patch.object(
+            AgentBulkOnboardSerializer, "validate_agents", side_effect=lambda rows: rows
+        ):
+            response = self.client.post(self.url, rows, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("error", response.data)
+        self.assertFalse(Agent.objects.filter(company=self.company).exists())
+        self.assertFalse(User.objects.filter(email=rows[0]["email"]).exists())
+
+    def test_agent_ids_taken_concurrently_are_reallocated(self):
+        user = self.agent_user("taken@example.com", "08020000000")
+        Agent.objects.create(user_id=user, company=self.company, agent_id="123456")
+        # The first allocation misses the ID committed by another request
+        allocations = [["123456", "200001"], ["200002", "200003"]]
+
+        with mock.patch(
+            "apps.agents.utils.allocate_agent_ids", side_effect=allocations
+        ) as allocate:
+            response = self.client.post(self.url, self.agent_rows(2), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(
+            sorted(agent["agent_id"] for agent in response.data["data"]),
+            ["200002", "200003"],
+        )
+
+    def test_single_agent_id_taken_concurrently_is_reallocated(self):
+        taken_user = self.agent_user("taken@example.com", "08030000000")
+        user = self.agent_user("single@example.com", "08030000001")
+        Agent.objects.create(user_id=taken_user, company=self.company, agent_id="123456")
+
+        with mock.patch(
+            "apps.agents.utils.allocate_agent_ids", side_effect=[["123456"], ["654321"]]
+        ):
+            agent = Agent.objects.create(user_id=user, company=self.company)
+
+        self.assertEqual(agent.agent_id, "654321")
+
+
+class DailyAgentMetricsTestCase(SimpleTestCase):
+    def test_status_changes_move_transactions_between_totals(self):
+        metrics = DailyAgentMetrics(
+            date(2025, 1, 1),
+            [("t1", "pending", "10.00", "c1"), ("t2", "successful", "5.50", "c1")],
+        )
+        self.assertTrue(metrics.apply("t1", "successful", "10.00", "c1"))
+        self.assertFalse(metrics.apply("t1", "successful", "10.00", "c1"))
+        self.assertTrue(metrics.apply("t3", "failed", "3.00", "c2"))
+
+        self.assertEqual(
+            metrics.snapshot(),
+            {
+                "date": "2025-01-01",
+                "total_transactions": 3,
+                "total_successful": 2,
+                "total_failed": 1,
+                "total_amount": 15.5,
+                "total_customers": 2,
+            },
+        )
+
+
+class AgentDashboardConsumerTestCase(TestCase):
+    def test_pushes_updates_as_transactions_land(self):
+        owner = User.objects.create_user(
+            email="liveowner@example.com",
+            password="StrongPassword123!",
+            first_name="Live",
+            last_name="Owner",
+            phone="5556667778",
+            nin="55566677788",
+            role="owner",
+        )
+        company = Company.objects.create(
+            owner=owner, name="Live Company", state="S", lga="L", area="A"
+        )
+        agent_user = User.objects.create_user(
+            email="liveagent@example.com",
+            password="StrongPassword123!",
+            first_name="Live",
+            last_name="Agent",
+            phone="5556667779",
+            nin="55566677789",
+            role="agent",
+        )
+        agent = Agent.objects.create(user_id=agent_user, company=company)
+        Transaction.objects.create(agent_id=agent, amount=100, status="successful")
+        tenant = TenantContext.for_user(agent_user)
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                AgentDashboardConsumer.as_asgi(), "/ws/agents/dashboard/"
+            )
+            communicator.scope["user"] = agent_user
+            communicator.scope["tenant"] = tenant
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            first = await communicator.receive_json_from()
+            # Written like the external systems do, with no model signal
+            await database_sync_to_async(Transaction.objects.bulk_create)(
+                [Transaction(agent_id=agent, amount=50, status="failed")]
+            )
+            await database_sync_to_async(poll_transaction_feed)()
+            second = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return first, second
+
+        lease = mock.MagicMock()
+        lease.return_value.__enter__.return_value = True
+        with mock.patch("apps.companies.tasks.lease", lease), mock.patch.object(
+            feed, "touch"
+        ) as touch, mock.patch.object(
+            feed, "active_companies", return_value=[company.pk]
+        ), mock.patch.object(
+            feed, "get_watermark", return_value=(datetime(2000, 1, 1, tzinfo=dt_timezone.utc), "")
+        ), mock.patch.object(feed, "set_watermark"):
+            first, second = async_to_sync(scenario)()
+
+        touch.assert_called_with(company.pk)
+        self.assertEqual(first["mode"], "full")
+        self.assertEqual(first["data"]["total_transactions"], 1)
+        self.assertEqual(first["data"]["total_amount"], 100.0)
+        self.assertEqual(second["mode"], "patch")
+        self.assertIn(
+            {"op": "replace", "path": "/total_failed", "value": 1}, second["patch"]
+        )
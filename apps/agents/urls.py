@@ -6,11 +6,13 @@ from .views import (
     AgentMetricsView,
     AgentRetrieveUpdateView,
     AgentOnboardView,
+    AgentBulkOnboardView,
 )
 
 urlpatterns = [
     path("agents/", AgentListCreateView.as_view(), name="agent-create"),
     path("agents/dashboard/", AgentMetricsView.as_view(), name="agent-dashboard"),
     path("agents/onboard/", AgentOnboardView.as_view(), name="agent-onboard-password"),
+    path("agents/bulk/", AgentBulkOnboardView.as_view(), name="agent-bulk-onboard"),
     path("agents/<str:pk>/", AgentRetrieveUpdateView.as_view(), name="agent-retrieve"),
 ]
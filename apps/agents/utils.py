@@ -0,0 +1,76 @@
+import jwt
+import random
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+
+AGENT_ID_RANGE = range(100000, 1000000)
+
+# Allocations to try before giving up when concurrent inserts keep taking the IDs
+AGENT_ID_ATTEMPTS = 3
+
+ONBOARDING_URL = "https://pos-padi.netlify.app/agent-complete-signup/{token}/"
+
+
+def allocate_agent_ids(count):
+    """
+    Return `count` unused 6-digit agent IDs, checking candidates against
+    the agents table one batch at a time instead of one query per ID.
+    """
+    from .models import Agent
+
+    allocated = set()
+    while len(allocated) < count:
+        needed = count - len(allocated)
+        candidates = {
+            str(agent_id) for agent_id in random.sample(AGENT_ID_RANGE, needed)
+        } - allocated
+        taken = set(
+            Agent.objects.filter(agent_id__in=candidates).values_list(
+                "agent_id", flat=True
+            )
+        )
+        allocated |= candidates - taken
+    return list(allocated)
+
+
+def insert_with_agent_ids(count, insert):
+    """
+    Call `insert(agent_ids)` in a savepoint with `count` fresh agent IDs.
+    allocate_agent_ids cannot see IDs another transaction is about to
+    commit, so when the insert hits one of them it is retried with a new
+    allocation, up to AGENT_ID_ATTEMPTS times. Any other IntegrityError is
+    raised as is.
+    """
+    from .models import Agent
+
+    for attempt in range(1, AGENT_ID_ATTEMPTS + 1):
+        agent_ids = allocate_agent_ids(count)
+        try:
+            with transaction.atomic():
+                return insert(agent_ids)
+        except IntegrityError:
+            if attempt == AGENT_ID_ATTEMPTS or not Agent.objects.filter(
+                agent_id__in=agent_ids
+            ).exists():
+                raise
+
+
+def build_onboarding_link(email):
+    """Signed link that lets a new agent set their password within 24 hours"""
+    token = jwt.encode(
+        {"email": email, "exp": datetime.now() + timedelta(hours=24)},
+        settings.SECRET_KEY,
+        algorithm="HS256",
+    )
+    return ONBOARDING_URL.format(token=token)
+
+
+def onboarding_email(email):
+    """queue_email kwargs for an agent's onboarding message"""
+    return {
+        "subject": "POS-Padi Onboarding",
+        "body": f"Click the link to complete your onboarding: {build_onboarding_link(email)}",
+        "to": [email],
+    }
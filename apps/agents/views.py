@@ -1,9 +1,8 @@
+import csv
+import io
 import jwt
-from datetime import datetime, timedelta
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from django.utils.dateparse import parse_date
 from django.db.models import (
     Q,
@@ -21,10 +20,15 @@ from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import Agent
-from .serializers import AgentSerializer
+from .serializers import AgentSerializer, AgentBulkOnboardSerializer
+from .utils import onboarding_email
+from ..common.mail import queue_email, queue_emails
+from ..common.renderers import ORJSONParser
+from ..common.response_cache import CachedResponseMixin
 from ..users.permissions import (
     IsOwnerOrSuperuser,
     IsOwnerOrAgentOrSuperuser,
@@ -34,7 +38,7 @@ from ..users.models import User
 from ..external_tables.models import Transaction
 
 
-class AgentListCreateView(ListCreateAPIView):
+class AgentListCreateView(CachedResponseMixin, ListCreateAPIView):
     queryset = Agent.objects.all()
     serializer_class = AgentSerializer
     permission_classes = [IsOwnerOrSuperuser]
@@ -45,10 +49,11 @@ class AgentListCreateView(ListCreateAPIView):
         return context
 
     def get_queryset(self):
+        tenant = self.request.tenant
         if self.request.user.is_superuser:
             return Agent.objects.all()
-        elif self.request.user.role == "owner":
-            return Agent.objects.filter(company=self.request.user.company)
+        elif tenant.role == "owner":
+            return Agent.objects.filter(company_id=tenant.company_id)
         return Agent.objects.none()
 
     @swagger_auto_schema(
@@ -80,23 +85,68 @@ class AgentListCreateView(ListCreateAPIView):
         if response.status_code == status.HTTP_201_CREATED:
             user = response.data.get("user_id")
             user_email = user.get("email")
-            token = jwt.encode(
-                {"email": user_email, "exp": datetime.now() + timedelta(hours=24)},
-                settings.SECRET_KEY,
-                algorithm="HS256",
-            )
-            reset_url = request.build_absolute_uri(
-                f"https://pos-padi.netlify.app/agent-complete-signup/{token}/"
-            )
-            send_mail(
-                subject="POS-Padi Onboarding",
-                message=f"Click the link to complete your onboarding: {reset_url}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user_email],
-            )
+            queue_email(**onboarding_email(user_email))
         return response
 
 
+class AgentBulkOnboardView(APIView):
+    permission_classes = [IsOwnerOrSuperuser]
+    parser_classes = [ORJSONParser, MultiPartParser]
+
+    @swagger_auto_schema(
+        operation_summary="Onboard agents in bulk",
+        operation_description="Create many agents for the authenticated owner's company in one request. Send a JSON list (or {\"agents\": [...]}) or upload a CSV file with email, first_name, last_name, phone and optional commission columns. Onboarding emails are sent once the agents are saved.",
+        request_body=AgentBulkOnboardSerializer,
+        responses={
+            201: "Agents created successfully.",
+            400: "Invalid data provided.",
+            403: "Permission denied.",
+            409: "Some emails or phones were registered by another request.",
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload:
+            try:
+                rows = list(csv.DictReader(io.TextIOWrapper(upload, encoding="utf-8-sig")))
+            except (UnicodeDecodeError, csv.Error):
+                return Response(
+                    {"error": "Invalid CSV file."}, status=status.HTTP_400_BAD_REQUEST
+                )
+            data = {"agents": rows}
+        elif isinstance(request.data, list):
+            data = {"agents": request.data}
+        else:
+            data = request.data
+
+        serializer = AgentBulkOnboardSerializer(data=data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                agents = serializer.save()
+                queue_emails([onboarding_email(agent.user_id.email) for agent in agents])
+        except IntegrityError:
+            # Registered by a concurrent request after validation passed
+            return Response(
+                {
+                    "message": "Agents could not be created.",
+                    "error": "Some emails or phones were registered by another request. Check them and try again.",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {
+                "message": f"{len(agents)} agents created successfully.",
+                "data": [
+                    {"email": agent.user_id.email, "agent_id": agent.agent_id}
+                    for agent in agents
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class AgentOnboardView(APIView):
     permission_classes = [AllowAny]
     queryset = Agent.objects.all()
@@ -179,11 +229,18 @@ class AgentOnboardView(APIView):
         )
 
 
-class AgentRetrieveUpdateView(RetrieveUpdateAPIView):
+class AgentRetrieveUpdateView(CachedResponseMixin, RetrieveUpdateAPIView):
     queryset = Agent.objects.none()
     serializer_class = AgentSerializer
     permission_classes = [IsOwnerOrAgentOrSuperuser]
 
+    def cache_tags(self):
+        # The agent is looked up by user id, whatever company it belongs to
+        tags = super().cache_tags()
+        if tags:
+            tags.append(f"agent:{self.kwargs.get('pk')}")
+        return tags
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["request"] = self.request
@@ -196,7 +253,7 @@ class AgentRetrieveUpdateView(RetrieveUpdateAPIView):
         elif getattr(user, "role", None) == "agent":
             return Agent.objects.filter(user_id=user)
         elif getattr(user, "role", None) == "owner":
-            return Agent.objects.filter(company=user.company)
+            return Agent.objects.filter(company_id=self.request.tenant.company_id)
         return Agent.objects.none()
 
     @swagger_auto_schema(
@@ -267,7 +324,11 @@ class AgentMetricsView(APIView):
         },
     )
     def get(self, request, *args, **kwargs):
-        agent = get_object_or_404(Agent, user_id=self.request.user)
+        agent = request.tenant.agent
+        if not agent:
+            return Response(
+                {"error": "Agent not found."}, status=status.HTTP_404_NOT_FOUND
+            )
 
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
+
+    def ready(self):
+        from django.conf import settings
+
+        from django.db.backends.signals import connection_created
+        from . import db, response_cache, signals
+
+        response_cache.connect()
+        if settings.METRICS_ENABLED:
+            signals.connect()
+        if settings.METRICS_ENABLED or settings.SLOW_QUERY_THRESHOLD_MS:
+            connection_created.connect(db.install_wrappers, weak=False)
@@ -0,0 +1,29 @@
+from django.core.cache.backends.redis import RedisCache as BaseRedisCache
+from . import metrics
+
+_missing = object()
+
+
+def _count(hits, misses):
+    stats = metrics.current_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class RedisCache(BaseRedisCache):
+    """Django's Redis cache, counting hits and misses of the current request"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            _count(0, 1)
+            return default
+        _count(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        _count(len(values), len(keys) - len(values))
+        return values
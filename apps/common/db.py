@@ -0,0 +1,33 @@
+import time
+from django.conf import settings
+from . import metrics, slow_queries
+
+
+def instrument_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper timing every query. The time is added to the current
+    request's stats, if any, and queries slower than
+    SLOW_QUERY_THRESHOLD_MS are recorded with their plan. A query under
+    the threshold costs two clock reads.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats = metrics.current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += duration
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold and duration * 1000 >= threshold:
+            slow_queries.record(context["connection"], sql, params, many, duration)
+
+
+def install_wrappers(sender, connection, **kwargs):
+    """
+    connection_created receiver. Connections are per thread, so the wrapper
+    is attached to each one as it opens rather than around a single request.
+    """
+    if instrument_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrument_queries)
@@ -0,0 +1,127 @@
+import csv
+import zlib
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+
+EXPORT_BATCH_SIZE = 2000
+
+# Flush buffered CSV text to the client once it grows past this many characters
+EXPORT_FLUSH_SIZE = 64 * 1024
+
+# Spreadsheet apps evaluate text cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def parse_export_dates(params):
+    """
+    Parse optional start_date/end_date query params.
+    Raises ValueError for invalid or inverted dates.
+    """
+    dates = []
+    for name in ("start_date", "end_date"):
+        value = params.get(name)
+        if not value:
+            dates.append(None)
+            continue
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(f"Invalid {name}. Use YYYY-MM-DD.")
+        dates.append(parsed)
+
+    start_date, end_date = dates
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("Start date cannot be after End date")
+    return start_date, end_date
+
+
+def escape_formulas(row):
+    """
+    Prefix text cells that a spreadsheet would run as a formula with a
+    quote, so user-supplied values such as descriptions are shown as text.
+    Numbers are left alone, negative amounts included.
+    """
+    return [
+        f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for value in row
+    ]
+
+
+def _after(keys, values):
+    """Rows that sort after `values` on the `keys` columns"""
+    condition = Q()
+    for index, key in enumerate(keys):
+        equal = dict(zip(keys[:index], values[:index]))
+        condition |= Q(**equal, **{f"{key}__gt": values[index]})
+    return condition
+
+
+def iterate_keyset(queryset, fields, batch_size=EXPORT_BATCH_SIZE, order_by=("pk",)):
+    """
+    Yield value tuples for `fields` in `order_by` order, one batch at a time.
+    Keyset pagination keeps memory flat on MySQL, whose client buffers the
+    whole result set even when .iterator() is used. order_by must end with
+    "pk", so it is unique, and its columns must not be null.
+    """
+    keys = list(order_by)
+    # values_list() drops repeated names, so select keys that are also fields once
+    columns = list(dict.fromkeys([*keys, *fields]))
+    positions = [columns.index(field) for field in fields]
+    queryset = queryset.order_by(*keys)
+    last = None
+    while True:
+        batch = queryset if last is None else queryset.filter(_after(keys, last))
+        rows = list(batch.values_list(*columns)[:batch_size])
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row[position] for position in positions)
+        last = rows[-1][: len(keys)]
+
+
+def _csv_chunks(header, rows):
+    writer = csv.writer(Echo())
+    buffer = [writer.writerow(header)]
+    size = len(buffer[0])
+    for row in rows:
+        line = writer.writerow(escape_formulas(row))
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_FLUSH_SIZE:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def _gzip_chunks(chunks):
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_csv_response(filename, header, rows, compress=False):
+    """Stream rows as a CSV attachment, optionally gzip compressed"""
+    chunks = _csv_chunks(header, rows)
+    if compress:
+        response = StreamingHttpResponse(
+            _gzip_chunks(chunks), content_type="application/gzip"
+        )
+        filename = f"{filename}.gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="text/csv")
+
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
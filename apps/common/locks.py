@@ -0,0 +1,38 @@
+import uuid
+from contextlib import contextmanager
+from .redis import get_redis
+
+# Delete the lease only if it still holds our token, so a holder whose
+# lease expired never releases the next holder's
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_script = None
+
+
+def _release_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(RELEASE_SCRIPT)
+    return _script
+
+
+@contextmanager
+def lease(name, ttl):
+    """
+    Hold the Redis lease `name` for at most `ttl` seconds. Yields whether
+    it was acquired; a caller that did not get it should skip its work
+    rather than wait. The TTL frees the lease if the holder dies.
+    """
+    key = f"lease:{name}"
+    token = uuid.uuid4().hex
+    acquired = bool(get_redis().set(key, token, nx=True, ex=ttl))
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _release_script()(keys=[key], args=[token])
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import transaction
+from .models import EmailOutbox
+
+
+def _outbox_row(subject, body, to, from_email=None, html_body=None, reply_to=None):
+    return EmailOutbox(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+
+
+def _deliver_on_commit():
+    from .tasks import deliver_outbox
+
+    transaction.on_commit(lambda: deliver_outbox.delay())
+
+
+def queue_email(subject, body, to, from_email=None, html_body=None, reply_to=None):
+    """
+    Write an email to the outbox. It is handed to the delivery worker
+    once the surrounding transaction commits, and dropped if it rolls back.
+    """
+    email = _outbox_row(subject, body, to, from_email, html_body, reply_to)
+    email.save()
+    _deliver_on_commit()
+    return email
+
+
+def queue_emails(messages):
+    """Outbox many emails at once; `messages` are dicts of queue_email kwargs"""
+    emails = EmailOutbox.objects.bulk_create(
+        [_outbox_row(**message) for message in messages], batch_size=500
+    )
+    if emails:
+        _deliver_on_commit()
+    return emails
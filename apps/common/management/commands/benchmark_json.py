@@ -0,0 +1,115 @@
+import random
+import timeit
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from ...renderers import ORJSONParser, ORJSONRenderer
+from ....external_tables.models import Transaction
+from ....external_tables.serializers import TransactionSerializer
+
+
+def build_transactions(count):
+    """Unsaved transactions shaped like production rows"""
+    now = timezone.now()
+    agent_ids = [str(uuid.uuid4()) for _ in range(max(1, count // 50))]
+    statuses = [choice for choice, _ in Transaction.STATUS_CHOICES]
+    return [
+        Transaction(
+            id=str(uuid.uuid4()),
+            agent_id_id=random.choice(agent_ids),
+            customer_id_id=str(uuid.uuid4()),
+            description=f"Transfer {index}",
+            amount=Decimal(random.randint(100, 10_000_000)) / 100,
+            fee=Decimal(random.randint(0, 50_000)) / 100,
+            type=random.choice(["deposit", "withdrawal", "transfer"]),
+            rating=Decimal(random.randint(10, 50)) / 10,
+            status=random.choice(statuses),
+            created_at=now - timedelta(minutes=index),
+            updated_at=now,
+        )
+        for index in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer and JSONParser with the orjson ones set "
+        "in REST_FRAMEWORK, on payloads built with the project's serializers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Transactions per payload")
+        parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is kept")
+        parser.add_argument("--number", type=int, default=20, help="Encodes per timing run")
+        parser.add_argument(
+            "--use-db", action="store_true",
+            help="Serialize the latest transactions in the database",
+        )
+
+    def handle(self, *args, **options):
+        if options["use_db"]:
+            transactions = list(Transaction.objects.order_by("-created_at")[: options["rows"]])
+            if not transactions:
+                self.stderr.write("No transactions in the database")
+                return
+        else:
+            transactions = build_transactions(options["rows"])
+
+        transactions_data = TransactionSerializer(transactions, many=True).data
+        # Like UserSummaryView, plus the raw aggregates dashboards return:
+        # Decimals, UUIDs, datetimes and lazy translation strings that the
+        # renderer encodes itself rather than the serializer
+        payloads = {
+            "transaction list": {
+                "count": len(transactions_data),
+                "next": None,
+                "previous": None,
+                "results": transactions_data,
+            },
+            "summary": {
+                "transactions": transactions_data,
+                "totals": [
+                    {
+                        "agent_id": uuid.UUID(str(transaction.agent_id_id)),
+                        "status": gettext_lazy("Completed"),
+                        "total_amount": transaction.amount,
+                        "last_transaction_at": transaction.created_at,
+                    }
+                    for transaction in transactions
+                ],
+            },
+        }
+
+        for name, payload in payloads.items():
+            self.compare(name, payload, options)
+
+    def best(self, func, options):
+        runs = timeit.repeat(func, repeat=options["repeat"], number=options["number"])
+        return min(runs) / options["number"]
+
+    def compare(self, name, payload, options):
+        stdlib, fast = JSONRenderer(), ORJSONRenderer()
+        stdlib_body, fast_body = stdlib.render(payload), fast.render(payload)
+        render_stdlib = self.best(lambda: stdlib.render(payload), options)
+        render_fast = self.best(lambda: fast.render(payload), options)
+        parse_stdlib = self.best(lambda: JSONParser().parse(BytesIO(stdlib_body)), options)
+        parse_fast = self.best(lambda: ORJSONParser().parse(BytesIO(fast_body)), options)
+
+        write = self.stdout.write
+        write(f"{name}: {len(fast_body) / 1024:.1f} KiB")
+        for label, before, after in (
+            ("render", render_stdlib, render_fast),
+            ("parse", parse_stdlib, parse_fast),
+        ):
+            write(
+                f"  {label}: json {before * 1000:.2f}ms, orjson {after * 1000:.2f}ms "
+                f"({before / after:.1f}x)"
+            )
+        write(f"  identical output: {'yes' if stdlib_body == fast_body else 'no'}")
+
@@ -0,0 +1,204 @@
+import logging
+import redis
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from django.conf import settings
+from .redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Every metric lives in one Redis hash, so all web and worker processes
+# add to the same series and any of them can render the totals
+KEY_PREFIX = "metrics"
+
+_metrics = []
+
+
+@dataclass
+class RequestStats:
+    """Database and cache work done while serving one request"""
+
+    queries: int = 0
+    query_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+# Stats of the request being served, set by RequestMetricsMiddleware.
+# Context variables follow the request into sync_to_async threads.
+current_stats = ContextVar("request_stats", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    """Labels in Prometheus text format, which is also their hash field"""
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _series(name, labels, extra=""):
+    labels = ",".join(part for part in (labels, extra) if part)
+    return f"{name}{{{labels}}}" if labels else name
+
+
+@contextmanager
+def batch():
+    """
+    Send the observations made in the block to Redis in one round trip.
+    Metrics must never break the code they measure, so Redis errors are
+    reported and dropped.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    yield pipe
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to record metrics: %s", e)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the block's duration in `histogram`, if metrics are enabled"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if settings.METRICS_ENABLED:
+            histogram.observe(time.perf_counter() - started, **labels)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.key = f"{KEY_PREFIX}:{name}"
+        _metrics.append(self)
+
+    def _record(self, pipe, record):
+        if pipe is not None:
+            record(pipe)
+        else:
+            with batch() as pipe:
+                record(pipe)
+
+    def samples(self, values):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, pipe=None, **labels):
+        field = _format_labels(labels)
+        self._record(pipe, lambda pipe: pipe.hincrbyfloat(self.key, field, amount))
+
+    def samples(self, values):
+        for labels, value in sorted(values.items()):
+            yield _series(self.name, labels), float(value)
+
+
+class Histogram(Metric):
+    """
+    Stored as one counter per bucket an observation falls in, plus its sum
+    and count; buckets are made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets):
+        super().__init__(name, documentation)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value, pipe=None, **labels):
+        field = _format_labels(labels)
+        bound = next((b for b in self.buckets if value <= b), "+Inf")
+
+        def record(pipe):
+            pipe.hincrby(self.key, f"{field}|{bound}", 1)
+            pipe.hincrbyfloat(self.key, f"{field}|sum", value)
+            pipe.hincrby(self.key, f"{field}|count", 1)
+
+        self._record(pipe, record)
+
+    def samples(self, values):
+        series = {}
+        for field, value in values.items():
+            labels, part = field.rsplit("|", 1)
+            series.setdefault(labels, {})[part] = float(value)
+
+        for labels, parts in sorted(series.items()):
+            cumulative = 0
+            for bound in self.buckets + ["+Inf"]:
+                cumulative += parts.get(str(bound), 0)
+                yield _series(f"{self.name}_bucket", labels, f'le="{bound}"'), cumulative
+            yield _series(f"{self.name}_sum", labels), parts.get("sum", 0)
+            yield _series(f"{self.name}_count", labels), parts.get("count", 0)
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    pipe = get_redis().pipeline(transaction=False)
+    for metric in _metrics:
+        pipe.hgetall(metric.key)
+
+    lines = []
+    for metric, values in zip(_metrics, pipe.execute()):
+        values = {field.decode(): value.decode() for field, value in values.items()}
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for series, value in metric.samples(values):
+            lines.append(f"{series} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Time Celery tasks spent running",
+    buckets=[0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300],
+)
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time Celery tasks waited between being due and starting",
+    buckets=[0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 900],
+)
+TASK_RUNS = Counter("celery_task_runs_total", "Celery task runs by final state")
+TASK_RETRIES = Counter("celery_task_retries_total", "Celery task retries")
+TASK_FAILURES = Counter("celery_task_failures_total", "Celery task failures by exception")
+TASK_COMPANY_DURATION = Histogram(
+    "celery_task_company_duration_seconds",
+    "Time Celery tasks spent on each company",
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30],
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving requests, by URL name",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+HTTP_REQUESTS = Counter("http_requests_total", "Requests served, by URL name and status")
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries run per request",
+    buckets=[0, 1, 2, 5, 10, 20, 50, 100],
+)
+HTTP_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5],
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of response bodies",
+    buckets=[100, 1000, 10000, 100000, 1000000, 10000000],
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups made by requests, by result")
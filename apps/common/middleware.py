@@ -0,0 +1,145 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from . import metrics, profiling
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that also runs in async mode. The stock one is
+    sync-only, which makes Django run every request under ASGI through a
+    thread, async views included. Only static file responses are served
+    from a thread here; everything else is passed straight through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record each request's latency, database queries and time, cache hits
+    and misses and response size, labelled by the resolved URL name so
+    the number of series stays bounded. Runs in both sync and async mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # Any other method is labelled "other", as clients can send arbitrary ones
+    METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        await sync_to_async(self.record, thread_sensitive=False)(
+            request, response, stats, time.perf_counter() - started
+        )
+        return response
+
+    def record(self, request, response, stats, duration):
+        match = request.resolver_match
+        route = match.view_name if match else "unresolved"
+        method = request.method if request.method in self.METHODS else "other"
+        with metrics.batch() as pipe:
+            metrics.HTTP_REQUEST_DURATION.observe(
+                duration, pipe=pipe, route=route, method=method
+            )
+            metrics.HTTP_REQUESTS.inc(
+                pipe=pipe, route=route, method=method, status=response.status_code
+            )
+            metrics.HTTP_DB_QUERIES.observe(stats.queries, pipe=pipe, route=route)
+            metrics.HTTP_DB_DURATION.observe(stats.query_time, pipe=pipe, route=route)
+            if not response.streaming:
+                metrics.HTTP_RESPONSE_SIZE.observe(
+                    len(response.content), pipe=pipe, route=route
+                )
+            if stats.cache_hits:
+                metrics.CACHE_LOOKUPS.inc(stats.cache_hits, pipe=pipe, route=route, result="hit")
+            if stats.cache_misses:
+                metrics.CACHE_LOOKUPS.inc(
+                    stats.cache_misses, pipe=pipe, route=route, result="miss"
+                )
+
+
+class RequestProfilerMiddleware(MiddlewareMixin):
+    """
+    Profile a request when a superuser asks for it with ?_profile=1 or an
+    X-Profile: 1 header. The view runs under cProfile with its queries
+    logged, and the response carries X-Profile-Id and X-Profile-Url for
+    the stored result. Profiles are rate limited per user and only one
+    runs at a time per process; requests over either limit run normally.
+
+    Hooked in at process_view, which Django runs in the same thread as a
+    sync view under both WSGI and ASGI. Async views are not profiled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not profiling.requested(request) or iscoroutinefunction(view_func):
+            return None
+        user = profiling.superuser(request)
+        if user is None or not profiling.allowed(user):
+            return None
+
+        response, profile_id = profiling.profile(
+            request, user, view_func, view_args, view_kwargs
+        )
+        if profile_id:
+            response["X-Profile-Id"] = profile_id
+            response["X-Profile-Url"] = reverse(
+                "api:profile-detail", kwargs={"version": "v1", "pk": profile_id}
+            )
+        return response
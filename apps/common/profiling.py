@@ -0,0 +1,154 @@
+import cProfile
+import json
+import logging
+import marshal
+import threading
+import time
+import uuid
+import redis
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .redis import get_redis
+from .throttling import take_tokens
+
+logger = logging.getLogger(__name__)
+
+# One profiled request at a time per process; others run unprofiled
+_lock = threading.Lock()
+
+
+def _key(profile_id, part):
+    return f"profile:{profile_id}:{part}"
+
+
+def requested(request):
+    return request.GET.get("_profile") == "1" or request.headers.get("X-Profile") == "1"
+
+
+def superuser(request):
+    """The superuser making the request, from the session or a bearer token"""
+    from ..users.authentication import CachedJWTAuthentication
+
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = CachedJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+        user = authenticated[0] if authenticated else None
+    return user if user is not None and user.is_superuser else None
+
+
+def allowed(user):
+    """Whether the user still has profiles left under THROTTLE_BUCKETS["profile"]"""
+    return take_tokens("profile", f"user:{user.pk}") is None
+
+
+class QueryLog:
+    """Execute wrapper totalling time and calls per SQL statement"""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            entry = self.statements.setdefault(sql, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def summary(self, limit):
+        top = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "count": sum(calls for calls, _ in self.statements.values()),
+            "time_ms": round(sum(spent for _, spent in self.statements.values()) * 1000, 2),
+            "statements": [
+                {"sql": sql, "calls": calls, "time_ms": round(spent * 1000, 2)}
+                for sql, (calls, spent) in top[:limit]
+            ],
+        }
+
+
+def _top_functions(stats, limit):
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "own_ms": round(own * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def profile(request, user, view_func, view_args, view_kwargs):
+    """
+    Run the view, and render its response, under cProfile with every
+    query logged. Returns the response and the stored profile's id, or
+    None for the id if another request is already being profiled here or
+    the profile could not be stored.
+    """
+    if not _lock.acquire(blocking=False):
+        return view_func(request, *view_args, **view_kwargs), None
+
+    try:
+        queries = QueryLog()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            profiler.enable()
+            try:
+                response = view_func(request, *view_args, **view_kwargs)
+                if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                    response.render()
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+    finally:
+        _lock.release()
+
+    profiler.create_stats()
+    limit = settings.PROFILE_TOP_ENTRIES
+    summary = {
+        "at": time.time(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "user": str(user.pk),
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+        "queries": queries.summary(limit),
+        "functions": _top_functions(profiler.stats, limit),
+    }
+    try:
+        return response, save(summary, marshal.dumps(profiler.stats))
+    except redis.RedisError as e:
+        logger.warning("Failed to store profile: %s", e)
+        return response, None
+
+
+def save(summary, stats):
+    """Keep a profile for PROFILE_TTL seconds; returns its id"""
+    profile_id = uuid.uuid4().hex
+    summary["id"] = profile_id
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.set(_key(profile_id, "summary"), json.dumps(summary), ex=settings.PROFILE_TTL)
+    pipe.set(_key(profile_id, "stats"), stats, ex=settings.PROFILE_TTL)
+    pipe.execute()
+    return profile_id
+
+
+def load_summary(profile_id):
+    summary = get_redis().get(_key(profile_id, "summary"))
+    return json.loads(summary) if summary else None
+
+
+def load_stats(profile_id):
+    """The profile in pstats' file format, or None once it has expired"""
+    return get_redis().get(_key(profile_id, "stats"))
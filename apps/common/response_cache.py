@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Tags name what a cached response was built from:
+#   company:{id}   anything belonging to the company
+#   agent:{id}     an agent, addressed by its user id as in the agent URLs
+#   customer:{id}  a customer, and the transactions listed with it
+# Each tag has a version; invalidating a tag replaces its version, so
+# every entry keyed with the old one is never read again and expires.
+# Versions expire too, well after the responses keyed with them; a tag
+# whose version expired simply starts again with a new one.
+TAG_VERSION_TTL_FACTOR = 10
+
+
+def _tag_key(tag):
+    return f"respcache:tag:{tag}"
+
+
+def _tag_timeout():
+    return settings.RESPONSE_CACHE_TTL * TAG_VERSION_TTL_FACTOR
+
+
+def _versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=_tag_timeout())
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Drop every cached response carrying any of the tags"""
+    tags = [tag for tag in tags if not tag.endswith(":None")]
+    if tags:
+        cache.set_many(
+            {_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=_tag_timeout()
+        )
+
+
+def invalidate_on_commit(*tags):
+    # After commit, so a request racing the write cannot cache the old rows
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+class CachedResponseMixin:
+    """
+    Cache the rendered body of successful GET list and retrieve responses,
+    keyed by path, query parameters, tenant, role, media type and the
+    versions of the view's cache_tags(). A hit is answered before the view
+    runs, skipping its queries, serializer and renderer; authentication,
+    permissions and throttles still apply. Superusers are never cached.
+    """
+
+    cache_actions = ("list", "retrieve")
+
+    def cache_tags(self):
+        """Tags of the data the response is built from; None disables caching"""
+        company_id = self.request.tenant.company_id
+        return [f"company:{company_id}"] if company_id else None
+
+    def _cache_key(self, request, tags):
+        tenant = request.tenant
+        parts = [
+            request.path,
+            sorted(request.query_params.lists()),
+            tenant.company_id,
+            tenant.agent_pk,
+            tenant.role,
+            request.accepted_media_type,
+            _versions(tags),
+        ]
+        digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+        return f"respcache:{digest}"
+
+    def _cached_response(self, request):
+        """
+        The cached response for the request, or None. On a miss the key is
+        remembered, so finalize_response stores the response under it.
+        """
+        action = getattr(self, "action", None)
+        if request.method != "GET" or request.user.is_superuser:
+            return None
+        if action is not None and action not in self.cache_actions:
+            return None
+
+        tags = self.cache_tags()
+        if not tags:
+            return None
+        try:
+            key = self._cache_key(request, tags)
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning("Response cache unavailable: %s", e)
+            return None
+
+        if cached is None:
+            self.response_cache_key = key
+            return None
+
+        status_code, content_type, body = cached
+        response = HttpResponse(body, status=status_code, content_type=content_type)
+        response["X-Cache"] = "hit"
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch, answering from the cache between initial(), which
+        # authenticates and checks permissions, and the handler
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        self.response_cache_key = None
+
+        try:
+            self.initial(request, *args, **kwargs)
+            response = self._cached_response(request)
+            if response is None:
+                if request.method.lower() in self.http_method_names:
+                    handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+                else:
+                    handler = self.http_method_not_allowed
+                response = handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, "response_cache_key", None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            try:
+                cache.set(
+                    key,
+                    (response.status_code, response["Content-Type"], response.content),
+                    timeout=settings.RESPONSE_CACHE_TTL,
+                )
+            except Exception as e:
+                logger.warning("Response cache unavailable: %s", e)
+            response["X-Cache"] = "miss"
+        return response
+
+
+def _company_changed(sender, instance, **kwargs):
+    invalidate_on_commit(f"company:{instance.pk}")
+
+
+def _agent_changed(sender, instance, **kwargs):
+    invalidate_on_commit(f"company:{instance.company_id}", f"agent:{instance.user_id_id}")
+
+
+def _customer_changed(sender, instance, **kwargs):
+    from ..agents.models import Agent
+
+    company_id = (
+        Agent.objects.filter(pk=instance.created_by_id)
+        .values_list("company_id", flat=True)
+        .first()
+    )
+    invalidate_on_commit(f"company:{company_id}", f"customer:{instance.pk}")
+
+
+def _user_changed(sender, instance, **kwargs):
+    # Company and agent responses nest their owner's or agent's user
+    from ..companies.models import Company
+
+    company_ids = Company.objects.filter(
+        Q(owner_id=instance.pk) | Q(agents__user_id=instance.pk)
+    ).values_list("id", flat=True)
+    invalidate_on_commit(
+        f"agent:{instance.pk}", *(f"company:{company_id}" for company_id in company_ids)
+    )
+
+
+def _transaction_changed(sender, instance, **kwargs):
+    # Only transactions saved through the ORM; rows written by other
+    # systems show up once cached responses expire (RESPONSE_CACHE_TTL)
+    from ..agents.models import Agent
+
+    company_id = (
+        Agent.objects.filter(pk=instance.agent_id_id)
+        .values_list("company_id", flat=True)
+        .first()
+    )
+    invalidate_on_commit(f"company:{company_id}", f"customer:{instance.customer_id_id}")
+
+
+def connect():
+    receivers = {
+        "companies.Company": _company_changed,
+        "agents.Agent": _agent_changed,
+        "customers.Customer": _customer_changed,
+        "users.User": _user_changed,
+        "external_tables.Transaction": _transaction_changed,
+    }
+    for sender, receiver in receivers.items():
+        post_save.connect(receiver, sender=sender, weak=False)
+        post_delete.connect(receiver, sender=sender, weak=False)
@@ -0,0 +1,61 @@
+import time
+from datetime import datetime
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, task_retry
+from . import metrics
+
+# Start times of the tasks running in this worker, by task id
+_started = {}
+
+
+def stamp_published(headers=None, **kwargs):
+    """Record when a task was sent, so its queue wait can be measured"""
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+def _due_at(request):
+    published_at = getattr(request, "published_at", None)
+    if published_at is None:
+        published_at = (getattr(request, "headers", None) or {}).get("published_at")
+    if request.eta:
+        eta = request.eta
+        if isinstance(eta, str):
+            eta = datetime.fromisoformat(eta)
+        # A task scheduled for later only starts waiting at its eta
+        return max(published_at or 0, eta.timestamp())
+    return published_at
+
+
+def record_start(task_id=None, task=None, **kwargs):
+    now = time.time()
+    _started[task_id] = time.perf_counter()
+    due_at = _due_at(task.request)
+    if due_at:
+        metrics.TASK_QUEUE_WAIT.observe(max(0, now - due_at), task=task.name)
+
+
+def record_finish(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    with metrics.batch() as pipe:
+        if started is not None:
+            metrics.TASK_DURATION.observe(
+                time.perf_counter() - started, pipe=pipe, task=task.name, state=state
+            )
+        metrics.TASK_RUNS.inc(pipe=pipe, task=task.name, state=state)
+
+
+def record_retry(sender=None, **kwargs):
+    metrics.TASK_RETRIES.inc(task=sender.name)
+
+
+def record_failure(sender=None, exception=None, **kwargs):
+    # The run itself is counted by task_postrun with state FAILURE
+    metrics.TASK_FAILURES.inc(task=sender.name, exception=type(exception).__name__)
+
+
+def connect():
+    before_task_publish.connect(stamp_published, weak=False)
+    task_prerun.connect(record_start, weak=False)
+    task_postrun.connect(record_finish, weak=False)
+    task_retry.connect(record_retry, weak=False)
+    task_failure.connect(record_failure, weak=False)
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import time
+import traceback
+from contextvars import ContextVar
+import redis
+from django.conf import settings
+from .redis import get_redis
+
+# Most recent slow queries first, trimmed to SLOW_QUERY_LOG_SIZE entries
+LOG_KEY = "slowlog:queries"
+
+logger = logging.getLogger(__name__)
+
+# The query instrumentation itself, left out of recorded call sites
+_own_files = {__file__, os.path.join(os.path.dirname(__file__), "db.py")}
+
+# Set while the EXPLAIN of a slow query runs, so it is never flagged itself
+_explaining = ContextVar("explaining_slow_query", default=False)
+
+
+def _call_site():
+    """The project's own frames in the current stack, innermost last"""
+    apps_dir = str(settings.APPS_DIR)
+    return [
+        f"{frame.filename.removeprefix(str(settings.BASE_DIR))}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(apps_dir) and frame.filename not in _own_files
+    ]
+
+
+def _mask_value(value):
+    # Values can be password hashes, emails or OTP hashes: keep only their type
+    return None if value is None else f"<{type(value).__name__}>"
+
+
+def _masked(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: _mask_value(value) for name, value in params.items()}
+    return [_mask_value(value) for value in params]
+
+
+def _explain(connection, sql, params):
+    if sql.lstrip()[:6].upper() != "SELECT":
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [[str(column) for column in row] for row in cursor.fetchall()]
+    except Exception as e:
+        return [[f"EXPLAIN failed: {e}"]]
+    finally:
+        _explaining.reset(token)
+
+
+def record(connection, sql, params, many, duration):
+    """Store a query that took longer than SLOW_QUERY_THRESHOLD_MS"""
+    if _explaining.get():
+        return
+
+    entry = {
+        "at": time.time(),
+        "duration_ms": round(duration * 1000, 2),
+        "database": connection.alias,
+        "sql": sql,
+        "params": None if many else _masked(params),
+        "stack": _call_site(),
+        "plan": None if many or not settings.SLOW_QUERY_EXPLAIN else _explain(connection, sql, params),
+    }
+    payload = json.dumps(entry)
+
+    if settings.SLOW_QUERY_LOG_JSON:
+        logger.warning(payload)
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.lpush(LOG_KEY, payload)
+        pipe.ltrim(LOG_KEY, 0, settings.SLOW_QUERY_LOG_SIZE - 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to store slow query: %s", e)
+
+
+def recent(limit=None):
+    """The latest slow queries, newest first"""
+    limit = limit or settings.SLOW_QUERY_LOG_SIZE
+    return [json.loads(entry) for entry in get_redis().lrange(LOG_KEY, 0, limit - 1)]
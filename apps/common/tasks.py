@@ -0,0 +1,92 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import EmailOutbox
+
+
+def _claim_batch(batch_size):
+    """Mark up to batch_size due emails as sending and return their ids"""
+    now = timezone.now()
+
+    # Emails left in sending by a worker that died are due again
+    EmailOutbox.objects.filter(
+        status="sending", updated_at__lt=now - settings.EMAIL_OUTBOX_SENDING_TIMEOUT
+    ).update(status="pending", updated_at=now)
+
+    with transaction.atomic():
+        due = EmailOutbox.objects.filter(
+            status="pending", next_attempt_at__lte=now
+        ).order_by("next_attempt_at")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list("id", flat=True)[:batch_size])
+        EmailOutbox.objects.filter(id__in=ids).update(status="sending", updated_at=now)
+    return ids
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = "failed"
+    else:
+        email.status = "pending"
+        email.next_attempt_at = timezone.now() + (
+            settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        )
+    email.save(
+        update_fields=["attempts", "last_error", "status", "next_attempt_at", "updated_at"]
+    )
+
+
+@shared_task(bind=True)
+def deliver_outbox(self, batch_size=None):
+    """Send due outbox emails, reusing one SMTP connection for the batch"""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    ids = _claim_batch(batch_size)
+    if not ids:
+        return "No emails to send"
+
+    emails = list(EmailOutbox.objects.filter(id__in=ids))
+    sent_ids = []
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+    except Exception as e:
+        for email in emails:
+            _record_failure(email, e)
+        return f"Could not connect to mail server: {e}"
+
+    try:
+        for email in emails:
+            try:
+                mail_connection.send_messages([email.to_message(mail_connection)])
+                sent_ids.append(email.id)
+            except Exception as e:
+                _record_failure(email, e)
+    finally:
+        mail_connection.close()
+
+    # Bodies carry one-time passwords and reset links; drop them once delivered
+    now = timezone.now()
+    EmailOutbox.objects.filter(id__in=sent_ids).update(
+        status="sent", sent_at=now, last_error=None, body="", html_body=None, updated_at=now
+    )
+
+    # A full batch means more mail may be waiting
+    if len(ids) == batch_size:
+        self.delay(batch_size)
+
+    return f"Sent {len(sent_ids)} of {len(ids)} emails"
+
+
+@shared_task
+def purge_email_outbox():
+    """Delete sent and failed emails older than EMAIL_OUTBOX_RETENTION"""
+    deleted, _ = EmailOutbox.objects.filter(
+        status__in=["sent", "failed"],
+        updated_at__lt=timezone.now() - settings.EMAIL_OUTBOX_RETENTION,
+    ).delete()
+    return f"Purged {deleted} outbox emails"
@@ -1,3 +1,430 @@
-from django.test import TestCase
+import marshal
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+import redis
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from apps.agents.models import Agent
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.users.tokens import tokens_for_user
+from . import db, metrics, profiling, response_cache, signals, slow_queries
+from .mail import queue_email
+from .models import EmailOutbox
+from .renderers import ORJSONParser, ORJSONRenderer
+from .tasks import deliver_outbox, purge_email_outbox
+from .throttling import parse_rate
 
-# Create your tests here.
+
+class EmailOutboxTestCase(TestCase):
+    def test_email_is_delivered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            email = queue_email(
+                subject="Hello",
+                body="Plain body",
+                html_body="<p>HTML body</p>",
+                to=["someone@example.com"],
+            )
+            self.assertEqual(len(mail.outbox), 0)
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "sent")
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(email.body, "")
+        self.assertIsNone(email.html_body)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["someone@example.com"])
+        self.assertEqual(len(mail.outbox[0].alternatives), 1)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        email = queue_email(subject="Hello", body="Body", to=["someone@example.com"])
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("Connection reset"),
+        ):
+            deliver_outbox()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("Connection reset", email.last_error)
+        self.assertGreater(email.next_attempt_at, email.created_at)
+
+        # Not due yet, so nothing is claimed
+        deliver_outbox()
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_delivery_gives_up_after_max_attempts(self):
+        email = queue_email(subject="Hello", body="Body", to=["someone@example.com"])
+        EmailOutbox.objects.filter(id=email.id).update(attempts=4)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("Connection reset"),
+        ):
+            deliver_outbox()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+
+    def test_old_sent_and_failed_emails_are_purged(self):
+        old = timezone.now() - settings.EMAIL_OUTBOX_RETENTION - timedelta(hours=1)
+        for status in ("sent", "failed", "pending"):
+            email = queue_email(subject=status, body="Body", to=["someone@example.com"])
+            EmailOutbox.objects.filter(id=email.id).update(status=status, updated_at=old)
+        queue_email(subject="recent", body="Body", to=["someone@example.com"])
+        EmailOutbox.objects.filter(subject="recent").update(status="sent")
+
+        purge_email_outbox()
+
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list("subject", flat=True)), ["pending", "recent"]
+        )
+
+
+class TokenBucketThrottleTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("api:login", kwargs={"version": "v1"})
+        self.data = {"email": "someone@example.com", "password": "wrong"}
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("10/min"), (10, 10 / 60))
+        self.assertEqual(parse_rate("5/hour"), (5, 5 / 3600))
+
+    def test_throttled_request_is_rejected_before_the_view(self):
+        script = mock.Mock(return_value=[0, "12.5"])
+        with mock.patch(
+            "apps.common.throttling._token_bucket_script", return_value=script
+        ), self.assertNumQueries(0):
+            response = self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "13")
+        keys = script.call_args.kwargs["keys"]
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(keys[0].startswith("throttle:login:ip:"))
+        self.assertTrue(keys[1].startswith("throttle:login:email:"))
+
+    def test_requests_are_allowed_when_redis_is_down(self):
+        script = mock.Mock(side_effect=redis.ConnectionError("down"))
+        with mock.patch(
+            "apps.common.throttling._token_bucket_script", return_value=script
+        ):
+            response = self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeRedis:
+    """Just enough of a Redis client for the hash-backed metrics store"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.results = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+        self.results.append(fields[field])
+
+    hincrbyfloat = hincrby
+
+    def set(self, key, value, ex=None):
+        self.hashes[key] = value.encode() if isinstance(value, str) else value
+        self.results.append(True)
+
+    def get(self, key):
+        return self.hashes.get(key)
+
+    def lpush(self, key, value):
+        self.hashes.setdefault(key, []).insert(0, value.encode())
+        self.results.append(len(self.hashes[key]))
+
+    def ltrim(self, key, start, end):
+        self.hashes[key] = self.hashes.get(key, [])[start : end + 1]
+        self.results.append(True)
+
+    def lrange(self, key, start, end):
+        return self.hashes.get(key, [])[start : end + 1]
+
+    def hgetall(self, key):
+        self.results.append(
+            {
+                field.encode(): str(value).encode()
+                for field, value in self.hashes.get(key, {}).items()
+            }
+        )
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(metrics, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_task_signals_record_duration_and_outcome(self):
+        task = SimpleNamespace(
+            name="apps.companies.tasks.broadcast_company_metrics",
+            request=SimpleNamespace(published_at=None, headers=None, eta=None),
+        )
+        signals.record_start(task_id="1", task=task)
+        signals.record_finish(task_id="1", task=task, state="SUCCESS")
+
+        body = metrics.render()
+        labels = 'state="SUCCESS",task="apps.companies.tasks.broadcast_company_metrics"'
+        self.assertIn(f"celery_task_runs_total{{{labels}}} 1", body)
+        self.assertIn(f'celery_task_duration_seconds_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertIn(f"celery_task_duration_seconds_count{{{labels}}} 1", body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_requires_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE celery_task_queue_wait_seconds histogram", response.content.decode())
+
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_metrics_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_requests_are_measured_per_route(self):
+        user = User.objects.create_user(
+            email="metrics@example.com",
+            password="StrongPassword123!",
+            first_name="Metrics",
+            last_name="Owner",
+            role="owner",
+            phone="4445556667",
+            nin="44455566677",
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with connection.execute_wrapper(db.instrument_queries):
+            response = client.get(reverse("api:company-list", kwargs={"version": "v1"}))
+        self.assertEqual(response.status_code, 200)
+
+        body = metrics.render()
+        self.assertIn(
+            'http_requests_total{method="GET",route="api:company-list",status="200"} 1', body
+        )
+        self.assertIn('http_request_db_queries_count{route="api:company-list"} 1', body)
+        self.assertNotIn('http_request_db_queries_bucket{route="api:company-list",le="0"} 1', body)
+        self.assertIn('http_response_size_bytes_count{route="api:company-list"} 1', body)
+
+        client.generic("BREW", reverse("api:company-list", kwargs={"version": "v1"}))
+        self.assertIn('method="other",route="api:company-list"', metrics.render())
+
+
+class SlowQueryLogTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(slow_queries, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.superuser = User.objects.create_superuser(
+            email="admin@example.com",
+            password="StrongPassword123!",
+            first_name="Admin",
+            last_name="User",
+            phone="7778889990",
+            role="owner",
+            nin="77788899900",
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_SIZE=3)
+    def test_slow_queries_are_kept_with_their_plan(self):
+        with connection.execute_wrapper(db.instrument_queries):
+            for _ in range(5):
+                list(User.objects.filter(email="admin@example.com"))
+
+        client = APIClient()
+        client.force_authenticate(user=self.superuser)
+        response = client.get(reverse("api:slow-query-list", kwargs={"version": "v1"}))
+
+        self.assertEqual(response.status_code, 200)
+        queries = response.json()
+        self.assertEqual(len(queries), 3)
+        self.assertIn("users", queries[0]["sql"])
+        self.assertEqual(queries[0]["params"], ["<str>"])
+        self.assertTrue(queries[0]["plan"])
+        self.assertTrue(any("apps/common/tests.py" in frame for frame in queries[0]["stack"]))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_JSON=True)
+    def test_parameter_values_are_never_logged(self):
+        secret = self.superuser.password
+        with mock.patch.object(slow_queries, "logger") as logger:
+            with connection.execute_wrapper(db.instrument_queries):
+                list(User.objects.filter(password=secret))
+
+        logged = " ".join(str(call) for call in logger.warning.call_args_list)
+        self.assertIn("<str>", logged)
+        self.assertNotIn(secret, logged)
+        stored = slow_queries.recent()
+        self.assertTrue(stored)
+        self.assertNotIn(secret, str(stored))
+
+    def test_only_superusers_can_read_the_log(self):
+        user = User.objects.create_user(
+            email="owner@example.com",
+            password="StrongPassword123!",
+            first_name="Owner",
+            last_name="User",
+            role="owner",
+            phone="7778889991",
+            nin="77788899901",
+        )
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse("api:slow-query-list", kwargs={"version": "v1"}))
+        self.assertEqual(response.status_code, 403)
+
+
+class RequestProfilerTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(profiling, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(profiling, "take_tokens", return_value=None)
+        self.take_tokens = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.superuser = User.objects.create_superuser(
+            email="profiler@example.com",
+            password="StrongPassword123!",
+            first_name="Profiler",
+            last_name="User",
+            phone="6667778889",
+            role="owner",
+            nin="66677788899",
+        )
+        _, access = tokens_for_user(self.superuser)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+        self.url = reverse("api:company-list", kwargs={"version": "v1"})
+
+    def test_superuser_gets_a_downloadable_profile(self):
+        response = self.client.get(f"{self.url}?_profile=1", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        profile_id = response["X-Profile-Id"]
+
+        summary = self.client.get(response["X-Profile-Url"], **self.auth).json()
+        self.assertEqual(summary["path"], f"{self.url}?_profile=1")
+        self.assertGreaterEqual(summary["queries"]["count"], 1)
+        self.assertTrue(summary["functions"])
+
+        download = self.client.get(
+            reverse("api:profile-download", kwargs={"version": "v1", "pk": profile_id}),
+            **self.auth,
+        )
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(marshal.loads(download.content))
+
+    def test_profiles_are_rate_limited(self):
+        self.take_tokens.return_value = 60
+        response = self.client.get(self.url, HTTP_X_PROFILE="1", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+
+class ResponseCacheTestCase(TestCase):
+    def test_hits_skip_the_view_until_a_save_invalidates_them(self):
+        owner = User.objects.create_user(
+            email="cacheowner@example.com",
+            password="StrongPassword123!",
+            first_name="Cache",
+            last_name="Owner",
+            role="owner",
+            phone="3334445556",
+            nin="33344455566",
+        )
+        company = Company.objects.create(
+            owner=owner, name="Cache Company", state="S", lga="L", area="A"
+        )
+        agent_user = User.objects.create_user(
+            email="cacheagent@example.com",
+            password="StrongPassword123!",
+            first_name="Cache",
+            last_name="Agent",
+            role="agent",
+            phone="3334445557",
+            nin="33344455567",
+        )
+        agent = Agent.objects.create(user_id=agent_user, company=company)
+        client = APIClient()
+        client.force_authenticate(user=owner)
+        url = reverse("api:agent-create", kwargs={"version": "v1"})
+
+        first = client.get(url)
+        self.assertEqual(first["X-Cache"], "miss")
+        with self.assertNumQueries(0):
+            second = client.get(url)
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agent.status = "inactive"
+            agent.save()
+        third = client.get(url)
+        self.assertEqual(third["X-Cache"], "miss")
+        self.assertNotEqual(third.content, first.content)
+
+    def test_tag_versions_expire(self):
+        with mock.patch.object(response_cache.cache, "set_many") as set_many:
+            response_cache.invalidate("company:expiring")
+        self.assertEqual(
+            set_many.call_args.kwargs["timeout"],
+            settings.RESPONSE_CACHE_TTL * response_cache.TAG_VERSION_TTL_FACTOR,
+        )
+
+
+class ORJSONRendererTestCase(TestCase):
+    def test_output_matches_drf_json_renderer(self):
+        data = {
+            "amount": Decimal("1250.50"),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "status": gettext_lazy("Completed"),
+            "at": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            "name": "Adéolá",
+            "items": [1, 2.5, None, True],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser_reads_bodies_and_rejects_bad_json(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(BytesIO(b'{"amount": "1.50"}')), {"amount": "1.50"})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b"{not json"))
+
+    def test_benchmark_command_reports_both_encoders(self):
+        out = StringIO()
+        call_command("benchmark_json", rows=20, repeat=1, number=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn("transaction list", output)
+        self.assertIn("summary", output)
+        self.assertNotIn("identical output: no", output)
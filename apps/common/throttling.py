@@ -0,0 +1,110 @@
+import hashlib
+import math
+import redis
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+from .redis import get_redis
+
+PERIODS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+# Take one token from every bucket in KEYS, or from none of them.
+# ARGV holds a capacity and refill rate (tokens per second) per key.
+# Returns {allowed, seconds to wait} with the wait as a string, because
+# Lua numbers are truncated to integers on the way back to the client.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens, wait = {}, 0
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+
+local allowed = wait == 0 and 1 or 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tokens[i] - allowed, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+
+return {allowed, tostring(wait)}
+"""
+
+_script = None
+
+
+def parse_rate(rate):
+    """Parse "capacity/period" into (capacity, tokens refilled per second)"""
+    capacity, period = rate.split("/")
+    capacity = int(capacity)
+    return capacity, capacity / PERIODS[period]
+
+
+def _token_bucket_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def take_tokens(scope, ident, email=None):
+    """
+    Charge one request against the IP and email buckets configured for
+    settings.THROTTLE_BUCKETS[scope]. Returns None if the request is
+    allowed, otherwise the whole number of seconds until it would be.
+    Requests are let through if Redis is unavailable.
+    """
+    limits = settings.THROTTLE_BUCKETS[scope]
+    buckets = []
+    if "ip" in limits:
+        buckets.append((f"throttle:{scope}:ip:{ident}", limits["ip"]))
+    if "email" in limits and isinstance(email, str) and email.strip():
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        buckets.append((f"throttle:{scope}:email:{digest}", limits["email"]))
+    if not buckets:
+        return None
+
+    keys, args = [], []
+    for key, rate in buckets:
+        capacity, refill = parse_rate(rate)
+        keys.append(key)
+        args.extend([capacity, refill])
+
+    try:
+        allowed, wait = _token_bucket_script()(keys=keys, args=args)
+    except redis.RedisError:
+        return None
+
+    if int(allowed):
+        return None
+    return math.ceil(float(wait))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle around take_tokens for unauthenticated endpoints, keyed by
+    client IP and by the email in the request body. The view's
+    throttle_scope selects the limits. Throttled requests get a 429 with
+    Retry-After before the view does any hashing or database work.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        self.wait_seconds = take_tokens(view.throttle_scope, self.get_ident(request), email)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,12 @@
+from django.urls import path
+from .views import ProfileDetailView, ProfileDownloadView, SlowQueryListView
+
+urlpatterns = [
+    path("slow-queries/", SlowQueryListView.as_view(), name="slow-query-list"),
+    path("profiles/<str:pk>/", ProfileDetailView.as_view(), name="profile-detail"),
+    path(
+        "profiles/<str:pk>/download/",
+        ProfileDownloadView.as_view(),
+        name="profile-download",
+    ),
+]
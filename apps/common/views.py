@@ -1,3 +1,135 @@
-from django.shortcuts import render
+import logging
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import metrics, profiling, slow_queries
+from ..users.permissions import IsSuperuser
 
-# Create your views here.
+logger = logging.getLogger(__name__)
+
+
+@require_GET
+def metrics_view(request):
+    """Request and task metrics in the Prometheus text format"""
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not constant_time_compare(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        # Labels carry company ids, so never serve them unauthenticated in production
+        return HttpResponse("METRICS_TOKEN is not set\n", status=403, content_type="text/plain")
+
+    try:
+        body = metrics.render()
+    except redis.RedisError as e:
+        logger.warning("Failed to read metrics: %s", e)
+        return HttpResponse("Metrics store unavailable\n", status=503, content_type="text/plain")
+
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class SlowQueryListView(APIView):
+    permission_classes = [IsSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="List slow queries",
+        operation_description="Retrieve the most recent database queries slower than the configured threshold, newest first, with their parameter types, call site and EXPLAIN plan.",
+        manual_parameters=[
+            openapi.Parameter(
+                "limit",
+                openapi.IN_QUERY,
+                description="Maximum number of queries to return.",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        responses={
+            200: "Slow queries retrieved successfully.",
+            400: "Invalid limit.",
+            403: "Permission denied.",
+            503: "Slow query log unavailable.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", 0)) or None
+        except ValueError:
+            return Response(
+                {"message": "Invalid limit", "error": "limit must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            queries = slow_queries.recent(limit)
+        except redis.RedisError as e:
+            return Response(
+                {"message": "Slow query log unavailable", "error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response(queries, status=status.HTTP_200_OK)
+
+
+class ProfileDetailView(APIView):
+    permission_classes = [IsSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a request profile",
+        operation_description="Retrieve the summary of a profiled request: its slowest functions and a per-statement breakdown of its queries. Profile a request by sending it as a superuser with ?_profile=1 or an X-Profile: 1 header.",
+        responses={
+            200: "Profile retrieved successfully.",
+            403: "Permission denied.",
+            404: "Profile not found or expired.",
+            503: "Profile store unavailable.",
+        },
+    )
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            summary = profiling.load_summary(pk)
+        except redis.RedisError as e:
+            return Response(
+                {"message": "Profile store unavailable", "error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if summary is None:
+            return Response(
+                {"message": "Profile not found", "error": "The profile does not exist or has expired."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="Download a request profile",
+        operation_description="Download the full cProfile output of a profiled request, for pstats, snakeviz or similar tools.",
+        responses={
+            200: "Profile file downloaded successfully.",
+            403: "Permission denied.",
+            404: "Profile not found or expired.",
+            503: "Profile store unavailable.",
+        },
+    )
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            stats = profiling.load_stats(pk)
+        except redis.RedisError as e:
+            return Response(
+                {"message": "Profile store unavailable", "error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if stats is None:
+            return Response(
+                {"message": "Profile not found", "error": "The profile does not exist or has expired."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        response = HttpResponse(stats, content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="profile-{pk}.prof"'
+        return response
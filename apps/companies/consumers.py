@@ -1,13 +1,18 @@
 import asyncio
+import logging
 from asgiref.sync import sync_to_async
 from urllib.parse import parse_qs
 from django.utils.dateparse import parse_date
 from django.core.exceptions import ValidationError, PermissionDenied
-from django.core.cache import cache
+from django.conf import settings
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from . import feed, frames, registry
+from .sender import CoalescingSender
 from ..agents.models import Agent
 
+logger = logging.getLogger(__name__)
+
 
 class CompanyConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
@@ -16,34 +21,59 @@ class CompanyConsumer(AsyncJsonWebsocketConsumer):
             await self.close(code=4000, reason="Authentication required")
             return
 
-        await self.accept()
+        if not self.scope.get("company"):
+            await self.close(code=4003, reason="Only company owners can connect")
+            return
+
+        # Clients offering the msgpack subprotocol get binary frames
+        self.binary = frames.MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        await self.accept(subprotocol=frames.MSGPACK_SUBPROTOCOL if self.binary else None)
 
         self.conn = self.scope["connection_id"]
         self.company = self.scope["company"]
         self.params = parse_qs(self.scope["query_string"].decode())
+        # ?delta=0 keeps sending full snapshots for clients without patch support
+        self.frames = frames.FrameEncoder(delta=self.params.get("delta", ["1"])[0] != "0")
+        self.sender = CoalescingSender(
+            self._deliver, max_queue=settings.DASHBOARD_SEND_QUEUE_SIZE
+        )
+        self.sender.start()
 
         try:
             self.filters = await self._validate_filters()
+            self.signature = await sync_to_async(
+                registry.register, thread_sensitive=False
+            )(self.company.id, self.channel_name, self.filters)
 
             try:
+                # Company-wide events go to every socket; metrics go to the
+                # group of sockets sharing these filters, or straight to this
+                # channel when no other socket has them
                 await self.channel_layer.group_add(
-                    f"metrics_{self.company.id}",
-                    self.channel_name
+                    registry.company_group(self.company.id), self.channel_name
+                )
+                await self.channel_layer.group_add(
+                    registry.signature_group(self.company.id, self.signature),
+                    self.channel_name,
                 )
             except Exception as e:
-                print(f"Group add failed: {e}")
+                logger.warning("Group add failed: %s", e)
+
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
 
         except (ValidationError, PermissionDenied) as e:
             await self.close(code=4001, reason=str(e))
-        except Exception as e:
-            import traceback
+        except Exception:
+            logger.exception("Dashboard connection failed")
             await self.close(code=4000, reason="Internal server error")
 
     async def _validate_filters(self):
         """Validate and convert all filters"""
+        start_date, end_date = await self._validate_dates()
         filters = {
             "agent_id": await self._validate_agent(),
-            "date_range": await self._validate_dates(),
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
         }
         return filters
 
@@ -52,7 +82,7 @@ class CompanyConsumer(AsyncJsonWebsocketConsumer):
         start_date = end_date = None
         if "start_date" in self.params:
             try:
-                start_date = parse_date(self.params.get("start_date", None))
+                start_date = parse_date(self.params["start_date"][0])
                 if start_date is None:
                     raise ValidationError("Invalid start_date format (use YYYY-MM-DD)")
             except ValueError as e:
@@ -60,7 +90,7 @@ class CompanyConsumer(AsyncJsonWebsocketConsumer):
 
         if "end_date" in self.params:
             try:
-                end_date = parse_date(self.params.get("end_date", None))
+                end_date = parse_date(self.params["end_date"][0])
                 if end_date is None:
                     raise ValidationError("Invalid end_date format (use YYYY-MM-DD)")
             except ValueError as e:
@@ -83,38 +113,157 @@ class CompanyConsumer(AsyncJsonWebsocketConsumer):
         except Agent.DoesNotExist:
             raise ValidationError("Agent not found")
 
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        """Handle client requests; {"type": "resync"} asks for a full snapshot"""
+        try:
+            message = frames.unpack(text_data, bytes_data)
+        except (TypeError, ValueError):
+            return
+        if isinstance(message, dict) and message.get("type") == "resync":
+            self.frames.reset()
+
+    async def send_frame(self, frame):
+        if self.binary:
+            await self.send(bytes_data=frames.pack(frame, binary=True))
+        else:
+            await self.send(text_data=frames.pack(frame))
+
+    async def _deliver(self, message):
+        # Metrics are delta-encoded at delivery time, against the last
+        # snapshot the client actually received, not one it skipped
+        if message["type"] == "send_metrics":
+            frame = self.frames.encode(message["data"])
+            if frame is None:
+                return
+            message = {"type": "periodic_update", **frame, "timestamp": message["timestamp"]}
+        await self.send_frame(message)
+
     async def send_metrics(self, event):
-        """Send metrics to the WebSocket"""
+        """Queue the latest metrics, superseding any not yet sent"""
+        self.sender.offer(event, coalesce_key="metrics")
+
+    async def report_status(self, event):
+        """Notify the dashboard that a report job finished"""
+        self.sender.offer(
+            {
+                "type": "report_status",
+                "data": event["data"],
+                "timestamp": event["timestamp"],
+            }
+        )
+
+    async def _heartbeat(self):
+        """Keep this socket's registry entry alive while it is connected"""
+        register = sync_to_async(registry.register, thread_sensitive=False)
+        while True:
+            await asyncio.sleep(settings.DASHBOARD_HEARTBEAT_INTERVAL)
+            try:
+                await register(
+                    self.company.id, self.channel_name, self.filters, self.sender.stats()
+                )
+            except Exception as e:
+                logger.warning("Dashboard heartbeat failed: %s", e)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "heartbeat_task"):
+            self.heartbeat_task.cancel()
+        if hasattr(self, "sender"):
+            await self.sender.stop()
+
+        if hasattr(self, "signature"):
+            await sync_to_async(registry.unregister, thread_sensitive=False)(
+                self.company.id, self.channel_name
+            )
+            await self.channel_layer.group_discard(
+                registry.company_group(self.company.id), self.channel_name
+            )
+            await self.channel_layer.group_discard(
+                registry.signature_group(self.company.id, self.signature),
+                self.channel_name,
+            )
+
+        await super().disconnect(close_code)
+
 
-        if event.get("connection_id") == self.conn:
-            await self.send_json(
+class TransactionFeedConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams the company's inserted and updated transactions, as published
+    by the poll_transaction_feed task. Optional filters: agent_id, status
+    and min_amount, applied here to each published batch.
+    """
+
+    async def connect(self):
+        if not self.scope["user"].is_authenticated:
+            await self.close(code=4000, reason="Authentication required")
+            return
+
+        if not self.scope.get("company"):
+            await self.close(code=4003, reason="Only company owners can connect")
+            return
+
+        self.binary = frames.MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        await self.accept(subprotocol=frames.MSGPACK_SUBPROTOCOL if self.binary else None)
+
+        self.company = self.scope["company"]
+        try:
+            self.filters = feed.parse_filters(parse_qs(self.scope["query_string"].decode()))
+            if self.filters["agent_id"] and not await self._agent_exists():
+                raise ValidationError("Agent not found")
+        except (ValueError, ValidationError) as e:
+            await self.close(code=4001, reason=str(e))
+            return
+
+        self.sender = CoalescingSender(
+            self._deliver, max_queue=settings.DASHBOARD_SEND_QUEUE_SIZE
+        )
+        self.sender.start()
+        await self.channel_layer.group_add(feed.feed_group(self.company.id), self.channel_name)
+        self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    @database_sync_to_async
+    def _agent_exists(self):
+        return Agent.objects.filter(
+            agent_id=self.filters["agent_id"], company=self.company
+        ).exists()
+
+    async def _heartbeat(self):
+        """Keep the company on the poller's list while this socket is open"""
+        touch = sync_to_async(feed.touch, thread_sensitive=False)
+        while True:
+            try:
+                await touch(self.company.id)
+            except Exception as e:
+                logger.warning("Transaction feed heartbeat failed: %s", e)
+            await asyncio.sleep(settings.DASHBOARD_HEARTBEAT_INTERVAL)
+
+    async def _deliver(self, message):
+        if self.binary:
+            await self.send(bytes_data=frames.pack(message, binary=True))
+        else:
+            await self.send(text_data=frames.pack(message))
+
+    async def transaction_batch(self, event):
+        """Queue the batch's transactions that pass this socket's filters"""
+        transactions = [
+            transaction
+            for transaction in event["data"]
+            if feed.matches(transaction, self.filters)
+        ]
+        if transactions:
+            self.sender.offer(
                 {
-                    "type": "periodic_update",
-                    "data": event["data"],
+                    "type": "transactions",
+                    "data": transactions,
                     "timestamp": event["timestamp"],
                 }
             )
-        else:
-            print(
-                f"Connection ID mismatch: {event.get('connection_id')} != {self.conn}"
-            )
 
     async def disconnect(self, close_code):
-        if hasattr(self, "conn") and hasattr(self, "company"):
-            # Get the raw Redis client from Django's cache
-            redis_client = cache.client.get_client()
-
-            # Execute both operations in parallel
-            await asyncio.gather(
-                # Remove connection ID from company's list
-                sync_to_async(redis_client.lrem)(
-                    f"company:{self.company.id}:connections",
-                    1,  # Remove first occurrence
-                    self.conn
-                ),
-                # Delete connection-specific filters
-                sync_to_async(redis_client.delete)(
-                    f"connection_filters:{self.conn}"
-                )
+        if hasattr(self, "heartbeat_task"):
+            self.heartbeat_task.cancel()
+        if hasattr(self, "sender"):
+            await self.sender.stop()
+            await self.channel_layer.group_discard(
+                feed.feed_group(self.company.id), self.channel_name
             )
         await super().disconnect(close_code)
@@ -0,0 +1,134 @@
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from ..common.redis import get_redis
+from ..external_tables.models import Transaction
+
+# Companies with at least one live transaction feed socket, scored by last heartbeat
+FEED_COMPANIES_KEY = "feed:companies"
+# (updated_at, id) of the last transaction change the poller published
+WATERMARK_KEY = "feed:watermark"
+
+FEED_FIELDS = {
+    "id": "id",
+    "agent_id": "agent_id__agent_id",
+    "customer_id": "customer_id__customer_id",
+    "company_id": "agent_id__company_id",
+    "type": "type",
+    "description": "description",
+    "amount": "amount",
+    "fee": "fee",
+    "status": "status",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+
+def feed_group(company_id):
+    """Group of a company's transaction feed sockets"""
+    return f"transactions_{company_id}"
+
+
+def touch(company_id):
+    """Mark the company as having a live feed socket; called on connect and every heartbeat"""
+    get_redis().zadd(FEED_COMPANIES_KEY, {company_id: time.time()})
+
+
+def active_companies():
+    """Ids of companies with a feed heartbeat within the TTL"""
+    client = get_redis()
+    cutoff = time.time() - settings.DASHBOARD_CONNECTION_TTL
+    client.zremrangebyscore(FEED_COMPANIES_KEY, "-inf", f"({cutoff}")
+    return [company_id.decode() for company_id in client.zrange(FEED_COMPANIES_KEY, 0, -1)]
+
+
+def get_watermark():
+    value = get_redis().get(WATERMARK_KEY)
+    if not value:
+        return None
+    updated_at, last_id = json.loads(value)
+    return parse_datetime(updated_at), last_id
+
+
+def set_watermark(updated_at, last_id):
+    get_redis().set(WATERMARK_KEY, json.dumps([updated_at.isoformat(), last_id]))
+
+
+def changed_since(watermark, company_ids, limit):
+    """
+    Transactions of the given companies inserted or updated after the
+    watermark, oldest first. Ties on updated_at are broken by id, so a
+    batch cut in the middle of them resumes where it stopped.
+    """
+    updated_at, last_id = watermark
+    return list(
+        Transaction.objects.filter(agent_id__company_id__in=company_ids)
+        .filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id))
+        .order_by("updated_at", "id")
+        # Plus the raw agent and customer keys, for the agents' dashboards
+        .values(*FEED_FIELDS.values(), "agent_id", "customer_id")[:limit]
+    )
+
+
+def serialize(row):
+    """A changed row as sent to clients, keyed by FEED_FIELDS"""
+    data = {name: row[lookup] for name, lookup in FEED_FIELDS.items()}
+    for name in ("amount", "fee"):
+        if data[name] is not None:
+            data[name] = str(data[name])
+    for name in ("created_at", "updated_at"):
+        data[name] = data[name].isoformat()
+    return data
+
+
+def agent_update(row):
+    """A changed row as folded into its agent's live dashboard"""
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "amount": str(row["amount"] or 0),
+        "customer_id": row["customer_id"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def parse_filters(params):
+    """
+    Feed filters from a socket's query string. Raises ValueError on an
+    unknown status or a malformed min_amount; the agent is checked by the
+    consumer, which knows the company.
+    """
+    status = params.get("status", [None])[0]
+    if status and status not in dict(Transaction.STATUS_CHOICES):
+        raise ValueError("Invalid status")
+
+    min_amount = params.get("min_amount", [None])[0]
+    if min_amount:
+        try:
+            min_amount = Decimal(min_amount)
+        except InvalidOperation:
+            raise ValueError("Invalid min_amount")
+        # NaN parses but cannot be compared with amounts
+        if not min_amount.is_finite():
+            raise ValueError("Invalid min_amount")
+
+    return {
+        "agent_id": params.get("agent_id", [None])[0] or None,
+        "status": status or None,
+        "min_amount": min_amount or None,
+    }
+
+
+def matches(transaction, filters):
+    """Whether a serialized transaction passes a socket's filters"""
+    if filters["agent_id"] and transaction["agent_id"] != filters["agent_id"]:
+        return False
+    if filters["status"] and transaction["status"] != filters["status"]:
+        return False
+    if filters["min_amount"] is not None:
+        if transaction["amount"] is None or Decimal(transaction["amount"]) < filters["min_amount"]:
+            return False
+    return True
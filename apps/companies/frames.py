@@ -0,0 +1,88 @@
+import json
+import msgpack
+from django.conf import settings
+
+# WebSocket subprotocol a client offers to receive binary msgpack frames
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+
+def _escape(key):
+    # JSON Pointer escaping (RFC 6901)
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def diff(previous, current, path=""):
+    """
+    JSON Patch (RFC 6902) operations that turn `previous` into `current`.
+    Nested dicts are compared key by key; any other value that changed,
+    lists included, is replaced whole.
+    """
+    operations = []
+    for key in sorted(previous.keys() - current.keys(), key=str):
+        operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+
+    for key, value in current.items():
+        pointer = f"{path}/{_escape(key)}"
+        if key not in previous:
+            operations.append({"op": "add", "path": pointer, "value": value})
+        elif isinstance(value, dict) and isinstance(previous[key], dict):
+            operations.extend(diff(previous[key], value, pointer))
+        elif value != previous[key]:
+            operations.append({"op": "replace", "path": pointer, "value": value})
+
+    return operations
+
+
+class FrameEncoder:
+    """
+    Per-connection state for metric frames. The first frame, and every
+    `resync_every` changes after it, carries the full snapshot ("mode":
+    "full"); the rest carry a JSON patch against the previous frame
+    ("mode": "patch"). Frames are numbered so a client that misses one
+    can ask for a resync.
+    """
+
+    def __init__(self, delta=True, resync_every=None):
+        self.delta = delta
+        self.resync_every = resync_every or settings.DASHBOARD_RESYNC_EVERY
+        self.seq = 0
+        self.reset()
+
+    def reset(self):
+        """Make the next frame a full snapshot"""
+        self.snapshot = None
+        self.patches_since_full = 0
+
+    def encode(self, data):
+        """Return the frame fields for `data`, or None if nothing changed"""
+        if (
+            not self.delta
+            or self.snapshot is None
+            or self.patches_since_full >= self.resync_every
+        ):
+            frame = {"mode": "full", "data": data}
+            self.patches_since_full = 0
+        else:
+            patch = diff(self.snapshot, data)
+            if not patch:
+                return None
+            frame = {"mode": "patch", "patch": patch}
+            self.patches_since_full += 1
+
+        self.snapshot = data
+        self.seq += 1
+        return {**frame, "seq": self.seq}
+
+
+def pack(frame, binary=False):
+    """Serialise a frame as msgpack bytes or JSON text"""
+    if binary:
+        return msgpack.packb(frame, use_bin_type=True)
+    return json.dumps(frame)
+
+
+def unpack(text_data=None, bytes_data=None):
+    """Decode a client message sent as JSON text or msgpack bytes"""
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data, raw=False)
+    return json.loads(text_data)
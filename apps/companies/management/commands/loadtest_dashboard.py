@@ -0,0 +1,213 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from ... import registry, tasks
+from ...consumers import CompanyConsumer
+from ...models import Company
+
+
+class LocalRegistry:
+    """In-process stand-in for the Redis connection registry"""
+
+    def __init__(self):
+        self.connections = {}
+
+    def register(self, company_id, channel_name, filters, stats=None):
+        signature = registry.filter_signature(filters)
+        self.connections.setdefault(company_id, {})[channel_name] = (signature, filters)
+        return signature
+
+    def unregister(self, company_id, channel_name):
+        self.connections.get(company_id, {}).pop(channel_name, None)
+
+    @property
+    def size(self):
+        return sum(len(channels) for channels in self.connections.values())
+
+    def active_companies(self):
+        return [company_id for company_id, channels in self.connections.items() if channels]
+
+    def subscriptions(self, company_id):
+        grouped = {}
+        for channel_name, (signature, filters) in self.connections.get(company_id, {}).items():
+            subscription = grouped.setdefault(signature, {"filters": filters, "channels": []})
+            subscription["channels"].append(channel_name)
+        return grouped
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many simulated CompanyConsumer connections, drive "
+        "broadcast_company_metrics and report connect latency, push latency "
+        "percentiles and memory per connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--companies", type=int, default=50)
+        parser.add_argument(
+            "--signatures", type=int, default=1,
+            help="Distinct filter sets per company",
+        )
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument(
+            "--concurrency", type=int, default=100,
+            help="Connections opened at once",
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=10.0,
+            help="Seconds to wait for each frame",
+        )
+        parser.add_argument(
+            "--use-db", action="store_true",
+            help="Connect to existing companies and compute real metrics",
+        )
+        parser.add_argument(
+            "--channel-layer", choices=["memory", "configured"], default="memory",
+            help="In-memory channel layer, or the one in settings",
+        )
+
+    def handle(self, *args, **options):
+        local_registry = LocalRegistry()
+        if options["use_db"]:
+            companies = list(Company.objects.all()[: options["companies"]])
+            if not companies:
+                self.stderr.write("No companies in the database")
+                return
+        else:
+            companies = [
+                SimpleNamespace(id=str(uuid.uuid4())) for _ in range(options["companies"])
+            ]
+
+        with ExitStack() as stack:
+            # Measure the broadcast itself, not metric writes to Redis
+            stack.enter_context(override_settings(METRICS_ENABLED=False))
+            if options["channel_layer"] == "memory":
+                stack.enter_context(
+                    override_settings(
+                        CHANNEL_LAYERS={
+                            "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+                        }
+                    )
+                )
+            for name in ("register", "unregister", "active_companies", "subscriptions"):
+                stack.enter_context(
+                    mock.patch.object(registry, name, getattr(local_registry, name))
+                )
+            if not options["use_db"]:
+                counter = iter(range(1, 2**63))
+                stack.enter_context(
+                    mock.patch.object(
+                        tasks,
+                        "compute_metrics",
+                        lambda company_id, **filters: {
+                            "total_transactions": next(counter),
+                            "total_amount": 0.0,
+                        },
+                    )
+                )
+            results = async_to_sync(self.run)(companies, local_registry, options)
+
+        self.report(results, options)
+
+    async def run(self, companies, local_registry, options):
+        user = SimpleNamespace(is_authenticated=True)
+        timeout = options["timeout"]
+        results = {"connect": [], "push": [], "rounds": [], "failed": 0, "missed": 0}
+
+        async def open_connection(index):
+            company = companies[index % len(companies)]
+            signature = (index // len(companies)) % options["signatures"]
+            query = f"start_date=2000-01-{signature + 1:02d}" if signature else ""
+            communicator = WebsocketCommunicator(
+                CompanyConsumer.as_asgi(), f"/ws/companies/dashboard/?{query}"
+            )
+            communicator.scope.update(
+                user=user, company=company, connection_id=str(uuid.uuid4())
+            )
+            started = time.perf_counter()
+            try:
+                connected, _ = await communicator.connect(timeout=timeout)
+            except asyncio.TimeoutError:
+                connected = False
+            if not connected:
+                results["failed"] += 1
+                return None
+            results["connect"].append(time.perf_counter() - started)
+            return communicator
+
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        communicators = []
+        for start in range(0, options["connections"], options["concurrency"]):
+            batch = range(start, min(start + options["concurrency"], options["connections"]))
+            opened = await asyncio.gather(*(open_connection(index) for index in batch))
+            communicators.extend(c for c in opened if c is not None)
+        # Sockets register after accepting; wait for them before broadcasting
+        deadline = time.perf_counter() + timeout
+        while local_registry.size < len(communicators) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(
+            stat.size_diff for stat in after.compare_to(baseline, "filename")
+        )
+        results["memory_per_connection"] = allocated / max(len(communicators), 1)
+
+        async def receive(communicator, started):
+            try:
+                output = await communicator.receive_output(timeout=timeout)
+            except asyncio.TimeoutError:
+                results["missed"] += 1
+                return
+            if output["type"] != "websocket.send":
+                results["missed"] += 1
+                return
+            results["push"].append(time.perf_counter() - started)
+
+        broadcast = sync_to_async(tasks.broadcast_company_metrics, thread_sensitive=False)
+        for _ in range(options["rounds"]):
+            started = time.perf_counter()
+            await broadcast()
+            results["rounds"].append(time.perf_counter() - started)
+            await asyncio.gather(*(receive(c, started) for c in communicators))
+
+        await asyncio.gather(*(c.disconnect() for c in communicators))
+        results["connected"] = len(communicators)
+        return results
+
+    def report(self, results, options):
+        def ms(seconds):
+            return f"{seconds * 1000:.1f}ms"
+
+        write = self.stdout.write
+        write(
+            f"Connections: {results['connected']} open, {results['failed']} failed "
+            f"across {options['companies']} companies"
+        )
+        for label, values in (("Connect", results["connect"]), ("Push", results["push"])):
+            write(
+                f"{label} latency: p50 {ms(percentile(values, 50))}, "
+                f"p95 {ms(percentile(values, 95))}, p99 {ms(percentile(values, 99))}, "
+                f"max {ms(max(values, default=0))}"
+            )
+        if results["rounds"]:
+            write(f"Broadcast task: mean {ms(statistics.mean(results['rounds']))} per round")
+        write(f"Frames missed: {results['missed']}")
+        write(f"Memory per connection: {results['memory_per_connection'] / 1024:.1f} KiB")
@@ -1,10 +1,10 @@
 import uuid
 from urllib.parse import parse_qs
-from django.core.cache import caches
 from django.contrib.auth.models import AnonymousUser
 from channels.auth import AuthMiddlewareStack
 from channels.db import database_sync_to_async
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .tenancy import TenantContext
+from ..users.authentication import CachedJWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework_simplejwt.tokens import UntypedToken
 
@@ -12,7 +12,6 @@ from rest_framework_simplejwt.tokens import UntypedToken
 class ConnectionTrackerMiddleware:
     def __init__(self, app):
         self.app = app
-        self.cache = caches["default"]
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "websocket":
@@ -29,27 +28,23 @@ class ConnectionTrackerMiddleware:
 
             scope["user"] = await self.get_user_from_token(token)
 
-            # 2. Connection Tracking
+            # 2. Connection identity; consumers register themselves in
+            # apps.companies.registry once their filters are validated
             connection_id = f"{scope['path']}-{str(uuid.uuid4())}"
-            company = await self.get_company(scope["user"])
+            tenant = TenantContext.for_user(scope["user"])
 
-            if not company:
+            if not tenant.company_id:
                 await send({"type": "websocket.close", "code": 4003})
                 return
 
-            await self.cache.aset(
-                f"connection_filters:{connection_id}",
-                scope.get("filters", {}),
-                timeout=3600,
+            scope.update(
+                {
+                    "connection_id": connection_id,
+                    "tenant": tenant,
+                    # Only set for company owners
+                    "company": await self.get_company(scope["user"]),
+                }
             )
-            
-            await self.cache.aadd(
-                f"company:{company.id}:connections",
-                connection_id,
-                timeout=3600
-            )
-
-            scope.update({"connection_id": connection_id, "company": company})
 
             return await self.app(scope, receive, send)
 
@@ -67,10 +62,10 @@ class ConnectionTrackerMiddleware:
     def get_user_from_token(self, token):
         try:
             validated_token = UntypedToken(token)
-            user = JWTAuthentication().get_user(validated_token)
+            user = CachedJWTAuthentication().get_user(validated_token)
             return user
         except Exception:
-            return AnonymousUser
+            return AnonymousUser()
 
 
 def ConnectionTrackerStack(inner):
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from ..common.redis import get_redis
+
+# Companies with at least one live dashboard socket, scored by last heartbeat
+ACTIVE_COMPANIES_KEY = "dashboard:companies"
+# Companies scored by when their dashboards are next due for metrics
+DUE_KEY = "dashboard:due"
+
+
+def filter_signature(filters):
+    """Stable short hash of a connection's filters"""
+    canonical = json.dumps(filters, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def company_group(company_id):
+    """Group every dashboard socket of a company joins, for company-wide events"""
+    return f"metrics_{company_id}"
+
+
+def signature_group(company_id, signature):
+    """Group shared by the company's sockets that have identical filters"""
+    return f"metrics_{company_id}_{signature}"
+
+
+def _connections_key(company_id):
+    # Hash of channel_name -> {"signature": ..., "filters": {...}}
+    return f"dashboard:{company_id}:connections"
+
+
+def _heartbeats_key(company_id):
+    # Sorted set of channel_name scored by last heartbeat
+    return f"dashboard:{company_id}:heartbeats"
+
+
+def register(company_id, channel_name, filters, stats=None):
+    """
+    Record a dashboard socket with its filters, or refresh its heartbeat.
+    Consumers call this on connect and then every
+    DASHBOARD_HEARTBEAT_INTERVAL seconds, passing their send queue stats.
+    Returns the filter signature.
+    """
+    signature = filter_signature(filters)
+    now = time.time()
+    ttl = settings.DASHBOARD_CONNECTION_TTL
+
+    client = get_redis()
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(
+        _connections_key(company_id),
+        channel_name,
+        json.dumps({"signature": signature, "filters": filters, "stats": stats or {}}),
+    )
+    pipe.zadd(_heartbeats_key(company_id), {channel_name: now})
+    pipe.zadd(ACTIVE_COMPANIES_KEY, {company_id: now})
+    # Keys of a company whose sockets all vanished expire on their own
+    pipe.expire(_connections_key(company_id), ttl * 2)
+    pipe.expire(_heartbeats_key(company_id), ttl * 2)
+    added = pipe.execute()[0]
+    if added:
+        # A new socket should not wait out a quiet company's interval
+        # for its first metrics
+        client.zadd(DUE_KEY, {company_id: 0})
+    return signature
+
+
+def unregister(company_id, channel_name):
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hdel(_connections_key(company_id), channel_name)
+    pipe.zrem(_heartbeats_key(company_id), channel_name)
+    pipe.execute()
+
+
+def active_companies():
+    """Ids of companies with a dashboard heartbeat within the TTL"""
+    cutoff = time.time() - settings.DASHBOARD_CONNECTION_TTL
+    return [
+        company_id.decode()
+        for company_id in get_redis().zrangebyscore(ACTIVE_COMPANIES_KEY, cutoff, "+inf")
+    ]
+
+
+def due_companies(company_ids, now):
+    """The given companies whose next broadcast is due, or was never scheduled"""
+    if not company_ids:
+        return []
+    scores = get_redis().zmscore(DUE_KEY, company_ids)
+    return [
+        company_id
+        for company_id, score in zip(company_ids, scores)
+        if score is None or score <= now
+    ]
+
+
+def reschedule(intervals, now):
+    """Set each company's next broadcast `intervals[company_id]` seconds from now"""
+    if intervals:
+        get_redis().zadd(
+            DUE_KEY,
+            {company_id: now + interval for company_id, interval in intervals.items()},
+        )
+
+
+def subscriptions(company_id):
+    """
+    The company's live connections grouped by filter signature:
+    {signature: {"filters": {...}, "channels": [channel_name, ...]}}
+    """
+    cutoff = time.time() - settings.DASHBOARD_CONNECTION_TTL
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hgetall(_connections_key(company_id))
+    pipe.zrangebyscore(_heartbeats_key(company_id), cutoff, "+inf")
+    connections, live = pipe.execute()
+    live = set(live)
+
+    grouped = {}
+    for channel_name, value in connections.items():
+        if channel_name not in live:
+            continue
+        entry = json.loads(value)
+        subscription = grouped.setdefault(
+            entry["signature"], {"filters": entry["filters"], "channels": []}
+        )
+        subscription["channels"].append(channel_name.decode())
+    return grouped
+
+
+def reap():
+    """
+    Drop connections whose heartbeat is older than the TTL, left behind by
+    crashed or restarted Daphne workers, and companies with none left.
+    Returns the number of connections removed.
+    """
+    client = get_redis()
+    cutoff = time.time() - settings.DASHBOARD_CONNECTION_TTL
+    reaped = 0
+
+    for company_id in client.zrange(ACTIVE_COMPANIES_KEY, 0, -1):
+        company_id = company_id.decode()
+        heartbeats_key = _heartbeats_key(company_id)
+        dead = client.zrangebyscore(heartbeats_key, "-inf", f"({cutoff}")
+        if dead:
+            pipe = client.pipeline(transaction=False)
+            pipe.hdel(_connections_key(company_id), *dead)
+            pipe.zrem(heartbeats_key, *dead)
+            pipe.execute()
+            reaped += len(dead)
+
+    gone = client.zrangebyscore(ACTIVE_COMPANIES_KEY, "-inf", f"({cutoff}")
+    if gone:
+        client.zrem(DUE_KEY, *gone)
+    client.zremrangebyscore(ACTIVE_COMPANIES_KEY, "-inf", f"({cutoff}")
+    return reaped
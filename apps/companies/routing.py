@@ -8,4 +8,9 @@ websocket_urlpatterns = [
         consumers.CompanyConsumer.as_asgi(),
         name="company_dashboard",
     ),
+    re_path(
+        r"^ws/companies/transactions/$",
+        consumers.TransactionFeedConsumer.as_asgi(),
+        name="company_transaction_feed",
+    ),
 ]
\ No newline at end of file
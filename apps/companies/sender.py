@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingSender:
+    """
+    Delivers a socket's outgoing messages from a background task, so a
+    slow client never stalls the consumer's channel-layer receive loop.
+
+    Messages offered with a coalesce key replace any pending message with
+    the same key: a client that falls behind skips straight to the latest
+    snapshot instead of working through stale ones. Other messages wait in
+    a queue of at most max_queue entries, dropping the oldest when full.
+    Memory per socket is therefore bounded whatever the client's speed.
+    """
+
+    def __init__(self, deliver, max_queue):
+        self.deliver = deliver
+        self.max_queue = max_queue
+        self.superseded = 0
+        self.dropped = 0
+        self._latest = {}
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._task = None
+
+    @property
+    def depth(self):
+        """Messages waiting to be delivered"""
+        return len(self._latest) + len(self._queue)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def offer(self, message, coalesce_key=None):
+        if coalesce_key is not None:
+            if coalesce_key in self._latest:
+                self.superseded += 1
+            self._latest[coalesce_key] = message
+        else:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(message)
+        self._ready.set()
+
+    def stats(self):
+        return {"depth": self.depth, "superseded": self.superseded, "dropped": self.dropped}
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue or self._latest:
+                if self._queue:
+                    message = self._queue.popleft()
+                else:
+                    message = self._latest.pop(next(iter(self._latest)))
+                try:
+                    await self.deliver(message)
+                except Exception as e:
+                    logger.warning("Failed to deliver dashboard message: %s", e)
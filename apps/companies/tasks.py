@@ -1,90 +1,211 @@
-import json
+import logging
 import redis
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from django.utils import timezone
 from django.db.models import Sum, Count, Case, When, Value, IntegerField, DecimalField
 from django.db.models.functions import Coalesce
 from django.conf import settings
-from django.core.cache import cache
 from django_redis import get_redis_connection
 from celery import shared_task
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import Company
+from . import feed, registry
+from ..common import metrics
+from ..common.locks import lease
 from ..external_tables.models import Transaction
+from ..agents.consumers import agent_group
 from ..agents.models import Agent
 
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def schedule_company_metrics():
+    """
+    Beat entry point for dashboard metrics. Under a lease, so a run that
+    outlasts the beat interval makes the next ones skip instead of piling
+    up, broadcast to the companies with live dashboards whose next run is
+    due, then schedule each one's next run by how busy it has been.
+    """
+    try:
+        with lease("broadcast_company_metrics", settings.DASHBOARD_SCHEDULER_LEASE) as acquired:
+            if not acquired:
+                return "Previous metrics run still in progress"
+
+            now = time.time()
+            due = registry.due_companies(registry.active_companies(), now)
+            if not due:
+                return "No company metrics due"
+
+            broadcast_company_metrics(due)
+            registry.reschedule(broadcast_intervals(due), now)
+    except redis.RedisError as e:
+        logger.warning("Metrics scheduler unavailable: %s", e)
+        return "Metrics scheduler unavailable"
+
+    return f"Broadcast metrics to {len(due)} companies"
+
+
+def broadcast_intervals(company_ids):
+    """
+    Seconds until each company's next broadcast, from its transaction
+    changes over the last DASHBOARD_ACTIVITY_WINDOW seconds and the
+    (minimum changes, interval) tiers in DASHBOARD_BROADCAST_INTERVALS.
+    """
+    since = timezone.now() - timedelta(seconds=settings.DASHBOARD_ACTIVITY_WINDOW)
+    activity = dict(
+        Transaction.objects.filter(
+            agent_id__company_id__in=company_ids, updated_at__gte=since
+        )
+        .values("agent_id__company_id")
+        .annotate(changes=Count("id"))
+        .values_list("agent_id__company_id", "changes")
+    )
+
+    intervals = {}
+    for company_id in company_ids:
+        changes = activity.get(company_id, 0)
+        intervals[company_id] = next(
+            interval
+            for minimum, interval in settings.DASHBOARD_BROADCAST_INTERVALS
+            if changes >= minimum
+        )
+    return intervals
+
 
 @shared_task
-def broadcast_company_metrics():
-    """Task to compute and broadcast company metrics"""
+def broadcast_company_metrics(company_ids=None):
+    """
+    Compute metrics once per distinct filter signature of each company's
+    dashboard sockets, for the given companies or every one with a live
+    dashboard. A signature with one socket is sent straight to its
+    channel; shared signatures go to that signature's group.
+    """
     channel_layer = get_channel_layer()
+    timestamp = datetime.now().isoformat()
+
+    if company_ids is None:
+        company_ids = registry.active_companies()
+
+    for company_id in company_ids:
+        with metrics.timed(
+            metrics.TASK_COMPANY_DURATION,
+            task="broadcast_company_metrics",
+            company=company_id,
+        ):
+            _broadcast_company(channel_layer, company_id, timestamp)
+
+    return "Company metrics broadcast complete"
 
-    for company in Company.objects.all():
-        # Get all active connections for the company
-        connection_id = cache.get(f"company:{company.id}:connections", version=1)
 
-        if not connection_id:
-            continue
-                
+def _broadcast_company(channel_layer, company_id, timestamp):
+    for signature, subscription in registry.subscriptions(company_id).items():
+        message = {
+            "type": "send_metrics",
+            "data": compute_metrics(company_id, **subscription["filters"]),
+            "timestamp": timestamp,
+        }
+        channels = subscription["channels"]
+        try:
+            if len(channels) == 1:
+                async_to_sync(channel_layer.send)(channels[0], message)
+            else:
+                async_to_sync(channel_layer.group_send)(
+                    registry.signature_group(company_id, signature), message
+                )
+        except Exception as e:
+            logger.warning("Failed to send metrics to group: %s", e)
 
-        # Get filters for the connection
-        filters_str = cache.get(f"connection_filters:{connection_id}")
 
-        if not filters_str:
-            filters = {}
-        else:
-            filters_str = filters_str.decode() if isinstance(filters_str, bytes) else filters_str
-            try:
-                filters = json.loads(filters_str)
-            except json.JSONDecodeError:
-                filters = {}
+@shared_task
+def poll_transaction_feed():
+    """
+    Publish transactions inserted or updated since the last tick to the
+    feed sockets of their company and the live dashboards of their agent.
+    The table is read once per tick for all subscribers; each feed socket
+    applies its own filters to its company's batch. Rows are written by
+    other systems, so no model signal sees them. Under a lease, so a run
+    that overlaps the next never reads the same watermark and publishes
+    the same rows twice.
+    """
+    try:
+        with lease("poll_transaction_feed", settings.TRANSACTION_FEED_LEASE) as acquired:
+            if not acquired:
+                return "Previous transaction feed poll still in progress"
+            return _publish_transaction_changes()
+    except redis.RedisError as e:
+        logger.warning("Transaction feed unavailable: %s", e)
+        return "Transaction feed unavailable"
 
-        start_date = end_date = agent_id = None
 
-        if "date_range" in filters and filters["date_range"]:
-            start_date, end_date = filters["date_range"]
+def _publish_transaction_changes():
+    companies = feed.active_companies()
+    watermark = feed.get_watermark()
+    if not companies or watermark is None:
+        # Nobody is listening: skip ahead instead of replaying the backlog
+        # to the next subscriber
+        feed.set_watermark(timezone.now(), "")
+        return "No transaction feed subscribers"
 
-        if "agent_id" in filters:
-            agent_id = filters["agent_id"]
+    rows = feed.changed_since(watermark, companies, settings.TRANSACTION_FEED_BATCH_SIZE)
+    if not rows:
+        return "No transaction changes"
 
-        metrics = compute_metrics(
-            company=company,
-            agent_id=agent_id,
-            start_date=start_date,
-            end_date=end_date,
-        )
+    batches = {}
+    agent_updates = {}
+    for row in rows:
+        transaction = feed.serialize(row)
+        batches.setdefault(transaction.pop("company_id"), []).append(transaction)
+        if row["agent_id"]:
+            agent_updates.setdefault(row["agent_id"], []).append(feed.agent_update(row))
 
-        # Send metrics to consumer
+    channel_layer = get_channel_layer()
+    timestamp = datetime.now().isoformat()
+    for company_id, transactions in batches.items():
         try:
             async_to_sync(channel_layer.group_send)(
-                f"metrics_{company.id}",
+                feed.feed_group(company_id),
                 {
-                    "type": "send_metrics",
-                    "data": metrics,
-                    "timestamp": datetime.now().isoformat(),
-                    "connection_id": connection_id
+                    "type": "transaction_batch",
+                    "data": transactions,
+                    "timestamp": timestamp,
                 },
             )
         except Exception as e:
-            print(f"Failed to send metrics to group: {e}")
+            logger.warning("Failed to publish transactions to feed: %s", e)
 
-    return "Company metrics broadcast complete"
+    for agent_pk, transactions in agent_updates.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                agent_group(agent_pk),
+                {"type": "transaction_updates", "transactions": transactions},
+            )
+        except Exception as e:
+            logger.warning("Failed to publish transactions to agent group: %s", e)
+
+    feed.set_watermark(rows[-1]["updated_at"], rows[-1]["id"])
+    return f"Published {len(rows)} transaction changes"
+
+
+@shared_task
+def reap_dashboard_connections():
+    """Remove dashboard sockets that stopped sending heartbeats"""
+    return f"Reaped {registry.reap()} dashboard connections"
 
 
-def compute_metrics(company, start_date=None, end_date=None, agent_id=None):
-    """Compute metrics for a given company."""
+def compute_metrics(company_id, start_date=None, end_date=None, agent_id=None):
+    """Compute metrics for a company, optionally for one agent and date range."""
 
-    filters = {"agent_id__company": company}
+    filters = {"agent_id__company_id": company_id}
 
-    if start_date and end_date:
-        filters["created_at__range"] = [start_date, end_date]
-    elif start_date:
-        filters["created_at__range"] = start_date
-    elif end_date:
-        filters["created_at__lte"] = end_date
+    if start_date:
+        filters["created_at__date__gte"] = start_date
+    if end_date:
+        filters["created_at__date__lte"] = end_date
 
     if agent_id:
-        filters["agent_id"] = agent_id
+        filters["agent_id__agent_id"] = agent_id
 
     transactions = Transaction.objects.filter(**filters).select_related(
         "agent_id", "customer_id"
@@ -95,7 +216,7 @@ def compute_metrics(company, start_date=None, end_date=None, agent_id=None):
         total_successful=Coalesce(
             Sum(
                 Case(
-                    When(status="completed", then=1),
+                    When(status="successful", then=1),
                     default=0,
                     output_field=IntegerField(),
                 )
@@ -125,7 +246,13 @@ def compute_metrics(company, start_date=None, end_date=None, agent_id=None):
         .order_by("-total")[:5]
     )
 
-    metrics = {**aggregates, "top_agents": list(top_agents)}
+    metrics = {
+        **aggregates,
+        "top_agents": [
+            {"agent_id": row["agent_id"], "total": float(row["total"] or 0)}
+            for row in top_agents
+        ],
+    }
 
     return metrics
 
@@ -0,0 +1,80 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from dataclasses import dataclass
+from functools import cached_property
+from django.utils.functional import SimpleLazyObject
+from .models import Company
+from ..agents.models import Agent
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """
+    Who the request is acting for: the user, their role and the company
+    and agent they belong to. Primary keys come from the authenticated
+    user for free; the company, agent and company agent ids are each
+    loaded with at most one query, the first time they are read.
+    """
+
+    user: object
+    role: str = None
+    company_id: str = None
+    agent_pk: str = None
+
+    @classmethod
+    def for_user(cls, user):
+        if not user or not user.is_authenticated:
+            return cls(user=user)
+
+        company_id = agent_pk = None
+        if user.role == "owner":
+            company = getattr(user, "company", None)
+            company_id = company.pk if company else None
+        elif user.role == "agent":
+            agent = getattr(user, "agent", None)
+            if agent:
+                agent_pk, company_id = agent.pk, agent.company_id
+
+        return cls(user=user, role=user.role, company_id=company_id, agent_pk=agent_pk)
+
+    @cached_property
+    def agent(self):
+        if not self.agent_pk:
+            return None
+        return Agent.objects.select_related("company").get(pk=self.agent_pk)
+
+    @cached_property
+    def company(self):
+        if not self.company_id:
+            return None
+        if self.agent_pk:
+            return self.agent.company
+        return Company.objects.get(pk=self.company_id)
+
+    @cached_property
+    def agent_ids(self):
+        """Primary keys of every agent in the tenant's company"""
+        if not self.company_id:
+            return []
+        return list(
+            Agent.objects.filter(company_id=self.company_id).values_list("id", flat=True)
+        )
+
+
+class TenantContextMiddleware:
+    """
+    Attach a lazily built TenantContext as request.tenant. It is evaluated
+    on first use inside the view, after DRF has authenticated request.user.
+    Runs in both sync and async mode so it never forces a thread hop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.tenant = SimpleLazyObject(lambda: TenantContext.for_user(request.user))
+        return self.get_response(request)
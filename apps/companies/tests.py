@@ -1,7 +1,24 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from . import feed, frames, registry
+from .consumers import TransactionFeedConsumer
 from .models import Company
+from .sender import CoalescingSender
+from .tasks import broadcast_company_metrics, poll_transaction_feed, schedule_company_metrics
+from .tenancy import TenantContext
+from apps.agents.models import Agent
+from apps.external_tables.models import Transaction
 from apps.users.models import User
 
 class CompanyEndpointsTestCase(APITestCase):
@@ -75,3 +92,311 @@ class CompanyEndpointsTestCase(APITestCase):
         response = self.client.patch(self.company_detail_url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["state"], data["state"])
+
+    def test_company_metrics(self):
+        agent_user = User.objects.create_user(
+            email="metricsagent@example.com",
+            password="StrongPassword123!",
+            first_name="Metrics",
+            last_name="Agent",
+            role="agent",
+            phone="1231231234",
+            nin="12312312345"
+        )
+        agent = Agent.objects.create(user_id=agent_user, company=self.test_company)
+        Transaction.objects.create(agent_id=agent, amount=100, status="successful")
+        Transaction.objects.create(agent_id=agent, amount=50, status="failed")
+
+        url = reverse('api:company-dashboard', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["total_transactions"], 2)
+        self.assertEqual(response.data["data"]["total_successful"], 1)
+
+        response = self.client.get(url, {"agent_id": agent.agent_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["total_transactions"], 2)
+
+    def test_tenant_context(self):
+        tenant = TenantContext.for_user(self.test_user)
+        self.assertEqual(tenant.role, "owner")
+        self.assertEqual(tenant.company_id, self.test_company.pk)
+        self.assertIsNone(tenant.agent)
+        with self.assertNumQueries(1):
+            self.assertEqual(tenant.company.name, self.test_company.name)
+            self.assertEqual(tenant.company.state, self.test_company.state)
+        with self.assertNumQueries(1):
+            self.assertEqual(tenant.agent_ids, [])
+            self.assertEqual(tenant.agent_ids, [])
+
+    def test_broadcast_routes_metrics_per_filter_signature(self):
+        channel_layer = get_channel_layer()
+        shared = [async_to_sync(channel_layer.new_channel)() for _ in range(2)]
+        unique = async_to_sync(channel_layer.new_channel)()
+        shared_filters = {"agent_id": None, "start_date": None, "end_date": None}
+        shared_signature = registry.filter_signature(shared_filters)
+        for channel in shared:
+            async_to_sync(channel_layer.group_add)(
+                registry.signature_group(self.test_company.pk, shared_signature), channel
+            )
+
+        subscriptions = {
+            shared_signature: {"filters": shared_filters, "channels": shared},
+            "unique": {
+                "filters": {"agent_id": None, "start_date": "2025-01-01", "end_date": None},
+                "channels": [unique],
+            },
+        }
+        with mock.patch.object(
+            registry, "active_companies", return_value=[self.test_company.pk]
+        ), mock.patch.object(
+            registry, "subscriptions", return_value=subscriptions
+        ), mock.patch(
+            "apps.companies.tasks.compute_metrics", return_value={}
+        ) as compute:
+            broadcast_company_metrics()
+
+        # One computation per signature, however many sockets share it
+        self.assertEqual(compute.call_count, 2)
+        for channel in shared + [unique]:
+            message = async_to_sync(channel_layer.receive)(channel)
+            self.assertEqual(message["type"], "send_metrics")
+
+    def test_scheduler_paces_companies_by_activity(self):
+        quiet_user = User.objects.create_user(
+            email="quietowner@example.com",
+            password="StrongPassword123!",
+            first_name="Quiet",
+            last_name="Owner",
+            role="owner",
+            phone="1231231234",
+            nin="12312312345",
+        )
+        quiet_company = Company.objects.create(
+            owner=quiet_user, name="Quiet Company", state="S", lga="L", area="A"
+        )
+        agent_user = User.objects.create_user(
+            email="busyagent@example.com",
+            password="StrongPassword123!",
+            first_name="Busy",
+            last_name="Agent",
+            role="agent",
+            phone="1231231235",
+            nin="12312312346",
+        )
+        agent = Agent.objects.create(user_id=agent_user, company=self.test_company)
+        for _ in range(5):
+            Transaction.objects.create(agent_id=agent, amount=10, status="successful")
+
+        companies = [self.test_company.pk, quiet_company.pk]
+        lease = mock.MagicMock()
+        lease.return_value.__enter__.return_value = True
+        with mock.patch("apps.companies.tasks.lease", lease), mock.patch.object(
+            registry, "active_companies", return_value=companies
+        ), mock.patch.object(
+            registry, "due_companies", return_value=companies
+        ), mock.patch.object(registry, "reschedule") as reschedule, mock.patch(
+            "apps.companies.tasks.broadcast_company_metrics"
+        ) as broadcast:
+            schedule_company_metrics()
+            broadcast.assert_called_once_with(companies)
+            intervals = reschedule.call_args[0][0]
+            self.assertEqual(intervals, {self.test_company.pk: 30, quiet_company.pk: 300})
+
+            # A run still holding the lease makes the next one skip
+            lease.return_value.__enter__.return_value = False
+            broadcast.reset_mock()
+            schedule_company_metrics()
+            broadcast.assert_not_called()
+
+
+class DashboardLoadTestCommandTestCase(TestCase):
+    def test_every_connection_gets_every_round(self):
+        out = StringIO()
+        call_command(
+            "loadtest_dashboard",
+            connections=20,
+            companies=4,
+            signatures=2,
+            rounds=2,
+            timeout=5,
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("Connections: 20 open, 0 failed", output)
+        self.assertIn("Frames missed: 0", output)
+
+
+class FrameEncoderTestCase(SimpleTestCase):
+    def test_diff_produces_json_patch(self):
+        previous = {"total": 1, "nested": {"a": 1, "b": 2}, "gone": True, "top": [1]}
+        current = {"total": 2, "nested": {"a": 1, "b": 3}, "new": "x", "top": [1]}
+        self.assertEqual(
+            frames.diff(previous, current),
+            [
+                {"op": "remove", "path": "/gone"},
+                {"op": "replace", "path": "/total", "value": 2},
+                {"op": "replace", "path": "/nested/b", "value": 3},
+                {"op": "add", "path": "/new", "value": "x"},
+            ],
+        )
+
+    def test_encoder_sends_patches_between_full_resyncs(self):
+        encoder = frames.FrameEncoder(resync_every=2)
+
+        first = encoder.encode({"total": 1})
+        self.assertEqual(first, {"mode": "full", "data": {"total": 1}, "seq": 1})
+        self.assertIsNone(encoder.encode({"total": 1}))
+        self.assertEqual(encoder.encode({"total": 2})["mode"], "patch")
+        self.assertEqual(encoder.encode({"total": 3})["mode"], "patch")
+        self.assertEqual(encoder.encode({"total": 4})["mode"], "full")
+
+        encoder.reset()
+        frame = encoder.encode({"total": 4})
+        self.assertEqual(frame["mode"], "full")
+        self.assertEqual(frame["seq"], 5)
+
+    def test_msgpack_round_trip(self):
+        frame = {"type": "periodic_update", "mode": "full", "data": {"total": 1.5}}
+        self.assertEqual(frames.unpack(bytes_data=frames.pack(frame, binary=True)), frame)
+        self.assertEqual(frames.unpack(text_data=frames.pack(frame)), frame)
+
+
+class CoalescingSenderTestCase(SimpleTestCase):
+    def test_slow_client_only_gets_latest_snapshot(self):
+        delivered = []
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def deliver(message):
+                await release.wait()
+                delivered.append(message)
+
+            sender = CoalescingSender(deliver, max_queue=2)
+            sender.start()
+            sender.offer({"n": 1}, coalesce_key="metrics")
+            await asyncio.sleep(0)  # the first snapshot is now in flight
+
+            for n in range(2, 6):
+                sender.offer({"n": n}, coalesce_key="metrics")
+            for n in range(3):
+                sender.offer({"event": n})
+            stats = sender.stats()
+
+            release.set()
+            while sender.depth:
+                await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            await sender.stop()
+            return stats
+
+        stats = async_to_sync(scenario)()
+        self.assertEqual(stats, {"depth": 3, "superseded": 3, "dropped": 1})
+        self.assertEqual(
+            delivered, [{"n": 1}, {"event": 1}, {"event": 2}, {"n": 5}]
+        )
+
+
+class TransactionFeedTestCase(TestCase):
+    def setUp(self):
+        self.lease = mock.MagicMock()
+        self.lease.return_value.__enter__.return_value = True
+        patcher = mock.patch("apps.companies.tasks.lease", self.lease)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_overlapping_polls_are_skipped(self):
+        self.lease.return_value.__enter__.return_value = False
+        with mock.patch.object(feed, "get_watermark") as get_watermark:
+            self.assertEqual(
+                poll_transaction_feed(), "Previous transaction feed poll still in progress"
+            )
+        get_watermark.assert_not_called()
+
+    def test_poller_publishes_filtered_changes(self):
+        owner = User.objects.create_user(
+            email="feedowner@example.com",
+            password="StrongPassword123!",
+            first_name="Feed",
+            last_name="Owner",
+            phone="5551112223",
+            nin="55511122233",
+            role="owner",
+        )
+        company = Company.objects.create(
+            owner=owner, name="Feed Company", state="S", lga="L", area="A"
+        )
+        agent_user = User.objects.create_user(
+            email="feedagent@example.com",
+            password="StrongPassword123!",
+            first_name="Feed",
+            last_name="Agent",
+            phone="5551112224",
+            nin="55511122234",
+            role="agent",
+        )
+        agent = Agent.objects.create(user_id=agent_user, company=company)
+        Transaction.objects.create(agent_id=agent, amount=500, status="successful")
+        Transaction.objects.create(agent_id=agent, amount=10, status="successful")
+        Transaction.objects.create(agent_id=agent, amount=900, status="failed")
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                TransactionFeedConsumer.as_asgi(),
+                "/ws/companies/transactions/?status=successful&min_amount=100",
+            )
+            communicator.scope["user"] = owner
+            communicator.scope["company"] = company
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await database_sync_to_async(poll_transaction_feed)()
+            message = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return message
+
+        with mock.patch.object(feed, "touch"), mock.patch.object(
+            feed, "active_companies", return_value=[company.pk]
+        ), mock.patch.object(
+            feed, "get_watermark", return_value=(datetime(2000, 1, 1, tzinfo=timezone.utc), "")
+        ), mock.patch.object(feed, "set_watermark") as set_watermark:
+            message = async_to_sync(scenario)()
+
+        self.assertEqual(message["type"], "transactions")
+        self.assertEqual(len(message["data"]), 1)
+        self.assertEqual(message["data"][0]["amount"], "500.00")
+        self.assertEqual(message["data"][0]["agent_id"], agent.agent_id)
+        # The watermark moves to the newest change, whatever the filters
+        latest = Transaction.objects.order_by("updated_at", "id").last()
+        set_watermark.assert_called_once_with(latest.updated_at, latest.id)
+
+    def test_non_finite_min_amount_is_rejected(self):
+        owner = User.objects.create_user(
+            email="nanowner@example.com",
+            password="StrongPassword123!",
+            first_name="Nan",
+            last_name="Owner",
+            phone="5551112225",
+            nin="55511122235",
+            role="owner",
+        )
+        company = Company.objects.create(
+            owner=owner, name="Nan Company", state="S", lga="L", area="A"
+        )
+
+        async def scenario(query):
+            communicator = WebsocketCommunicator(
+                TransactionFeedConsumer.as_asgi(), f"/ws/companies/transactions/?{query}"
+            )
+            communicator.scope["user"] = owner
+            communicator.scope["company"] = company
+            await communicator.connect()
+            output = await communicator.receive_output()
+            await communicator.disconnect()
+            return output
+
+        with mock.patch.object(feed, "touch"):
+            for query in ("min_amount=NaN", "min_amount=sNaN", "min_amount=Infinity"):
+                output = async_to_sync(scenario)(query)
+                self.assertEqual(output["type"], "websocket.close")
+                self.assertEqual(output["code"], 4001)
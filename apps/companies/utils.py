@@ -1,9 +1,9 @@
 from django.conf import settings
 from django.db.models import Q
-from django.core.mail import EmailMultiAlternatives
 from django.utils import timezone
 from django.template.loader import render_to_string
 from ..external_tables.models import Agent
+from ..common.mail import queue_email
 from auditlog.models import LogEntry
 import traceback
 
@@ -18,29 +18,25 @@ def send_deactivation_emails(company, request_user):
         subject = "Agent Account Status Update"
         # message = f"Your account with {company.name} has be deactivated"
         recipients = list(
-            Agent.objects.filter(company=company).values_list("user__email", flat=True)
+            Agent.objects.filter(company=company).values_list("user_id__email", flat=True)
         )
 
         if not recipients:
             return False
 
-        context = {"company": company, "support_email": settings.SUPPORT_EMAIL}
+        context = {
+            "company": company,
+            "support_email": settings.SUPPORT_EMAIL,
+            "date": timezone.now().date(),
+        }
 
-        email = EmailMultiAlternatives(
+        queue_email(
             subject=subject,
-            body=render_to_string("companies/deactivation_email.txt", context),
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            body=render_to_string("deactivation_email.txt", context),
+            html_body=render_to_string("companies/deactivation_mail.html", context),
             to=recipients,
             reply_to=[settings.SUPPORT_EMAIL],
         )
-        email.attach_alternative(
-            render_to_string(
-                "companies/deactivation_email.html",
-                context,
-            ),
-            "text/html",
-        )
-        email.send(fail_silently=False)
 
         return True
 
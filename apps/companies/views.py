@@ -11,7 +11,6 @@ from django.db.models import (
     DecimalField,
 )
 from django.db.models.functions import Coalesce
-from django.shortcuts import get_object_or_404
 from django.utils.dateparse import parse_date
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
@@ -22,12 +21,14 @@ from drf_yasg import openapi
 from .models import Company
 from .serializers import CompanySerializer
 from .utils import send_deactivation_emails
+from ..common.response_cache import CachedResponseMixin, invalidate_on_commit
 from ..users.permissions import IsOwnerOrSuperuser
+from ..users.authentication import invalidate_cached_user_on_commit
 from ..agents.models import Agent
 from ..external_tables.models import Agent, Transaction
 
 
-class CompanyViewSet(ModelViewSet):
+class CompanyViewSet(CachedResponseMixin, ModelViewSet):
     permission_classes = [IsOwnerOrSuperuser]
     queryset = Company.objects.none()
     serializer_class = CompanySerializer
@@ -50,16 +51,22 @@ class CompanyViewSet(ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         company = self.get_object()
 
-        # Update agents to remove their association with the company
-        Agent.objects.filter(company=company).update(company=None)
+        # Outbox the emails while the agents still belong to the company;
+        # they are only delivered if the deactivation commits
+        send_deactivation_emails(company, request.user)
+
+        # Update agents to remove their association with the company.
+        # update() skips post_save, so drop their cached auth entries here
+        agents = Agent.objects.filter(company=company)
+        for user_id in agents.values_list("user_id", flat=True):
+            invalidate_cached_user_on_commit(user_id)
+            invalidate_on_commit(f"agent:{user_id}")
+        agents.update(company=None)
 
         company.owner.role = "customer"
         company.owner.save(update_fields=["role"])
 
         company.deactivate()
-
-        # Delay sending emails till changes committed to the DB
-        transaction.on_commit(lambda: send_deactivation_emails(company, request.user))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -133,8 +140,14 @@ class CompanyMetricsView(APIView):
         GET /api/v1/companies/dashboard/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&agent_id=123456
         """
 
-        company = get_object_or_404(Company, owner=request.user.id)
-        agents = Agent.objects.filter(company=company).values_list("agent_id", flat=True)
+        tenant = request.tenant
+        if not tenant.company_id:
+            return Response(
+                {"message": "Company not found", "error": "No company associated with this user."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        agents = tenant.agent_ids
         if not agents:
             return Response(
                 {
@@ -151,7 +164,6 @@ class CompanyMetricsView(APIView):
             if start_date and end_date:
                 start_date_obj = parse_date(start_date)
                 end_date_obj = parse_date(end_date)
-                print(end_date)
 
                 if start_date_obj > end_date_obj:
                     return Response(
@@ -192,8 +204,10 @@ class CompanyMetricsView(APIView):
         agent_id = request.query_params.get("agent_id")
         if agent_id:
             try:
-                Agent.objects.get(agent_id=agent_id, company=company)
-                filters["agent_id"] = agent_id
+                agent = Agent.objects.only("id").get(
+                    agent_id=agent_id, company_id=tenant.company_id
+                )
+                filters["agent_id"] = agent.pk
             except Agent.DoesNotExist:
                 return Response(
                     {
@@ -236,6 +250,7 @@ class CompanyMetricsView(APIView):
             total_customers=Count("customer_id", distinct=True),
         )
 
+        metrics = aggregates
         if not agent_id:
             top_agents = (
                 transactions.values("agent_id")
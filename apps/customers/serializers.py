@@ -19,6 +19,5 @@ class CustomerSerializer(serializers.ModelSerializer):
         ]
 
     def create(self, validated_data):
-        agent = self.context['request'].user.agent
-        validated_data['created_by'] = agent
+        validated_data['created_by_id'] = self.context['request'].tenant.agent_pk
         return super().create(validated_data)
\ No newline at end of file
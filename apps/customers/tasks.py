@@ -0,0 +1,136 @@
+import numpy as np
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from .models import Customer
+from ..common.response_cache import invalidate
+from ..companies.models import Company
+from ..external_tables.models import Transaction
+
+
+# Quintile boundaries used to turn raw R/F/M values into 1-5 scores
+RFM_QUANTILES = [0.2, 0.4, 0.6, 0.8]
+
+
+def score_quintiles(values):
+    """
+    Score each value from 1 to 5 against the quintiles of the population.
+    Ties at a boundary fall into the lower bucket so that a flat
+    distribution never scores everyone as 5.
+    """
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int8)
+    thresholds = np.quantile(values, RFM_QUANTILES)
+    return (np.searchsorted(thresholds, values, side="left") + 1).astype(np.int8)
+
+
+def classify_rfm(recency_days, frequency, monetary, inactive_after_days):
+    """
+    Map per-customer recency (days since last successful transaction),
+    frequency and monetary arrays to Customer.tag values.
+    """
+    tags = np.full(recency_days.shape, "regular", dtype="<U8")
+    inactive = (frequency == 0) | (recency_days > inactive_after_days)
+    tags[inactive] = "inactive"
+
+    active = ~inactive
+    if not active.any():
+        return tags
+
+    # Lower recency is better, so score its negation
+    r_score = score_quintiles(-recency_days[active])
+    f_score = score_quintiles(frequency[active])
+    m_score = score_quintiles(monetary[active])
+
+    active_tags = tags[active]
+    active_tags[f_score >= 4] = "frequent"
+    active_tags[(f_score >= 4) & (m_score >= 4) & (r_score >= 3)] = "vip"
+    tags[active] = active_tags
+    return tags
+
+
+def segment_company_customers(company_id, now=None, chunk_size=None):
+    """
+    Recompute tags for every customer of one company.
+    Returns the number of customers whose tag changed.
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or settings.CUSTOMER_SEGMENTATION_CHUNK_SIZE
+
+    ids, current_tags = [], []
+    for pk, tag in (
+        Customer.objects.filter(created_by__company_id=company_id)
+        .order_by()
+        .values_list("id", "tag")
+        .iterator(chunk_size=chunk_size)
+    ):
+        ids.append(pk)
+        current_tags.append(tag)
+
+    if not ids:
+        return 0
+
+    position = {pk: index for index, pk in enumerate(ids)}
+    recency_days = np.full(len(ids), np.inf)
+    frequency = np.zeros(len(ids))
+    monetary = np.zeros(len(ids))
+
+    aggregates = (
+        Transaction.objects.filter(
+            customer_id__created_by__company_id=company_id, status="successful"
+        )
+        .order_by()
+        .values("customer_id")
+        .annotate(
+            last_seen=Max("created_at"),
+            count=Count("id"),
+            total=Sum("amount"),
+        )
+        .values_list("customer_id", "last_seen", "count", "total")
+        .iterator(chunk_size=chunk_size)
+    )
+    for customer_id, last_seen, count, total in aggregates:
+        index = position.get(customer_id)
+        if index is None:
+            continue
+        recency_days[index] = (now - last_seen).total_seconds() / 86400
+        frequency[index] = count
+        monetary[index] = float(total or 0)
+
+    tags = classify_rfm(
+        recency_days,
+        frequency,
+        monetary,
+        inactive_after_days=settings.CUSTOMER_INACTIVE_AFTER_DAYS,
+    )
+
+    changed = np.flatnonzero(tags != np.array(current_tags, dtype="<U8"))
+    if changed.size == 0:
+        return 0
+
+    Customer.objects.bulk_update(
+        [
+            Customer(id=ids[index], tag=str(tags[index]), updated_at=now)
+            for index in changed
+        ],
+        ["tag", "updated_at"],
+        batch_size=chunk_size,
+    )
+    # bulk_update sends no post_save, so drop the company's cached responses here
+    invalidate(f"company:{company_id}")
+    return int(changed.size)
+
+
+@shared_task
+def segment_customers():
+    """Nightly task to reclassify Customer.tag using RFM scores per company"""
+    now = timezone.now()
+    updated = 0
+
+    for company_id in Company.objects.filter(is_active=True).values_list(
+        "id", flat=True
+    ):
+        updated += segment_company_customers(company_id, now=now)
+
+    return f"Customer segmentation complete: {updated} tags updated"
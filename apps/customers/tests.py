@@ -1,3 +1,5 @@
+import gzip
+import numpy as np
 from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -6,6 +8,8 @@ from .models import Customer
 from apps.users.models import User
 from apps.agents.models import Agent
 from apps.companies.models import Company
+from apps.external_tables.models import Transaction
+from .tasks import classify_rfm, segment_company_customers
 
 class CustomerEndpointsTestCase(APITestCase):
     @classmethod
@@ -69,7 +73,7 @@ class CustomerEndpointsTestCase(APITestCase):
         }
         response = self.client.post(login_url, login_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
 
         self.customer_url = reverse('api:customer-list', kwargs={'version': 'v1'})
         self.customer_detail_url = reverse('api:customer-detail', kwargs={'version': 'v1', 'pk': self.test_customer.pk})
@@ -91,3 +95,105 @@ class CustomerEndpointsTestCase(APITestCase):
     def test_customer_transaction_summary(self):
         response = self.client.get(self.customer_transaction_summary_url)
         self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_404_NOT_FOUND])
+
+    def test_export_customers(self):
+        url = reverse('api:customer-export', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b"".join(response.streaming_content).decode()
+        self.assertTrue(content.startswith("customer_id,first_name"))
+        self.assertIn(self.test_customer.customer_id, content)
+
+    def test_export_customers_gzip(self):
+        url = reverse('api:customer-export', kwargs={'version': 'v1'})
+        response = self.client.get(url, {"compress": "gzip"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertIn(self.test_customer.customer_id, content)
+
+    def test_export_customers_escapes_formulas(self):
+        Customer.objects.filter(pk=self.test_customer.pk).update(first_name="=HYPERLINK(\"x\")")
+        url = reverse('api:customer-export', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(',"\'=HYPERLINK(""x"")",', content)
+
+    def test_export_customers_invalid_date(self):
+        url = reverse('api:customer-export', kwargs={'version': 'v1'})
+        response = self.client.get(url, {"start_date": "not-a-date"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CustomerSegmentationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(
+            email="segowner@example.com",
+            password="StrongPassword123!",
+            first_name="Seg",
+            last_name="Owner",
+            phone="1112223334",
+            nin="11122233344",
+            role="owner",
+        )
+        agent_user = User.objects.create_user(
+            email="segagent@example.com",
+            password="StrongPassword123!",
+            first_name="Seg",
+            last_name="Agent",
+            phone="1112223335",
+            nin="11122233355",
+            role="agent",
+        )
+        cls.company = Company.objects.create(
+            owner=owner, name="Seg Company", state="S", lga="L", area="A"
+        )
+        cls.agent = Agent.objects.create(user_id=agent_user, company=cls.company)
+
+        cls.customers = [
+            Customer.objects.create(
+                created_by=cls.agent,
+                first_name=f"Customer{index}",
+                last_name="Seg",
+                phone=f"08000000{index:03d}",
+            )
+            for index in range(10)
+        ]
+
+        # Customer i makes i successful transactions of i * 1000
+        for index, customer in enumerate(cls.customers):
+            for _ in range(index):
+                Transaction.objects.create(
+                    agent_id=cls.agent,
+                    customer_id=customer,
+                    amount=index * 1000,
+                    status="successful",
+                )
+
+    def test_classify_rfm(self):
+        recency = np.array([1, 2, 3, 4, 5, 200, 1], dtype=float)
+        frequency = np.array([1, 2, 3, 20, 30, 50, 0], dtype=float)
+        monetary = np.array([10, 20, 30, 4000, 5000, 9000, 0], dtype=float)
+
+        tags = classify_rfm(recency, frequency, monetary, inactive_after_days=90)
+
+        self.assertEqual(tags[5], "inactive")
+        self.assertEqual(tags[6], "inactive")
+        self.assertEqual(tags[0], "regular")
+        self.assertIn(tags[4], ["vip", "frequent"])
+
+    def test_segment_customers_updates_changed_tags(self):
+        updated = segment_company_customers(self.company.id)
+
+        tags = dict(
+            Customer.objects.filter(created_by=self.agent).values_list(
+                "first_name", "tag"
+            )
+        )
+        self.assertEqual(tags["Customer0"], "inactive")
+        self.assertEqual(tags["Customer9"], "vip")
+        self.assertEqual(tags["Customer1"], "regular")
+        self.assertGreater(updated, 0)
+
+        # A second run with no new data changes nothing
+        self.assertEqual(segment_company_customers(self.company.id), 0)
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomerViewSet
+from .views import CustomerViewSet, CustomerExportView
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet, basename='customer')
 
 urlpatterns = [
+    path('customers/export/', CustomerExportView.as_view(), name='customer-export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
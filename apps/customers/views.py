@@ -2,28 +2,42 @@ from rest_framework import viewsets, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.db import models  # Import models for database operations
 from .models import Customer
 from .serializers import CustomerSerializer
 from ..users.permissions import IsOwnerOrAgentOrSuperuser, IsAgentOrSuperuser
+from ..common.response_cache import CachedResponseMixin
 from ..external_tables.serializers import TransactionSerializer
+from ..common.export import (
+    iterate_keyset,
+    parse_export_dates,
+    streaming_csv_response,
+)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     serializer_class = CustomerSerializer
     permission_classes = [IsOwnerOrAgentOrSuperuser]
     
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Customer.objects.none()  # Return an empty queryset for schema generation
+        tenant = self.request.tenant
         if self.request.user.is_superuser:
             return Customer.objects.all()
-        elif self.request.user.role == "agent":
-            return Customer.objects.filter(created_by=self.request.user.agent)
-        elif self.request.user.role == "owner":
-            return Customer.objects.filter(created_by__company=self.request.user.company)
+        elif tenant.role == "agent":
+            return Customer.objects.filter(created_by_id=tenant.agent_pk)
+        elif tenant.role == "owner":
+            return Customer.objects.filter(created_by__company_id=tenant.company_id)
     
+    def cache_tags(self):
+        tags = super().cache_tags()
+        if tags and self.action == "retrieve":
+            tags.append(f"customer:{self.kwargs.get('pk')}")
+        return tags
+
     def get_permissions(self):
         if self.action in ["create"]:
             permissions = [IsAgentOrSuperuser]
@@ -151,4 +165,98 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 total=models.Sum('amount')
             )['total'] or 0,
         }
-        return Response(summary)
\ No newline at end of file
+        return Response(summary)
+
+
+class CustomerExportView(APIView):
+    permission_classes = [IsOwnerOrAgentOrSuperuser]
+
+    header = [
+        "customer_id",
+        "first_name",
+        "last_name",
+        "phone",
+        "tag",
+        "agent_id",
+        "created_at",
+    ]
+    fields = [
+        "customer_id",
+        "first_name",
+        "last_name",
+        "phone",
+        "tag",
+        "created_by__agent_id",
+        "created_at",
+    ]
+
+    def get_queryset(self):
+        tenant = self.request.tenant
+        if self.request.user.is_superuser:
+            return Customer.objects.all()
+        elif tenant.role == "agent":
+            return Customer.objects.filter(created_by_id=tenant.agent_pk)
+        elif tenant.role == "owner":
+            return Customer.objects.filter(created_by__company_id=tenant.company_id)
+        return Customer.objects.none()
+
+    @swagger_auto_schema(
+        operation_summary="Export customers as CSV",
+        operation_description="Stream the customers visible to the authenticated user as a CSV file, optionally filtered by agent and creation date and gzip compressed.",
+        manual_parameters=[
+            openapi.Parameter(
+                "agent_id",
+                openapi.IN_QUERY,
+                description="Agent ID for filtering customers.",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "start_date",
+                openapi.IN_QUERY,
+                description="Start date for filtering customers (YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "end_date",
+                openapi.IN_QUERY,
+                description="End date for filtering customers (YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "compress",
+                openapi.IN_QUERY,
+                description="Set to 'gzip' to receive a gzip compressed file.",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        responses={
+            200: "CSV file streamed successfully.",
+            400: "Invalid date format or other errors.",
+            403: "Permission denied.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            start_date, end_date = parse_export_dates(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": "Invalid date", "error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset()
+        if start_date:
+            queryset = queryset.filter(created_at__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(created_at__date__lte=end_date)
+
+        agent_id = request.query_params.get("agent_id")
+        if agent_id:
+            queryset = queryset.filter(created_by__agent_id=agent_id)
+
+        return streaming_csv_response(
+            "customers.csv",
+            self.header,
+            iterate_keyset(queryset, self.fields),
+            compress=request.query_params.get("compress") == "gzip",
+        )
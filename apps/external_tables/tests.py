@@ -1,3 +1,118 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+from datetime import datetime, timezone as dt_timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.agents.models import Agent
+from apps.companies.models import Company
+from apps.users.models import User
+from .models import Transaction
 
-# Create your tests here.
+
+class TransactionExportTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.agent = cls.create_company("export", "44455566")
+        _, cls.other_agent = cls.create_company("otherexport", "55566677")
+
+        cls.old = Transaction.objects.create(
+            agent_id=cls.agent, amount=100, fee=1, status="successful", description="Old"
+        )
+        cls.new = Transaction.objects.create(
+            agent_id=cls.agent, amount=200, fee=2, status="failed", description="New"
+        )
+        cls.other = Transaction.objects.create(
+            agent_id=cls.other_agent, amount=300, fee=3, status="successful"
+        )
+        Transaction.objects.filter(pk=cls.old.pk).update(
+            created_at=datetime(2025, 1, 10, 12, tzinfo=dt_timezone.utc)
+        )
+        Transaction.objects.filter(pk__in=[cls.new.pk, cls.other.pk]).update(
+            created_at=datetime(2025, 3, 10, 12, tzinfo=dt_timezone.utc)
+        )
+
+    @classmethod
+    def create_company(cls, name, number):
+        owner = User.objects.create_user(
+            email=f"{name}owner@example.com",
+            password="StrongPassword123!",
+            first_name="Export",
+            last_name="Owner",
+            phone=f"{number}01",
+            nin=f"{number}001",
+            role="owner",
+        )
+        agent_user = User.objects.create_user(
+            email=f"{name}agent@example.com",
+            password="StrongPassword123!",
+            first_name="Export",
+            last_name="Agent",
+            phone=f"{number}02",
+            nin=f"{number}002",
+            role="agent",
+        )
+        company = Company.objects.create(
+            owner=owner, name=f"{name} company", state="S", lga="L", area="A"
+        )
+        return owner, Agent.objects.create(user_id=agent_user, company=company)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+        self.url = reverse("api:transaction-export", kwargs={"version": "v1"})
+
+    def exported_ids(self, response):
+        content = b"".join(response.streaming_content)
+        if response["Content-Type"] == "application/gzip":
+            content = gzip.decompress(content)
+        return {row["id"] for row in csv.DictReader(io.StringIO(content.decode()))}
+
+    def test_owner_exports_only_their_company(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="transactions.csv"', response["Content-Disposition"])
+        self.assertEqual(self.exported_ids(response), {str(self.old.id), str(self.new.id)})
+
+    def test_agent_exports_only_their_transactions(self):
+        self.client.force_authenticate(user=self.other_agent.user_id)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(self.exported_ids(response), {str(self.other.id)})
+
+    def test_date_filter(self):
+        response = self.client.get(self.url, {"start_date": "2025-02-01"})
+        self.assertEqual(self.exported_ids(response), {str(self.new.id)})
+
+        response = self.client.get(
+            self.url, {"start_date": "2025-01-10", "end_date": "2025-01-10"}
+        )
+        self.assertEqual(self.exported_ids(response), {str(self.old.id)})
+
+    def test_invalid_dates_are_rejected(self):
+        for params in (
+            {"start_date": "not-a-date"},
+            {"start_date": "2025-03-01", "end_date": "2025-01-01"},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+
+    def test_status_and_agent_filters(self):
+        response = self.client.get(self.url, {"status": "failed"})
+        self.assertEqual(self.exported_ids(response), {str(self.new.id)})
+
+        # Another company's agent ID does not widen the owner's export
+        response = self.client.get(self.url, {"agent_id": self.other_agent.agent_id})
+        self.assertEqual(self.exported_ids(response), set())
+
+    def test_gzip(self):
+        response = self.client.get(self.url, {"compress": "gzip"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="transactions.csv.gz"', response["Content-Disposition"])
+        self.assertEqual(self.exported_ids(response), {str(self.old.id), str(self.new.id)})
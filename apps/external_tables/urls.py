@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import TransactionExportView
+
+urlpatterns = [
+    path(
+        "transactions/export/",
+        TransactionExportView.as_view(),
+        name="transaction-export",
+    ),
+]
@@ -1,3 +1,120 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from .models import Transaction
+from ..users.permissions import IsOwnerOrAgentOrSuperuser
+from ..common.export import (
+    iterate_keyset,
+    parse_export_dates,
+    streaming_csv_response,
+)
 
-# Create your views here.
+
+class TransactionExportView(APIView):
+    permission_classes = [IsOwnerOrAgentOrSuperuser]
+
+    header = [
+        "id",
+        "agent_id",
+        "customer_id",
+        "type",
+        "description",
+        "amount",
+        "fee",
+        "status",
+        "created_at",
+    ]
+    fields = [
+        "id",
+        "agent_id__agent_id",
+        "customer_id__customer_id",
+        "type",
+        "description",
+        "amount",
+        "fee",
+        "status",
+        "created_at",
+    ]
+
+    def get_queryset(self):
+        tenant = self.request.tenant
+        if self.request.user.is_superuser:
+            return Transaction.objects.all()
+        elif tenant.role == "agent":
+            return Transaction.objects.filter(agent_id=tenant.agent_pk)
+        elif tenant.role == "owner":
+            return Transaction.objects.filter(agent_id__company_id=tenant.company_id)
+        return Transaction.objects.none()
+
+    @swagger_auto_schema(
+        operation_summary="Export transactions as CSV",
+        operation_description="Stream the transactions visible to the authenticated user as a CSV file, optionally filtered by agent, status and date and gzip compressed.",
+        manual_parameters=[
+            openapi.Parameter(
+                "agent_id",
+                openapi.IN_QUERY,
+                description="Agent ID for filtering transactions.",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "status",
+                openapi.IN_QUERY,
+                description="Transaction status (successful, failed or pending).",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "start_date",
+                openapi.IN_QUERY,
+                description="Start date for filtering transactions (YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "end_date",
+                openapi.IN_QUERY,
+                description="End date for filtering transactions (YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "compress",
+                openapi.IN_QUERY,
+                description="Set to 'gzip' to receive a gzip compressed file.",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        responses={
+            200: "CSV file streamed successfully.",
+            400: "Invalid date format or other errors.",
+            403: "Permission denied.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            start_date, end_date = parse_export_dates(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"message": "Invalid date", "error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset()
+        if start_date:
+            queryset = queryset.filter(created_at__date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(created_at__date__lte=end_date)
+
+        agent_id = request.query_params.get("agent_id")
+        if agent_id:
+            queryset = queryset.filter(agent_id__agent_id=agent_id)
+
+        transaction_status = request.query_params.get("status")
+        if transaction_status:
+            queryset = queryset.filter(status=transaction_status)
+
+        return streaming_csv_response(
+            "transactions.csv",
+            self.header,
+            iterate_keyset(queryset, self.fields),
+            compress=request.query_params.get("compress") == "gzip",
+        )
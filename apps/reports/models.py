@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from ..common.models import BaseModel
+from ..companies.models import Company
+from ..users.models import User
+
+
+class ReportJob(BaseModel):
+    REPORT_TYPE_CHOICES = [
+        ("agent_statement", "Agent Statement"),
+        ("fee_totals", "Fee Totals"),
+    ]
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+        ("expired", "Expired"),
+    ]
+
+    # Jobs in these states count against the per-company concurrency cap
+    IN_PROGRESS = ["pending", "running"]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="report_jobs")
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="report_jobs")
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    parameters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    file = models.FileField(upload_to="reports/", null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["company", "status"])]
+
+    def __str__(self):
+        return f"{self.report_type} ({self.status})"
+
+    @classmethod
+    def stale(cls):
+        """In-progress jobs untouched for REPORT_JOB_TIMEOUT"""
+        return cls.objects.filter(
+            status__in=cls.IN_PROGRESS,
+            updated_at__lt=timezone.now() - settings.REPORT_JOB_TIMEOUT,
+        )
+
+    @property
+    def is_downloadable(self):
+        return (
+            self.status == "completed"
+            and bool(self.file)
+            and (self.expires_at is None or self.expires_at > timezone.now())
+        )
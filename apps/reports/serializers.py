@@ -0,0 +1,63 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .models import ReportJob
+
+
+class ReportParametersSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    agent_id = serializers.CharField(max_length=6, required=False)
+
+    def validate(self, attrs):
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError("Start date cannot be after End date")
+        return attrs
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    parameters = ReportParametersSerializer()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "report_type",
+            "parameters",
+            "status",
+            "error",
+            "download_url",
+            "created_at",
+            "completed_at",
+            "expires_at",
+        ]
+        read_only_fields = [
+            "id",
+            "status",
+            "error",
+            "download_url",
+            "created_at",
+            "completed_at",
+            "expires_at",
+        ]
+
+    def get_download_url(self, obj):
+        request = self.context.get("request")
+        if not request or not obj.is_downloadable:
+            return None
+        return request.build_absolute_uri(
+            reverse(
+                "api:report-download",
+                kwargs={"version": request.version, "pk": obj.id},
+            )
+        )
+
+    def validate_parameters(self, parameters):
+        # DateFields come back as date objects; store them as ISO strings in the JSONField
+        return {
+            key: value.isoformat() if hasattr(value, "isoformat") else value
+            for key, value in parameters.items()
+        }
+
+    def create(self, validated_data):
+        return ReportJob.objects.create(**validated_data)
@@ -0,0 +1,185 @@
+import csv
+import logging
+import tempfile
+from datetime import datetime
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import ReportJob
+from ..common.export import escape_formulas, iterate_keyset
+from ..external_tables.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _transactions_for(job):
+    parameters = job.parameters
+    transactions = Transaction.objects.filter(
+        agent_id__company_id=job.company_id,
+        created_at__date__gte=parameters["start_date"],
+        created_at__date__lte=parameters["end_date"],
+    )
+    if parameters.get("agent_id"):
+        transactions = transactions.filter(agent_id__agent_id=parameters["agent_id"])
+    return transactions
+
+
+def build_agent_statement(job):
+    """Every transaction per agent in the period, oldest first, streamed in keyset batches"""
+    header = [
+        "agent_id",
+        "transaction_id",
+        "created_at",
+        "customer_id",
+        "type",
+        "description",
+        "amount",
+        "fee",
+        "status",
+    ]
+    rows = iterate_keyset(
+        _transactions_for(job),
+        [
+            "agent_id__agent_id",
+            "id",
+            "created_at",
+            "customer_id__customer_id",
+            "type",
+            "description",
+            "amount",
+            "fee",
+            "status",
+        ],
+        batch_size=settings.REPORT_BATCH_SIZE,
+        order_by=("agent_id__agent_id", "created_at", "pk"),
+    )
+    return header, rows
+
+
+def build_fee_totals(job):
+    """Transaction count, amount and fee totals per agent per month"""
+    header = ["agent_id", "month", "transactions", "amount", "fees"]
+    rows = (
+        _transactions_for(job)
+        .filter(status="successful")
+        .annotate(month=TruncMonth("created_at"))
+        .values("agent_id__agent_id", "month")
+        .annotate(
+            transactions=Count("id"),
+            amount=Sum("amount"),
+            fees=Sum("fee"),
+        )
+        .order_by("agent_id__agent_id", "month")
+        .values_list("agent_id__agent_id", "month", "transactions", "amount", "fees")
+        .iterator(chunk_size=settings.REPORT_BATCH_SIZE)
+    )
+    return header, (
+        (agent_id, month.strftime("%Y-%m"), count, amount, fees)
+        for agent_id, month, count, amount, fees in rows
+    )
+
+
+REPORT_BUILDERS = {
+    "agent_statement": build_agent_statement,
+    "fee_totals": build_fee_totals,
+}
+
+
+def notify_report_status(job):
+    """Tell the company's dashboard sockets that a report job finished"""
+    channel_layer = get_channel_layer()
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"metrics_{job.company_id}",
+            {
+                "type": "report_status",
+                "data": {
+                    "id": job.id,
+                    "report_type": job.report_type,
+                    "status": job.status,
+                },
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
+    except Exception as e:
+        logger.warning("Failed to send report status to group: %s", e)
+
+
+@shared_task
+def generate_report(job_id):
+    """Build a report file in chunks and store it under MEDIA_ROOT"""
+    updated = ReportJob.objects.filter(id=job_id, status="pending").update(
+        status="running", updated_at=timezone.now()
+    )
+    if not updated:
+        return f"Report job {job_id} is not pending"
+
+    job = ReportJob.objects.get(id=job_id)
+    try:
+        header, rows = REPORT_BUILDERS[job.report_type](job)
+        with tempfile.TemporaryFile(mode="w+", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(escape_formulas(row))
+            fh.seek(0)
+            job.file.save(f"{job.report_type}_{job.id}.csv", File(fh), save=False)
+
+        now = timezone.now()
+        result = {
+            "file": job.file.name,
+            "status": "completed",
+            "completed_at": now,
+            "expires_at": now + settings.REPORT_RETENTION,
+        }
+    except Exception as e:
+        result = {"status": "failed", "error": str(e)}
+
+    # fail_stale_reports may have given up on the job meanwhile; its verdict
+    # has been sent to the dashboard already, so keep it and drop this result
+    finished = ReportJob.objects.filter(id=job_id, status="running").update(
+        updated_at=timezone.now(), **result
+    )
+    if not finished:
+        if job.file:
+            job.file.delete(save=False)
+        return f"Report job {job_id} was failed before it finished"
+
+    job.refresh_from_db()
+    notify_report_status(job)
+    return f"Report job {job_id} {job.status}"
+
+
+@shared_task
+def fail_stale_reports():
+    """Fail report jobs lost in pending or running, freeing their company's slots"""
+    count = 0
+    for job in ReportJob.stale().iterator():
+        job.status = "failed"
+        job.error = "Report job timed out"
+        job.save(update_fields=["status", "error", "updated_at"])
+        notify_report_status(job)
+        count += 1
+
+    return f"Failed {count} stale report jobs"
+
+
+@shared_task
+def purge_expired_reports():
+    """Delete report files past their expiry"""
+    expired = ReportJob.objects.filter(
+        status="completed", expires_at__lte=timezone.now()
+    )
+    count = 0
+    for job in expired.iterator():
+        job.file.delete(save=False)
+        job.status = "expired"
+        job.save(update_fields=["file", "status", "updated_at"])
+        count += 1
+
+    return f"Purged {count} expired reports"
@@ -0,0 +1,192 @@
+import csv
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.agents.models import Agent
+from apps.companies.models import Company
+from apps.external_tables.models import Transaction
+from apps.users.models import User
+from .models import ReportJob
+from .tasks import REPORT_BUILDERS, fail_stale_reports, generate_report
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), REPORT_JOBS_MAX_CONCURRENT=1)
+class ReportJobEndpointsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="reportowner@example.com",
+            password="StrongPassword123!",
+            first_name="Report",
+            last_name="Owner",
+            phone="2223334445",
+            nin="22233344455",
+            role="owner",
+        )
+        agent_user = User.objects.create_user(
+            email="reportagent@example.com",
+            password="StrongPassword123!",
+            first_name="Report",
+            last_name="Agent",
+            phone="2223334446",
+            nin="22233344466",
+            role="agent",
+        )
+        cls.company = Company.objects.create(
+            owner=cls.owner, name="Report Company", state="S", lga="L", area="A"
+        )
+        cls.agent = Agent.objects.create(user_id=agent_user, company=cls.company)
+        for amount in (100, 200, 300):
+            Transaction.objects.create(
+                agent_id=cls.agent, amount=amount, fee=10, status="successful"
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+        self.list_url = reverse("api:report-list", kwargs={"version": "v1"})
+        self.data = {
+            "report_type": "fee_totals",
+            "parameters": {"start_date": "2000-01-01", "end_date": "2100-01-01"},
+        }
+
+    def test_create_report_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job = ReportJob.objects.get(id=response.data["id"])
+        self.assertEqual(job.status, "completed")
+
+        detail_url = reverse("api:report-detail", kwargs={"version": "v1", "pk": job.id})
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["download_url"])
+
+        download_url = reverse("api:report-download", kwargs={"version": "v1", "pk": job.id})
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(f"{self.agent.agent_id},", content)
+        self.assertIn("600", content)
+
+    def test_concurrent_jobs_are_capped(self):
+        ReportJob.objects.create(
+            company=self.company,
+            requested_by=self.owner,
+            report_type="agent_statement",
+            parameters=self.data["parameters"],
+        )
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_stale_jobs_free_their_slot(self):
+        job = ReportJob.objects.create(
+            company=self.company,
+            requested_by=self.owner,
+            report_type="agent_statement",
+            parameters=self.data["parameters"],
+            status="running",
+        )
+        ReportJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - settings.REPORT_JOB_TIMEOUT - timedelta(minutes=1)
+        )
+
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        fail_stale_reports()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "Report job timed out")
+
+    @override_settings(REPORT_BATCH_SIZE=2)
+    def test_agent_statement_is_grouped_by_agent_and_chronological(self):
+        other_user = User.objects.create_user(
+            email="reportagent2@example.com",
+            password="StrongPassword123!",
+            first_name="Report",
+            last_name="Agent",
+            phone="2223334447",
+            nin="22233344477",
+            role="agent",
+        )
+        other_agent = Agent.objects.create(user_id=other_user, company=self.company)
+        start = timezone.now() - timedelta(days=1)
+        for index in range(4):
+            for agent in (other_agent, self.agent):
+                Transaction.objects.create(
+                    agent_id=agent, amount=index, fee=0, status="successful"
+                )
+        # Spread created_at so the order is not the insertion (or pk) order
+        for index, transaction_id in enumerate(
+            Transaction.objects.order_by("?").values_list("id", flat=True)
+        ):
+            Transaction.objects.filter(id=transaction_id).update(
+                created_at=start + timedelta(minutes=index)
+            )
+
+        job = ReportJob.objects.create(
+            company=self.company,
+            requested_by=self.owner,
+            report_type="agent_statement",
+            parameters=self.data["parameters"],
+        )
+        generate_report(job.id)
+        job.refresh_from_db()
+        with job.file.open("r") as fh:
+            rows = list(csv.reader(fh))[1:]
+
+        self.assertEqual(len(rows), Transaction.objects.count())
+        keys = [(row[0], row[2]) for row in rows]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_formula_cells_are_escaped(self):
+        Transaction.objects.filter(agent_id=self.agent).update(description="@SUM(A1:A9)")
+        job = ReportJob.objects.create(
+            company=self.company,
+            requested_by=self.owner,
+            report_type="agent_statement",
+            parameters=self.data["parameters"],
+        )
+        generate_report(job.id)
+        job.refresh_from_db()
+        with job.file.open("r") as fh:
+            rows = list(csv.DictReader(fh))
+
+        self.assertEqual({row["description"] for row in rows}, {"'@SUM(A1:A9)"})
+
+    def test_result_of_a_job_failed_as_stale_is_dropped(self):
+        job = ReportJob.objects.create(
+            company=self.company,
+            requested_by=self.owner,
+            report_type="fee_totals",
+            parameters=self.data["parameters"],
+        )
+
+        def build(job):
+            # The sweeper gives up on the job while it is being built
+            ReportJob.objects.filter(id=job.id).update(
+                status="failed", error="Report job timed out"
+            )
+            return ["agent_id"], [["A1"]]
+
+        with mock.patch.dict(REPORT_BUILDERS, {"fee_totals": build}), mock.patch(
+            "apps.reports.tasks.notify_report_status"
+        ) as notify:
+            generate_report(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertFalse(job.file)
+        notify.assert_not_called()
+
+    def test_invalid_date_range(self):
+        self.data["parameters"] = {"start_date": "2025-02-01", "end_date": "2025-01-01"}
+        response = self.client.post(self.list_url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
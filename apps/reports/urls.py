@@ -0,0 +1,12 @@
+from django.urls import path
+from .views import ReportJobListCreateView, ReportJobDetailView, ReportDownloadView
+
+urlpatterns = [
+    path("reports/", ReportJobListCreateView.as_view(), name="report-list"),
+    path("reports/<str:pk>/", ReportJobDetailView.as_view(), name="report-detail"),
+    path(
+        "reports/<str:pk>/download/",
+        ReportDownloadView.as_view(),
+        name="report-download",
+    ),
+]
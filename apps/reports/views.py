@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.generics import ListCreateAPIView, RetrieveAPIView
+from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
+from .models import ReportJob
+from ..companies.models import Company
+from .serializers import ReportJobSerializer
+from .tasks import generate_report
+from ..users.permissions import IsOwnerOrSuperuser
+
+
+class ReportJobQuerysetMixin:
+    def get_queryset(self):
+        user = self.request.user
+        if getattr(self, "swagger_fake_view", False):
+            return ReportJob.objects.none()
+        if user.is_superuser:
+            return ReportJob.objects.all()
+        return ReportJob.objects.filter(company_id=self.request.tenant.company_id)
+
+
+class ReportJobListCreateView(ReportJobQuerysetMixin, ListCreateAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsOwnerOrSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="List report jobs",
+        operation_description="Retrieve the report jobs requested for the authenticated owner's company.",
+        responses={
+            200: "List of report jobs retrieved successfully.",
+            403: "Permission denied.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Request a report",
+        operation_description="Queue a report job. Poll the job or listen on the company dashboard socket for a report_status event, then download the file.",
+        request_body=ReportJobSerializer,
+        responses={
+            202: "Report job queued.",
+            400: "Invalid data provided.",
+            403: "Permission denied.",
+            429: "Too many reports in progress for this company.",
+        },
+    )
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        company = request.tenant.company
+        if not company:
+            return Response(
+                {"message": "Company not found", "error": "Reports are generated per company."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Lock the company row so concurrent requests can't both pass the cap
+        list(Company.objects.select_for_update().filter(pk=company.pk).values_list("pk"))
+        in_progress = (
+            ReportJob.objects.filter(company=company, status__in=ReportJob.IN_PROGRESS)
+            .exclude(pk__in=ReportJob.stale().values("pk"))
+            .count()
+        )
+        if in_progress >= settings.REPORT_JOBS_MAX_CONCURRENT:
+            return Response(
+                {
+                    "message": "Too many reports in progress",
+                    "error": f"Only {settings.REPORT_JOBS_MAX_CONCURRENT} reports can run at once per company.",
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+        job = serializer.save(company=company, requested_by=request.user)
+        transaction.on_commit(lambda: generate_report.delay(job.id))
+
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ReportJobDetailView(ReportJobQuerysetMixin, RetrieveAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsOwnerOrSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a report job",
+        operation_description="Poll the status of a report job.",
+        responses={
+            200: "Report job retrieved successfully.",
+            404: "Report job not found.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ReportDownloadView(ReportJobQuerysetMixin, RetrieveAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsOwnerOrSuperuser]
+
+    @swagger_auto_schema(
+        operation_summary="Download a report",
+        operation_description="Download the file of a completed report job before it expires.",
+        responses={
+            200: "Report file.",
+            404: "Report job not found.",
+            409: "Report is not ready yet.",
+            410: "Report has expired or failed.",
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status in ReportJob.IN_PROGRESS:
+            return Response(
+                {"message": "Report not ready", "error": f"Report status is {job.status}."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if not job.is_downloadable:
+            return Response(
+                {"message": "Report unavailable", "error": f"Report status is {job.status}."},
+                status=status.HTTP_410_GONE,
+            )
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=job.file.name.rsplit("/", 1)[-1],
+            content_type="text/csv",
+        )
@@ -0,0 +1,255 @@
+# apps/users/async_views.py
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from drf_yasg import openapi
+from rest_framework_simplejwt.exceptions import TokenError
+from .models import User
+from .otp import verify_otp, VERIFY_EMAIL
+from .tokens import tokens_for_user, refresh_tokens
+from ..common.schema import document
+from ..common.throttling import take_tokens, TokenBucketThrottle
+
+# Password hashing runs here instead of on the event loop. The PBKDF2 and
+# Argon2 hashers release the GIL, so threads hash in parallel without the
+# cost of shipping Django settings to a process pool.
+_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix="password-hashing",
+)
+_pending_hashes = 0
+# Views run on the event loops of several threads, so guard the count
+_pending_lock = threading.Lock()
+
+# Only used for its get_ident(), which reads the client IP from request.META
+_throttle = TokenBucketThrottle()
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued"""
+
+
+async def run_hashing(func, *args):
+    """
+    Run func on the hashing pool. Raises HashingBusy instead of queueing
+    once PASSWORD_HASHING_MAX_PENDING hashes are in flight, so a login
+    storm is shed rather than building an unbounded backlog.
+    """
+    global _pending_hashes
+    with _pending_lock:
+        if _pending_hashes >= settings.PASSWORD_HASHING_MAX_PENDING:
+            raise HashingBusy()
+        _pending_hashes += 1
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hashing_executor, func, *args)
+    finally:
+        with _pending_lock:
+            _pending_hashes -= 1
+
+
+def _verify_password(password, encoded):
+    """Return whether password matches, and a rehash if the hasher changed"""
+    upgraded = []
+    valid = check_password(
+        password, encoded, setter=lambda raw: upgraded.append(make_password(raw))
+    )
+    return valid, (upgraded[0] if upgraded else None)
+
+
+def _error(message, status, **headers):
+    return JsonResponse({"error": message}, status=status, headers=headers)
+
+
+def _request_data(request):
+    """JSON or form body as a dict, or None if it cannot be parsed"""
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+async def _throttled(request, scope, data):
+    wait = await sync_to_async(take_tokens, thread_sensitive=False)(
+        scope, _throttle.get_ident(request), data.get("email")
+    )
+    if wait is None:
+        return None
+    return _error(
+        f"Request was throttled. Expected available in {wait} seconds.",
+        429,
+        **{"Retry-After": str(wait)},
+    )
+
+
+@document(
+    "api:login",
+    operation_summary="Login user",
+    operation_description="Log in with email and password. Returns access and refresh tokens, the user's role and full name.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "email": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_EMAIL),
+            "password": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_PASSWORD),
+        },
+        required=["email", "password"],
+    ),
+    responses={
+        200: "Login successful.",
+        400: "Invalid credentials or unverified email.",
+        429: "Too many login attempts.",
+        503: "Server is busy.",
+    },
+)
+@csrf_exempt
+@require_POST
+async def login(request, *args, **kwargs):
+    """
+    Log in with email and password. Returns access and refresh tokens.
+    """
+    data = _request_data(request)
+    if data is None:
+        return _error("Invalid request body.", 400)
+
+    throttled = await _throttled(request, "login", data)
+    if throttled:
+        return throttled
+
+    email = data.get("email")
+    password = data.get("password")
+    if not email or not password:
+        return _error("Email and password are required.", 400)
+
+    user = await (
+        User.objects.select_related("company", "agent").filter(email=email).afirst()
+    )
+
+    try:
+        if user is None:
+            # Hash anyway so the response time does not reveal unknown emails
+            await run_hashing(make_password, password)
+            valid, upgraded = False, None
+        else:
+            valid, upgraded = await run_hashing(_verify_password, password, user.password)
+    except HashingBusy:
+        return _error("Server is busy. Try again shortly.", 503, **{"Retry-After": "1"})
+
+    if not valid or not user.is_active:
+        return _error("Invalid email or password.", 400)
+    if not user.is_verified:
+        return _error("Email is not verified.", 400)
+
+    if upgraded:
+        await User.objects.filter(pk=user.pk).aupdate(password=upgraded)
+
+    refresh, access = await sync_to_async(tokens_for_user)(user)
+    return JsonResponse(
+        {
+            "refresh": str(refresh),
+            "access": str(access),
+            "role": user.role,
+            "full_name": f"{user.first_name} {user.last_name}",
+        },
+        status=200,
+    )
+
+
+@document(
+    "api:email-verify",
+    operation_summary="Verify email",
+    operation_description="Verify a user's email using the OTP sent to their email.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "email": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_EMAIL),
+            "otp": openapi.Schema(type=openapi.TYPE_STRING),
+        },
+        required=["email", "otp"],
+    ),
+    responses={
+        200: "Email verified successfully.",
+        400: "Invalid or expired OTP.",
+        404: "User not found.",
+        429: "Too many verification attempts.",
+    },
+)
+@csrf_exempt
+@require_POST
+async def verify_email(request, *args, **kwargs):
+    """
+    Verify a user's email using the OTP sent to their email.
+    """
+    data = _request_data(request)
+    if data is None:
+        return _error("Invalid request body.", 400)
+
+    throttled = await _throttled(request, "verify_email", data)
+    if throttled:
+        return throttled
+
+    otp = data.get("otp")
+    email = data.get("email")
+    if not otp or not email:
+        return _error("OTP and email are required.", 400)
+
+    if not await sync_to_async(verify_otp, thread_sensitive=False)(
+        email, VERIFY_EMAIL, otp
+    ):
+        return _error("Invalid or expired OTP.", 400)
+
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        return _error("User not found.", 404)
+
+    user.is_verified = True
+    await user.asave(update_fields=["is_verified", "updated_at"])
+
+    return JsonResponse({"message": "Email verified successfully."}, status=200)
+
+
+@document(
+    "api:refresh-token",
+    operation_summary="Refresh token",
+    operation_description="Exchange a refresh token for a new access token. Returns a rotated refresh token when rotation is enabled.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={"refresh": openapi.Schema(type=openapi.TYPE_STRING)},
+        required=["refresh"],
+    ),
+    responses={
+        200: "New access token issued.",
+        400: "Invalid or expired refresh token.",
+    },
+)
+@csrf_exempt
+@require_POST
+async def refresh_token(request, *args, **kwargs):
+    """
+    Exchange a refresh token for a new access token. Returns a rotated
+    refresh token when rotation is enabled.
+    """
+    data = _request_data(request)
+    if data is None:
+        return _error("Invalid request body.", 400)
+
+    token = data.get("refresh")
+    if not token:
+        return _error("Refresh token is required.", 400)
+
+    try:
+        tokens = await sync_to_async(refresh_tokens)(token)
+    except TokenError:
+        return _error("Invalid or expired refresh token.", 400)
+
+    return JsonResponse(tokens, status=200)
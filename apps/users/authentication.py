@@ -0,0 +1,128 @@
+# apps/users/authentication.py
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+# Every concrete User column except the password hash, which stays deferred
+# (and out of the shared cache) until something like check_password needs it
+USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields if field.attname != "password"
+]
+RELATED_FIELDS = ["company__id", "agent__id", "agent__agent_id", "agent__company_id"]
+
+# Process-local tier in front of the shared cache: {user_id: (expires_at, payload)}
+_local_cache = {}
+
+
+def _cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """Drop a user from both cache tiers; other processes expire within the local TTL"""
+    _local_cache.pop(str(user_id), None)
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_cached_user_on_commit(user_id):
+    # After commit, so a request racing the write cannot cache the old row
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+def _load_payload(user_id):
+    return (
+        User.objects.filter(pk=user_id)
+        .values(*USER_FIELDS, *RELATED_FIELDS)
+        .first()
+    )
+
+
+def _get_payload(user_id):
+    user_id = str(user_id)
+    now = time.monotonic()
+
+    local = _local_cache.get(user_id)
+    if local and local[0] > now:
+        return local[1]
+
+    payload = cache.get(_cache_key(user_id))
+    if payload is None:
+        payload = _load_payload(user_id)
+        if payload is None:
+            return None
+        cache.set(_cache_key(user_id), payload, timeout=settings.AUTH_USER_CACHE_TTL)
+
+    if len(_local_cache) >= settings.AUTH_USER_LOCAL_CACHE_SIZE:
+        _local_cache.clear()
+    _local_cache[user_id] = (now + settings.AUTH_USER_LOCAL_CACHE_TTL, payload)
+    return payload
+
+
+def build_user(payload):
+    """
+    Rebuild a User from a cached payload without touching the database.
+    The user's company and agent are attached as pk-only instances, so
+    filters like company=user.company and role checks need no queries;
+    any other attribute of them is loaded lazily on first access.
+    """
+    from ..agents.models import Agent
+    from ..companies.models import Company
+
+    user = User.from_db(
+        DEFAULT_DB_ALIAS, USER_FIELDS, [payload[name] for name in USER_FIELDS]
+    )
+
+    company = None
+    if payload["company__id"]:
+        company = Company.from_db(
+            DEFAULT_DB_ALIAS, ["id", "owner_id"], [payload["company__id"], user.pk]
+        )
+        Company._meta.get_field("owner").set_cached_value(company, user)
+    User._meta.get_field("company").set_cached_value(user, company)
+
+    agent = None
+    if payload["agent__id"]:
+        agent = Agent.from_db(
+            DEFAULT_DB_ALIAS,
+            ["id", "user_id_id", "agent_id", "company_id"],
+            [
+                payload["agent__id"],
+                user.pk,
+                payload["agent__agent_id"],
+                payload["agent__company_id"],
+            ],
+        )
+        Agent._meta.get_field("user_id").set_cached_value(agent, user)
+    User._meta.get_field("agent").set_cached_value(user, agent)
+
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user, role, company and
+    agent from a two-tier cache (process-local, then Redis) instead of
+    querying the users table on every request. Entries are invalidated
+    by apps.users.signals when a user, company or agent changes.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        payload = _get_payload(user_id)
+        if payload is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not payload["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return build_user(payload)
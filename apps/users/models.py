@@ -8,7 +8,6 @@ from django.contrib.auth.models import (
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator
-from django.utils.timezone import now
 from ..common.models import BaseModel
 from ..common.validators import phone_validator, validate_image_size
 
@@ -78,8 +77,6 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     is_verified = models.BooleanField(default=False)
     is_email_enabled = models.BooleanField(default=False)
     is_push_notification_enabled = models.BooleanField(default=False)
-    otp = models.CharField(max_length=6, blank=True, null=True)
-    otp_expiration = models.DateTimeField(blank=True, null=True)
 
     objects = UserManager()
 
@@ -97,7 +94,3 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
 
     def __str__(self):
         return f"{self.email}"
-
-    def is_otp_valid(self):
-        return self.otp and self.otp_expiration and self.otp_expiration > now()
-
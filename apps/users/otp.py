@@ -0,0 +1,54 @@
+# apps/users/otp.py
+import hmac
+import secrets
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+VERIFY_EMAIL = "verify_email"
+RESET_PASSWORD = "reset_password"
+
+
+def _code_key(purpose, email):
+    return f"otp:{purpose}:{email.strip().lower()}"
+
+
+def _attempts_key(purpose, email):
+    return f"{_code_key(purpose, email)}:attempts"
+
+
+def _digest(code):
+    # Only a keyed hash of the code is stored, never the code itself
+    return salted_hmac("apps.users.otp", str(code)).hexdigest()
+
+
+def issue_otp(email, purpose):
+    """Create a new OTP for `email`, replacing any previous one for `purpose`"""
+    code = str(secrets.randbelow(900000) + 100000)
+    cache.set(_code_key(purpose, email), _digest(code), timeout=settings.OTP_TTL_SECONDS)
+    cache.delete(_attempts_key(purpose, email))
+    return code
+
+
+def verify_otp(email, purpose, code):
+    """
+    Check `code` against the stored OTP. A correct code is consumed; after
+    OTP_MAX_ATTEMPTS wrong guesses the OTP is revoked and a new one is needed.
+    """
+    code_key = _code_key(purpose, email)
+    attempts_key = _attempts_key(purpose, email)
+
+    stored = cache.get(code_key)
+    if stored is None:
+        return False
+
+    cache.add(attempts_key, 0, timeout=settings.OTP_TTL_SECONDS)
+    if cache.incr(attempts_key) > settings.OTP_MAX_ATTEMPTS:
+        cache.delete_many([code_key, attempts_key])
+        return False
+
+    if not hmac.compare_digest(stored, _digest(code)):
+        return False
+
+    cache.delete_many([code_key, attempts_key])
+    return True
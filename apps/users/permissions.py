@@ -48,3 +48,13 @@ class IsOwnerOrAgentOrSuperuser(BasePermission):
             or request.user.is_superuser)
         )
 
+
+class IsSuperuser(BasePermission):
+    """
+    Grants access to superusers only.
+    """
+
+    message = "Only superusers can perform this action."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
@@ -0,0 +1,113 @@
+import hashlib
+import redis
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from ..common.export import iterate_keyset
+from ..common.redis import get_redis
+
+# Set once the store has been loaded from the BlacklistedToken table. Until
+# then (or after Redis loses its data) callers fall back to the database.
+# It expires before the next sync is due and is dropped when a revocation
+# cannot be written, so an incomplete store is never trusted for long.
+READY_KEY = "revoked:ready"
+
+SECONDS_PER_DAY = 86400
+
+
+class RevocationStoreUnavailable(Exception):
+    """Redis is unreachable or has not been loaded from the blacklist yet"""
+
+
+def _bloom_key(exp):
+    # One filter per day of expiry, so whole filters expire with their tokens
+    # instead of accumulating bits for tokens that can no longer be used
+    return f"revoked:bloom:{exp // SECONDS_PER_DAY}"
+
+
+def _jti_key(jti):
+    return f"revoked:jti:{jti}"
+
+
+def _bit_positions(jti):
+    digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "big")
+    h2 = int.from_bytes(digest[8:], "big") | 1
+    bits = settings.TOKEN_REVOCATION_BLOOM_BITS
+    return [(h1 + i * h2) % bits for i in range(settings.TOKEN_REVOCATION_BLOOM_HASHES)]
+
+
+def _add(pipe, jti, exp):
+    bloom_key = _bloom_key(exp)
+    for position in _bit_positions(jti):
+        pipe.setbit(bloom_key, position, 1)
+    pipe.expireat(bloom_key, (exp // SECONDS_PER_DAY + 1) * SECONDS_PER_DAY)
+    pipe.set(_jti_key(jti), 1, exat=exp)
+
+
+def mark_revoked(jti, exp):
+    """Add a token's jti to the revocation store until the token expires"""
+    client = get_redis()
+    try:
+        pipe = client.pipeline(transaction=False)
+        _add(pipe, jti, exp)
+        pipe.execute()
+    except redis.RedisError as e:
+        # The store would miss this token: stop trusting it until the next sync
+        try:
+            client.delete(READY_KEY)
+        except redis.RedisError:
+            pass
+        raise RevocationStoreUnavailable(str(e)) from e
+
+
+def is_revoked(jti, exp):
+    """
+    Check a jti in at most two round trips, whatever the size of the
+    blacklist. Most tokens are rejected by the Bloom filter alone; only
+    possible members are confirmed against the exact per-jti key.
+    """
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(READY_KEY)
+        bloom_key = _bloom_key(exp)
+        for position in _bit_positions(jti):
+            pipe.getbit(bloom_key, position)
+        ready, *bits = pipe.execute()
+        if not ready:
+            raise RevocationStoreUnavailable("Revocation store has not been loaded")
+        if not all(bits):
+            return False
+        return bool(client.exists(_jti_key(jti)))
+    except redis.RedisError as e:
+        raise RevocationStoreUnavailable(str(e)) from e
+
+
+def sync_revocations(batch_size=None):
+    """
+    Load every unexpired blacklisted token into Redis and mark the store
+    ready. Also repairs any revocation whose Redis write failed.
+    Returns the number of tokens loaded.
+    """
+    batch_size = batch_size or settings.TOKEN_REVOCATION_SYNC_BATCH_SIZE
+    rows = iterate_keyset(
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()),
+        ["token__jti", "token__expires_at"],
+        batch_size=batch_size,
+    )
+
+    count = 0
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        for jti, expires_at in rows:
+            _add(pipe, jti, int(expires_at.timestamp()))
+            count += 1
+            if count % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        client.set(READY_KEY, 1, ex=settings.TOKEN_REVOCATION_READY_TTL)
+    except redis.RedisError as e:
+        raise RevocationStoreUnavailable(str(e)) from e
+    return count
@@ -2,7 +2,6 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .models import User
-from django.contrib.auth import authenticate
 
 class RegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -49,22 +48,6 @@ class RegistrationSerializer(serializers.ModelSerializer):
 
 
 
-class LoginSerializer(serializers.Serializer):
-    email = serializers.EmailField()
-    password = serializers.CharField(write_only=True)
-
-    def validate(self, data):
-        user = authenticate(email=data["email"], password=data["password"])
-        if not user:
-            raise serializers.ValidationError("Invalid email or password.")
-        if not user.is_verified:
-            raise serializers.ValidationError("Email is not verified.")
-        return user
-
-    class Meta:
-        ref_name = "CustomLoginSerializer"  # Unique name to avoid conflicts
-
-
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
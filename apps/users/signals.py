@@ -0,0 +1,20 @@
+# apps/users/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_cached_user_on_commit
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_cached_user_on_commit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender="companies.Company")
+def invalidate_company_owner(sender, instance, **kwargs):
+    invalidate_cached_user_on_commit(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender="agents.Agent")
+def invalidate_agent_user(sender, instance, **kwargs):
+    invalidate_cached_user_on_commit(instance.user_id_id)
@@ -0,0 +1,41 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from .revocation import sync_revocations, RevocationStoreUnavailable
+
+
+@shared_task
+def purge_expired_tokens(batch_size=None):
+    """
+    Delete expired outstanding and blacklisted refresh tokens in small
+    chunks, so the purge never holds long locks on the token tables.
+    An expired token fails validation on its own, so its rows are dead.
+    """
+    batch_size = batch_size or settings.TOKEN_PURGE_BATCH_SIZE
+    now = timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by("id")
+
+    count = 0
+    while True:
+        ids = list(expired.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        count += len(ids)
+
+    return f"Purged {count} expired tokens"
+
+
+@shared_task
+def sync_token_revocations():
+    """Reload the Redis revocation store from the token blacklist"""
+    try:
+        count = sync_revocations()
+    except RevocationStoreUnavailable as e:
+        return f"Revocation store unavailable: {e}"
+    return f"Synced {count} revoked tokens"
@@ -3,8 +3,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
 from apps.users.models import User
-from datetime import timedelta
-from django.utils.timezone import now
+from apps.users.otp import issue_otp, VERIFY_EMAIL, RESET_PASSWORD
 
 @pytest.fixture
 def api_client():
@@ -50,8 +49,8 @@ def test_login_user(api_client, create_user):
     }
     response = api_client.post(url, data, format='json')
     assert response.status_code == status.HTTP_200_OK
-    assert "access" in response.data
-    assert "refresh" in response.data
+    assert "access" in response.json()
+    assert "refresh" in response.json()
 
 @pytest.mark.django_db
 def test_verify_email(api_client, create_user):
@@ -63,17 +62,16 @@ def test_verify_email(api_client, create_user):
         phone="1234567890",
         nin="12345678901",
         role="owner",
-        otp="123456",
-        otp_expiration=now() + timedelta(minutes=5)
     )
+    otp = issue_otp(user.email, VERIFY_EMAIL)
     url = reverse('api:email-verify', kwargs={"version": "v1"})
     data = {
         "email": user.email,
-        "otp": "123456"
+        "otp": otp
     }
     response = api_client.post(url, data, format='json')
     assert response.status_code == status.HTTP_200_OK
-    assert "message" in response.data
+    assert "message" in response.json()
 
 @pytest.mark.django_db
 def test_forgot_password(api_client, create_user):
@@ -103,13 +101,12 @@ def test_reset_password(api_client, create_user):
         phone="1234567890",
         nin="12345678901",
         role="owner",
-        otp="123456",
-        otp_expiration=now() + timedelta(minutes=5)
     )
+    otp = issue_otp(user.email, RESET_PASSWORD)
     url = reverse('api:reset-password', kwargs={"version": "v1"})
     data = {
         "email": user.email,
-        "otp": "123456",
+        "otp": otp,
         "new_password": "NewStrongPassword123!",
         "confirm_password": "NewStrongPassword123!"
     }
@@ -117,6 +114,30 @@ def test_reset_password(api_client, create_user):
     assert response.status_code == status.HTTP_200_OK
     assert "message" in response.data
 
+@pytest.mark.django_db
+def test_verify_email_rejects_wrong_otp(api_client, create_user):
+    user = create_user(
+        email="testuser@example.com",
+        password="StrongPassword123!",
+        first_name="Test",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+    )
+    otp = issue_otp(user.email, VERIFY_EMAIL)
+    url = reverse('api:email-verify', kwargs={"version": "v1"})
+
+    for _ in range(5):
+        response = api_client.post(url, {"email": user.email, "otp": "000000"}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Too many attempts revoke the OTP, so even the right code fails now
+    response = api_client.post(url, {"email": user.email, "otp": otp}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    user.refresh_from_db()
+    assert not user.is_verified
+
 @pytest.mark.django_db
 def test_logout_user(api_client, create_user):
     user = create_user(
@@ -135,10 +156,190 @@ def test_logout_user(api_client, create_user):
         "password": "StrongPassword123!"
     }
     login_response = api_client.post(url, data, format='json')
-    refresh_token = login_response.data["refresh"]
+    refresh_token = login_response.json()["refresh"]
 
     url = reverse('api:logout', kwargs={"version": "v1"})
     data = {"refresh": refresh_token}
     response = api_client.post(url, data, format='json')
     assert response.status_code == status.HTTP_200_OK
-    assert "message" in response.data
\ No newline at end of file
+    assert "message" in response.data
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication(
+    create_user, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    from rest_framework_simplejwt.tokens import AccessToken
+    from apps.companies.models import Company
+    from apps.users.authentication import CachedJWTAuthentication
+
+    user = create_user(
+        email="cached@example.com",
+        password="StrongPassword123!",
+        first_name="Cached",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+    )
+    company = Company.objects.create(
+        owner=user, name="Cached Company", state="S", lga="L", area="A"
+    )
+    token = AccessToken.for_user(user)
+    authentication = CachedJWTAuthentication()
+
+    authentication.get_user(token)
+    with django_assert_num_queries(0):
+        cached = authentication.get_user(token)
+        assert cached.pk == user.pk
+        assert cached.role == "owner"
+        assert cached.company.pk == company.pk
+        assert not hasattr(cached, "agent")
+
+    # Saving the user invalidates the cached entry once the save commits
+    with django_capture_on_commit_callbacks(execute=True):
+        user.first_name = "Renamed"
+        user.save()
+        assert authentication.get_user(token).first_name == "Cached"
+    assert authentication.get_user(token).first_name == "Renamed"
+
+    # The password hash is never cached but still loads on demand
+    assert authentication.get_user(token).check_password("StrongPassword123!")
+
+@pytest.mark.django_db
+def test_refresh_token_rotation(api_client, create_user):
+    from apps.users.tokens import RevocableRefreshToken
+
+    user = create_user(
+        email="rotate@example.com",
+        password="StrongPassword123!",
+        first_name="Rotate",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+    )
+    refresh_token = str(RevocableRefreshToken.for_user(user))
+    url = reverse('api:refresh-token', kwargs={"version": "v1"})
+
+    response = api_client.post(url, {"refresh": refresh_token}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert "access" in response.json()
+    assert response.json()["refresh"] != refresh_token
+
+    # The rotated-out token is blacklisted; without Redis the check falls back to the table
+    response = api_client.post(url, {"refresh": refresh_token}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_purge_expired_tokens(create_user):
+    from datetime import timedelta
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import (
+        BlacklistedToken,
+        OutstandingToken,
+    )
+    from apps.users.tasks import purge_expired_tokens
+
+    user = create_user(
+        email="purge@example.com",
+        password="StrongPassword123!",
+        first_name="Purge",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+    )
+    now = timezone.now()
+    for index in range(5):
+        token = OutstandingToken.objects.create(
+            user=user, jti=f"expired-{index}", token="t", expires_at=now - timedelta(days=1)
+        )
+        BlacklistedToken.objects.create(token=token)
+    live = OutstandingToken.objects.create(
+        user=user, jti="live", token="t", expires_at=now + timedelta(days=1)
+    )
+
+    purge_expired_tokens(batch_size=2)
+
+    assert list(OutstandingToken.objects.values_list("id", flat=True)) == [live.id]
+    assert not BlacklistedToken.objects.exists()
+
+@pytest.mark.django_db
+def test_login_sheds_load_when_hashing_pool_is_full(api_client, create_user, settings):
+    user = create_user(
+        email="busy@example.com",
+        password="StrongPassword123!",
+        first_name="Busy",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+        is_verified=True,
+    )
+    url = reverse('api:login', kwargs={"version": "v1"})
+    data = {"email": user.email, "password": "WrongPassword123!"}
+
+    response = api_client.post(url, data, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error"] == "Invalid email or password."
+
+    settings.PASSWORD_HASHING_MAX_PENDING = 0
+    response = api_client.post(url, data, format='json')
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == "1"
+
+
+@pytest.mark.django_db
+def test_failed_revocation_write_drops_the_ready_flag(create_user, settings):
+    from unittest import mock
+    import redis
+    from rest_framework_simplejwt.exceptions import TokenError
+    from apps.users import revocation
+    from apps.users.tokens import RevocableRefreshToken
+
+    user = create_user(
+        email="revoke@example.com",
+        password="StrongPassword123!",
+        first_name="Revoke",
+        last_name="User",
+        phone="1234567890",
+        nin="12345678901",
+        role="owner",
+    )
+    refresh = RevocableRefreshToken.for_user(user)
+    client = mock.MagicMock()
+    client.pipeline.return_value.execute.side_effect = redis.ConnectionError("down")
+
+    with mock.patch.object(revocation, "get_redis", return_value=client), \
+            mock.patch("apps.users.tokens.logger") as logger:
+        refresh.blacklist()
+
+    client.delete.assert_called_once_with(revocation.READY_KEY)
+    logger.warning.assert_called_once()
+
+    # Checks now go to the table, which already has the token
+    with pytest.raises(TokenError):
+        RevocableRefreshToken(str(refresh))
+
+    # A reload marks the store ready only until the next sync is due
+    client = mock.MagicMock()
+    with mock.patch.object(revocation, "get_redis", return_value=client):
+        revocation.sync_revocations()
+    client.set.assert_called_once_with(
+        revocation.READY_KEY, 1, ex=settings.TOKEN_REVOCATION_READY_TTL
+    )
+
+
+def test_async_auth_views_are_in_the_schema():
+    from drf_yasg import openapi
+    from apps.common.schema import SchemaGenerator
+
+    schema = SchemaGenerator(openapi.Info(title="POS-Padi API", default_version="v1")).get_schema(
+        public=True
+    )
+
+    for name in ("login", "verify", "refresh-token"):
+        operation = schema["paths"][f"/api/{{version}}/users/{name}/"]["post"]
+        assert operation["summary"]
+        assert "200" in operation["responses"]
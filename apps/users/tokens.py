@@ -1,5 +1,13 @@
 # apps/users/tokens.py
+import logging
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .revocation import is_revoked, mark_revoked, RevocationStoreUnavailable
+
+logger = logging.getLogger(__name__)
 
 class EmailVerificationTokenGenerator(PasswordResetTokenGenerator):
     def _make_hash_value(self, user, timestamp):
@@ -8,3 +16,85 @@ class EmailVerificationTokenGenerator(PasswordResetTokenGenerator):
         )
 
 email_verification_token = EmailVerificationTokenGenerator()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    RefreshToken whose blacklist check reads the Redis revocation store
+    instead of the BlacklistedToken table, falling back to the table
+    whenever Redis is unavailable. The table stays the source of truth:
+    blacklisting writes it first and then the store.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload.get("exp")
+        if exp is None:
+            return super().check_blacklist()
+
+        try:
+            revoked = is_revoked(jti, exp)
+        except RevocationStoreUnavailable:
+            return super().check_blacklist()
+
+        if revoked:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        try:
+            mark_revoked(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        except RevocationStoreUnavailable as e:
+            # Checks fall back to the table until sync_token_revocations reloads the store
+            logger.warning("Failed to add token to the revocation store: %s", e)
+        return result
+
+
+def tokens_for_user(user):
+    """
+    Issue a refresh token and an access token carrying the user's role,
+    company and agent claims. Reads user.company and user.agent, so load
+    them with select_related to avoid extra queries.
+    """
+    refresh = RevocableRefreshToken.for_user(user)
+    access = refresh.access_token
+    access["role"] = user.role
+
+    if user.role == "owner":
+        company = getattr(user, "company", None)
+        if company:
+            access["company_id"] = company.id
+
+    elif user.role == "agent":
+        agent = getattr(user, "agent", None)
+        if agent:
+            access["agent_id"] = agent.agent_id
+            access["company_id"] = agent.company_id
+
+    elif user.role == "customer":
+        customer = getattr(user, "customer", None)
+        if customer:
+            access["customer_id"] = customer.customer_id
+
+    return refresh, access
+
+
+def refresh_tokens(refresh_token):
+    """
+    Exchange a refresh token for a new access token, rotating the refresh
+    token when ROTATE_REFRESH_TOKENS is set. Raises TokenError if the token
+    is invalid, expired or blacklisted.
+    """
+    refresh = RevocableRefreshToken(refresh_token)
+    data = {"access": str(refresh.access_token)}
+
+    if api_settings.ROTATE_REFRESH_TOKENS:
+        if api_settings.BLACKLIST_AFTER_ROTATION:
+            refresh.blacklist()
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        refresh.outstand()
+        data["refresh"] = str(refresh)
+
+    return data
@@ -1,22 +1,21 @@
 # apps/users/views.py
-import random
-from datetime import timedelta
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.core.mail import send_mail, BadHeaderError
-from django.utils.timezone import now
-from django.conf import settings
 from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, JSONParser
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.generics import UpdateAPIView
 from .models import User
-from .serializers import RegistrationSerializer, LoginSerializer
+from .serializers import RegistrationSerializer
+from .tokens import RevocableRefreshToken
+from .otp import issue_otp, verify_otp, VERIFY_EMAIL, RESET_PASSWORD
+from ..common.mail import queue_email
+from ..common.renderers import ORJSONParser
+from ..common.throttling import TokenBucketThrottle
 from ..customers.serializers import CustomerSerializer, Customer
 from ..agents.serializers import AgentSerializer, Agent
 from ..companies.serializers import CompanySerializer, Company
@@ -28,16 +27,8 @@ from ..external_tables.serializers import (
 )
 
 
-def generate_otp(user):
-    otp = random.randint(100000, 999999)
-    user.otp = otp
-    user.otp_expiration = now() + timedelta(seconds=300)
-    user.save()
-    return otp
-
-
 class RegistrationAPIView(APIView):
-    parser_classes = [MultiPartParser, JSONParser]
+    parser_classes = [MultiPartParser, ORJSONParser]
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(
@@ -47,137 +38,26 @@ class RegistrationAPIView(APIView):
         responses={
             201: "User registered successfully. Check your email for the OTP to verify your account.",
             400: "Invalid data or bad request.",
-            500: "Email sending failed.",
         },
     )
     @transaction.atomic
     def post(self, request, *args, **kwargs):
         serializer = RegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            user.role = "owner"  # Default role
-            otp = generate_otp(user)
-            try:
-                send_mail(
-                    subject="Verify Your Email",
-                    message=f"Your OTP for email verification is: {otp}",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-                return Response(
-                    {
-                        "message": "User registered successfully. Check your email for the OTP to verify your account."
-                    },
-                    status=status.HTTP_201_CREATED,
-                )
-            except Exception as e:
-                return Response(
-                    {"error": f"An error occurred while processing your request. {e}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-
-class LoginAPIView(APIView):
-    parser_classes = [MultiPartParser, JSONParser]
-    permission_classes = [AllowAny]
-
-    @swagger_auto_schema(
-        operation_summary="Login user",
-        operation_description="This endpoint allows a user to log in by providing their email and password. Returns access and refresh tokens.",
-        request_body=LoginSerializer,
-        responses={
-            200: "Login successful. Returns access and refresh tokens.",
-            400: "Invalid credentials.",
-        },
-    )
-    def post(self, request, *args, **kwargs):
-        serializer = LoginSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data
-        refresh = RefreshToken.for_user(user)
-
-        # Adding custom claims to the token
-        access = refresh.access_token
-        access["role"] = user.role
-        
-        if user.role == "owner":
-            access["company_id"] = user.company.id
-
-        if user.role == "agent":
-            access["agent_id"] = user.agent.agent_id
-            access["company_id"] = user.agent.company.id
-            print(user.agent.company.id)
-
-        elif user.role == "customer":
-            access["customer_id"] = user.customer.customer_id
-
-        return Response(
-            {
-                "refresh": str(refresh),
-                "access": str(access),
-                "role": user.role,
-                "full_name": f"{user.first_name} {user.last_name}",
-            },
-            status=status.HTTP_200_OK,
-        )
-
-
-class VerifyEmailAPIView(APIView):
-    permission_classes = [AllowAny]
-
-    @swagger_auto_schema(
-        operation_summary="Verify email",
-        operation_description="This endpoint verifies a user's email using the OTP sent to their email.",
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={
-                "email": openapi.Schema(
-                    type=openapi.TYPE_STRING, description="User's email"
-                ),
-                "otp": openapi.Schema(
-                    type=openapi.TYPE_STRING, description="OTP sent to the user's email"
-                ),
-            },
-            required=["email", "otp"],
-        ),
-        responses={
-            200: "Email verified successfully.",
-            400: "Invalid or expired OTP.",
-            404: "User not found.",
-        },
-    )
-    def post(self, request, *args, **kwargs):
-        otp = request.data.get("otp")
-        email = request.data.get("email")
-
-        if not otp or not email:
-            return Response(
-                {"error": "OTP and email are required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response(
-                {"error": "User not found."}, status=status.HTTP_404_NOT_FOUND
+            user = serializer.save(role="owner")  # Default role
+            otp = issue_otp(user.email, VERIFY_EMAIL)
+            queue_email(
+                subject="Verify Your Email",
+                body=f"Your OTP for email verification is: {otp}",
+                to=[user.email],
             )
-
-        if user.otp != otp or user.otp_expiration < now():
             return Response(
-                {"error": "Invalid or expired OTP."}, status=status.HTTP_400_BAD_REQUEST
+                {
+                    "message": "User registered successfully. Check your email for the OTP to verify your account."
+                },
+                status=status.HTTP_201_CREATED,
             )
-
-        user.is_verified = True
-        user.otp = None
-        user.otp_expiration = None
-        user.save()
-
-        return Response(
-            {"message": "Email verified successfully."}, status=status.HTTP_200_OK
-        )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class LogoutAPIView(APIView):
@@ -209,7 +89,7 @@ class LogoutAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            token = RefreshToken(refresh_token)
+            token = RevocableRefreshToken(refresh_token)
             token.blacklist()
 
             return Response(
@@ -224,6 +104,8 @@ class LogoutAPIView(APIView):
 
 class ForgotPasswordAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "forgot_password"
 
     @swagger_auto_schema(
         operation_summary="Forgot password",
@@ -240,7 +122,7 @@ class ForgotPasswordAPIView(APIView):
         responses={
             200: "OTP sent to your email.",
             404: "User with this email does not exist or is not verified.",
-            500: "Failed to send email.",
+            429: "Too many requests. Retry after the number of seconds in Retry-After.",
         },
     )
     def post(self, request, *args, **kwargs):
@@ -258,27 +140,21 @@ class ForgotPasswordAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        otp = generate_otp(user)
-        try:
-            send_mail(
-                subject="Password Reset OTP",
-                message=f"Your OTP for password reset is: {otp}",
-                from_email="steveaustine126@gmail.com",
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            return Response(
-                {"message": "OTP sent to your email."}, status=status.HTTP_200_OK
-            )
-        except Exception as e:
-            return Response(
-                {"error": f"Failed to send email: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+        otp = issue_otp(user.email, RESET_PASSWORD)
+        queue_email(
+            subject="Password Reset OTP",
+            body=f"Your OTP for password reset is: {otp}",
+            to=[user.email],
+        )
+        return Response(
+            {"message": "OTP sent to your email."}, status=status.HTTP_200_OK
+        )
 
 
 class ResetPasswordAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reset_password"
 
     @swagger_auto_schema(
         operation_summary="Reset password",
@@ -305,6 +181,7 @@ class ResetPasswordAPIView(APIView):
             200: "Password reset successful.",
             400: "Invalid or expired OTP, or passwords do not match.",
             404: "User not found.",
+            429: "Too many requests. Retry after the number of seconds in Retry-After.",
         },
     )
     def post(self, request, *args, **kwargs):
@@ -324,6 +201,11 @@ class ResetPasswordAPIView(APIView):
                 {"error": "Passwords do not match."}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        if not verify_otp(email, RESET_PASSWORD, otp):
+            return Response(
+                {"error": "Invalid or expired OTP."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
@@ -331,15 +213,8 @@ class ResetPasswordAPIView(APIView):
                 {"error": "User not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if user.otp != otp or user.otp_expiration < now():
-            return Response(
-                {"error": "Invalid or expired OTP."}, status=status.HTTP_400_BAD_REQUEST
-            )
-
         user.set_password(new_password)
-        user.otp = None
-        user.otp_expiration = None
-        user.save()
+        user.save(update_fields=["password", "updated_at"])
 
         return Response(
             {"message": "Password reset successful."}, status=status.HTTP_200_OK
@@ -348,6 +223,8 @@ class ResetPasswordAPIView(APIView):
 
 class GenerateNewOTPView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "resend_otp"
 
     @swagger_auto_schema(
         operation_summary="Generate new OTP",
@@ -363,9 +240,8 @@ class GenerateNewOTPView(APIView):
         ),
         responses={
             201: "Check your email for the OTP to verify your account.",
-            400: "Invalid header found.",
             404: "User with this email does not exist or email is verified.",
-            500: "Email sending failed.",
+            429: "Too many requests. Retry after the number of seconds in Retry-After.",
         },
     )
     def post(self, request, *args, **kwargs):
@@ -383,68 +259,16 @@ class GenerateNewOTPView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        otp = generate_otp(user)
-        try:
-            send_mail(
-                subject="Verify Your Email",
-                message=f"Your OTP for email verification is: {otp}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            return Response(
-                {"message": "Check your email for the OTP to verify your account."},
-                status=status.HTTP_201_CREATED,
-            )
-        except BadHeaderError:
-            return Response(
-                {"error": "Invalid header found."}, status=status.HTTP_400_BAD_REQUEST
-            )
-        except Exception as e:
-            return Response(
-                {"error": f"Email sending failed: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-
-
-class RefreshTokenAPIView(APIView):
-    permission_classes = [AllowAny]
-
-    @swagger_auto_schema(
-        operation_summary="Refresh access token",
-        operation_description="This endpoint refreshes the access token using the refresh token.",
-        request_body=openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={
-                "refresh": openapi.Schema(
-                    type=openapi.TYPE_STRING,
-                    description="Refresh token to renew access token",
-                ),
-            },
-            required=["refresh"],
-        ),
-        responses={
-            200: "Access token refreshed successfully.",
-            400: "Invalid or expired refresh token.",
-        },
-    )
-    def post(self, request, *args, **kwargs):
-        refresh_token = request.data.get("refresh")
-        if not refresh_token:
-            return Response(
-                {"error": "Refresh token is required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            refresh = RefreshToken(refresh_token)
-            access_token = refresh.access_token
-            return Response({"access": str(access_token)}, status=status.HTTP_200_OK)
-        except TokenError:
-            return Response(
-                {"error": "Invalid or expired refresh token."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        otp = issue_otp(user.email, VERIFY_EMAIL)
+        queue_email(
+            subject="Verify Your Email",
+            body=f"Your OTP for email verification is: {otp}",
+            to=[user.email],
+        )
+        return Response(
+            {"message": "Check your email for the OTP to verify your account."},
+            status=status.HTTP_201_CREATED,
+        )
 
 
 class UserSummaryView(APIView):
@@ -460,13 +284,15 @@ class UserSummaryView(APIView):
     )
     def get(self, request, *args, **kwargs):
         user = request.user
+        tenant = request.tenant
         if user.role == "owner":
             user_data = RegistrationSerializer(user).data
-            company_data = CompanySerializer(Company.objects.filter(owner=user), many=True).data
-            agents = Agent.objects.filter(company__owner=user)
+            company_data = CompanySerializer(
+                [tenant.company] if tenant.company else [], many=True
+            ).data
+            agents = Agent.objects.filter(company_id=tenant.company_id).select_related("user_id")
             agents_data = AgentSerializer(agents, many=True).data
-            agent_ids = agents.values_list("user_id__id", flat=True)
-            transactions = Transaction.objects.filter(agent_id__in=agent_ids)
+            transactions = Transaction.objects.filter(agent_id__in=tenant.agent_ids)
             transactions_data = TransactionSerializer(transactions, many=True).data
             notifications_data = NotificationSerializer(
                 Notification.objects.filter(user_id=user.id), many=True
@@ -486,9 +312,9 @@ class UserSummaryView(APIView):
             }
 
         elif user.role == "agent":
-            user_data = AgentSerializer(user.agent).data
-            transactions = Transaction.objects.filter(agent_id=user.id)
-            company_data = CompanySerializer(user.agent.company).data
+            user_data = AgentSerializer(tenant.agent).data
+            transactions = Transaction.objects.filter(agent_id=tenant.agent_pk)
+            company_data = CompanySerializer(tenant.company).data
             transactions_data = TransactionSerializer(transactions, many=True).data
             notifications_data = NotificationSerializer(
                 Notification.objects.filter(user_id=user.id), many=True
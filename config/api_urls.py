@@ -6,4 +6,7 @@ path("", include("apps.companies.urls")),
 path("users/", include("apps.users.urls")),
 path("", include("apps.agents.urls")),
 path("", include("apps.customers.urls")),
+path("", include("apps.external_tables.urls")),
+path("", include("apps.reports.urls")),
+path("", include("apps.common.urls")),
 ]
\ No newline at end of file
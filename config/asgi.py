@@ -17,6 +17,7 @@ django.setup()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from apps.companies.middleware import ConnectionTrackerStack
+from apps.agents.routing import websocket_urlpatterns as agent_websocket_urlpatterns
 from apps.companies.routing import websocket_urlpatterns
 
 django_asgi_app = get_asgi_application()
@@ -24,6 +25,8 @@ django_asgi_app = get_asgi_application()
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
-        "websocket": ConnectionTrackerStack(URLRouter(websocket_urlpatterns)),
+        "websocket": ConnectionTrackerStack(
+            URLRouter(websocket_urlpatterns + agent_websocket_urlpatterns)
+        ),
     }
 )
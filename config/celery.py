@@ -1,10 +1,7 @@
 import os
-import django
 from celery import Celery
 from celery.schedules import crontab
 
-django.setup()
-
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
 
 app = Celery("config")
@@ -17,8 +14,44 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
-    "broadcast_company_metrics": {
-        "task": "apps.companies.tasks.broadcast_company_metrics",
+    "schedule_company_metrics": {
+        "task": "apps.companies.tasks.schedule_company_metrics",
+        "schedule": 5.0,
+    },
+    "reap_dashboard_connections": {
+        "task": "apps.companies.tasks.reap_dashboard_connections",
+        "schedule": crontab(minute="*/1"),
+    },
+    "poll_transaction_feed": {
+        "task": "apps.companies.tasks.poll_transaction_feed",
+        "schedule": 5.0,
+    },
+    "segment_customers": {
+        "task": "apps.customers.tasks.segment_customers",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    "deliver_outbox": {
+        "task": "apps.common.tasks.deliver_outbox",
         "schedule": crontab(minute="*/1"),
     },
-}
\ No newline at end of file
+    "fail_stale_reports": {
+        "task": "apps.reports.tasks.fail_stale_reports",
+        "schedule": crontab(minute="*/5"),
+    },
+    "purge_email_outbox": {
+        "task": "apps.common.tasks.purge_email_outbox",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "purge_expired_reports": {
+        "task": "apps.reports.tasks.purge_expired_reports",
+        "schedule": crontab(minute=0),
+    },
+    "purge_expired_tokens": {
+        "task": "apps.users.tasks.purge_expired_tokens",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "sync_token_revocations": {
+        "task": "apps.users.tasks.sync_token_revocations",
+        "schedule": crontab(minute=30),
+    },
+}
@@ -64,6 +64,7 @@ LOCAL_APPS = [
     "apps.agents.apps.AgentsConfig",
     "apps.external_tables.apps.ExternalTablesConfig",
     "apps.customers.apps.CustomersConfig",
+    "apps.reports.apps.ReportsConfig",
 ]
 
 THIRD_PARTY_APPS = [
@@ -81,15 +82,19 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "apps.common.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.companies.tenancy.TenantContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "apps.common.middleware.WhiteNoiseMiddleware",
+    # Last, so its process_view runs after CSRF and authentication checks
+    "apps.common.middleware.RequestProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -129,11 +134,16 @@ DATABASES = {
 }
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "apps.common.cache.RedisCache",
         "LOCATION": f"redis://{env('REDIS_HOST')}:{env.int('REDIS_PORT')}/1",
     }
 }
 
+# Direct Redis access for data structures the cache API cannot express
+# (apps.common.redis). Timeouts are short so callers can fall back quickly.
+REDIS_URL = f"redis://{env('REDIS_HOST')}:{env.int('REDIS_PORT')}/2"
+REDIS_SOCKET_TIMEOUT = 0.5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -195,7 +205,7 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.URLPathVersioning",
     "DEFAULT_VERSION": "v1",
@@ -204,6 +214,15 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.common.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.common.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": [
@@ -225,6 +244,39 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": True,
 }
 
+# Cached user resolution for JWT requests (apps.users.authentication)
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_LOCAL_CACHE_TTL = 5
+AUTH_USER_LOCAL_CACHE_SIZE = 10000
+
+# Password hashing pool for the async auth views (apps.users.async_views).
+# Logins beyond MAX_PENDING in-flight hashes get a 503 instead of queueing.
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=4)
+PASSWORD_HASHING_MAX_PENDING = 64
+
+# Token-bucket limits for unauthenticated endpoints (apps.common.throttling).
+# Each view scope maps a key type to "capacity/period": a bucket holds up to
+# capacity requests and refills evenly over the period.
+THROTTLE_BUCKETS = {
+    "login": {"ip": "60/min", "email": "10/min"},
+    "verify_email": {"ip": "60/min", "email": "10/min"},
+    "resend_otp": {"ip": "30/hour", "email": "5/hour"},
+    "forgot_password": {"ip": "30/hour", "email": "5/hour"},
+    "reset_password": {"ip": "60/min", "email": "10/min"},
+    # Request profiling; the "ip" bucket is keyed by the superuser's id here
+    "profile": {"ip": "10/hour"},
+}
+
+# Refresh token revocation (apps.users.revocation). One Bloom filter is kept per
+# day of token expiry; the defaults give roughly a 1% false positive rate at
+# 100k revocations a day, and a false positive only costs one extra lookup.
+TOKEN_REVOCATION_BLOOM_BITS = 2**20
+TOKEN_REVOCATION_BLOOM_HASHES = 7
+TOKEN_REVOCATION_SYNC_BATCH_SIZE = 5000
+# Lifetime of the store's ready flag; no longer than the hourly sync interval
+TOKEN_REVOCATION_READY_TTL = 3600
+TOKEN_PURGE_BATCH_SIZE = 1000
+
 
 # dj_rest_auth
 # https://dj-rest-auth.readthedocs.io/en/latest/index.html
@@ -245,6 +297,20 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL")
+SUPPORT_EMAIL = env("SUPPORT_EMAIL", default=DEFAULT_FROM_EMAIL)
+
+# Email outbox delivery (apps.common.tasks.deliver_outbox)
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = timedelta(minutes=1)
+EMAIL_OUTBOX_SENDING_TIMEOUT = timedelta(minutes=10)
+# Sent and failed emails are deleted by purge_email_outbox after this long
+EMAIL_OUTBOX_RETENTION = timedelta(days=7)
+
+
+# One-time passwords (apps.users.otp), stored in the default cache
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = 5
 
 
 # Add custom authentication backends
@@ -259,6 +325,11 @@ AUDITLOG_INCLUDE_ALL_MODELS = True
 AUDITLOG_EXCLUDE_TRACKING_FIELDS = ("created_at", "modified_at")
 AUDITLOG_DISABLE_REMOTE_ADDR = True
 AUDITLOG_MASK_TRACKING_FIELDS = ("password",)
+AUDITLOG_EXCLUDE_TRACKING_MODELS = (
+    "common.emailoutbox",
+    "token_blacklist.outstandingtoken",
+    "token_blacklist.blacklistedtoken",
+)
 
 
 ASGI_APPLICATION = "config.asgi.application"
@@ -282,5 +353,81 @@ CELERY_RESULT_BACKEND = f"redis://{env('REDIS_HOST')}:{env.int('REDIS_PORT')}/0"
 
 SWAGGER_USE_COMPAT_RENDERERS = False
 
+# Customer segmentation
+# Customers without a successful transaction in this many days are tagged inactive
+CUSTOMER_INACTIVE_AFTER_DAYS = env.int("CUSTOMER_INACTIVE_AFTER_DAYS", default=90)
+CUSTOMER_SEGMENTATION_CHUNK_SIZE = 5000
+
+# Maximum number of agents accepted by one bulk onboarding request
+AGENT_BULK_ONBOARD_MAX = 1000
+
+# Dashboard sockets refresh their registry entry every HEARTBEAT_INTERVAL
+# seconds and are reaped once silent for CONNECTION_TTL seconds
+DASHBOARD_HEARTBEAT_INTERVAL = 30
+DASHBOARD_CONNECTION_TTL = 90
+# Dashboard metric frames are JSON patches, with a full snapshot every N changes
+DASHBOARD_RESYNC_EVERY = 20
+# Non-coalescing messages (e.g. report status) queued per socket before the oldest is dropped
+DASHBOARD_SEND_QUEUE_SIZE = 50
+# Dashboard metrics are broadcast per company on an interval picked by the
+# first (minimum transaction changes, seconds) tier the company's activity
+# over the last DASHBOARD_ACTIVITY_WINDOW seconds reaches
+DASHBOARD_ACTIVITY_WINDOW = 600
+DASHBOARD_BROADCAST_INTERVALS = [(50, 5), (5, 30), (1, 60), (0, 300)]
+# Upper bound on one scheduler run; overlapping runs are skipped until then
+DASHBOARD_SCHEDULER_LEASE = 120
+# Transaction feed poller: rows published per tick (the tick itself is set in config/celery.py)
+TRANSACTION_FEED_BATCH_SIZE = 500
+# Upper bound on one poller run; overlapping runs are skipped until then
+TRANSACTION_FEED_LEASE = 60
+
+# Report jobs
+REPORT_JOBS_MAX_CONCURRENT = env.int("REPORT_JOBS_MAX_CONCURRENT", default=2)
+REPORT_RETENTION = timedelta(hours=24)
+# Pending or running jobs not updated for this long are taken to be lost
+# (a crashed worker, a task that was never queued): they stop counting
+# against the cap and fail_stale_reports marks them failed
+REPORT_JOB_TIMEOUT = timedelta(hours=1)
+REPORT_BATCH_SIZE = 2000
+
 # Add a default value for TESTING in the base settings file
-TESTING = False
\ No newline at end of file
+TESTING = False
+
+# Request and task metrics, kept in Redis and served at /metrics in the
+# Prometheus text format. Scrapers send METRICS_TOKEN as a bearer token;
+# without one the endpoint is only served when DEBUG is on.
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Queries slower than this are kept, with their call site and EXPLAIN plan,
+# in a Redis ring buffer superusers can read at api/v1/slow-queries/.
+# 0 turns the slow query log off.
+SLOW_QUERY_THRESHOLD_MS = env.float("SLOW_QUERY_THRESHOLD_MS", default=200)
+SLOW_QUERY_LOG_SIZE = 200
+SLOW_QUERY_EXPLAIN = True
+# Also log each slow query as one line of JSON
+SLOW_QUERY_LOG_JSON = env.bool("SLOW_QUERY_LOG_JSON", default=False)
+
+# Superusers can profile a request with ?_profile=1 or X-Profile: 1 (see
+# apps.common.profiling); results are kept for PROFILE_TTL seconds
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=True)
+PROFILE_TTL = 24 * 60 * 60
+# Functions and SQL statements listed in a profile's summary
+PROFILE_TOP_ENTRIES = 30
+
+# Seconds a cached GET response lives (apps.common.response_cache). Saves
+# through the ORM invalidate it at once; this bounds how long rows written
+# by other systems, such as transactions, can be served stale.
+RESPONSE_CACHE_TTL = env.int("RESPONSE_CACHE_TTL", default=60)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "message"}},
+    "loggers": {
+        # Store and channel layer failures the apps fail open on
+        "apps": {"handlers": ["console"], "level": "WARNING"},
+        "apps.common.slow_queries": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
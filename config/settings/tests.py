@@ -11,5 +11,25 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 # Add a TESTING flag to indicate the test environment
 TESTING = True
+
+# Run Celery tasks inline instead of sending them to the broker
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
+# Tests run without Redis; metrics tests enable recording themselves
+METRICS_ENABLED = False
+SLOW_QUERY_THRESHOLD_MS = 0
@@ -21,6 +21,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf import settings
 from django.conf.urls.static import static
+from apps.common.schema import SchemaGenerator
+from apps.common.views import metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -31,6 +33,7 @@ schema_view = get_schema_view(
     ),
     public=True,
     permission_classes=(permissions.AllowAny,),
+    generator_class=SchemaGenerator,
 )
 
 drf_yasg_urls = [
@@ -47,6 +50,7 @@ drf_yasg_urls = [
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/<str:version>/", include(("config.api_urls", "api"), namespace="api")),
 ] + drf_yasg_urls
 